@@ -588,6 +588,23 @@ get_plugin_files() {
       echo "plugins/taskman/task_manager_modern.py"
       echo "plugins/taskman/task_manager_vintage.py"
       echo "plugins/taskman/task_cli.py"
+      echo "plugins/taskman/task_store.py"
+      echo "plugins/taskman/task_collection.py"
+      echo "plugins/taskman/task_model.py"
+      echo "plugins/taskman/task_time.py"
+      echo "plugins/taskman/task_writer.py"
+      echo "plugins/taskman/task_serializers.py"
+      echo "plugins/taskman/task_loader.py"
+      echo "plugins/taskman/task_counts.py"
+      echo "plugins/taskman/task_daemon.py"
+      echo "plugins/taskman/task_watch.py"
+      echo "plugins/taskman/task_exchange.py"
+      echo "plugins/taskman/task_search.py"
+      echo "plugins/taskman/task_filter.py"
+      echo "plugins/taskman/task_tags.py"
+      echo "plugins/taskman/task_due.py"
+      echo "plugins/taskman/task_screen.py"
+      echo "plugins/taskman/task_events.py"
       echo "plugins/taskman/taskman_setup.py"
       echo "plugins/taskman/dino_animation.py"
       ;;
@@ -4,13 +4,40 @@ Terminal Task Manager CLI - Command-line interface with vintage OSH styling
 
 This module provides command-line access to the task management system
 with beautiful vintage colors matching the OSH theme.
+
+Startup is most of a CLI command's cost, so this module only imports what
+every command needs. The manager module (curses, the UI, the background
+loader and writer) is imported when a command first needs the manager, and
+config.json is only read when TASKMAN_DATA_FILE / TASKMAN_DATA_FORMAT do
+not already answer the question (the zsh plugin sets both). `count` reads
+the counts sidecar without creating a manager at all. See
+`taskman_bench.py startup`.
+
+Bulk edits run in one process and one transaction: `complete`/`done` and
+`delete` take several IDs and ranges (`done 3 7 10-25`), `add --stdin`
+adds one task per input line, and `--stdin` runs newline-delimited
+commands. The store lock is held for the whole batch and the journal is
+written once at the end.
+
+`search` ranks tasks by the words of a query through the inverted index
+kept beside the store (see task_search).
+
+Tasks carry tags and a project (`add "Call the bank +money project:home"`,
+`tag 3 10-12 +work -later`). `list` takes the same words as a filter
+(`list pending +work -blocked priority:high`), answered from the tag
+index instead of a scan (see task_tags), and `tags` prints the pending
+count per tag and project. `due:` and `scheduled:` words set due and
+reminder times, and `list --overdue` reads the overdue tasks off the due
+heap (see task_due).
+
+`export` and `import` stream tasks to and from JSONL, CSV or todo.txt
+files (see task_exchange); they work on the store directly, without
+loading it into a manager.
 """
 
-import argparse
 import json
 import os
 import sys
-from datetime import datetime, timezone
 from typing import List, Dict, Optional
 
 # Vintage color codes matching OSH theme
@@ -35,46 +62,94 @@ class VintageColors:
     BOLD = "\033[1m"                    # Bold text
     RESET = "\033[0m"                   # Reset colors
 
-def humanize_time_delta(created_at: str) -> str:
-    """Convert ISO timestamp to human-readable time delta using local timezone"""
-    try:
-        created = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-        if created.tzinfo is None:
-            created = created.replace(tzinfo=timezone.utc).astimezone()
-        else:
-            created = created.astimezone()
+from task_store import JOURNAL_SUFFIX, open_store, resolve_data_file, resolve_data_format, migrate_json_to_sqlite
+from task_due import due_label
+from task_tags import TaskFilter, format_tags, parse_filter
+from task_time import Humanizer
 
-        now = datetime.now().astimezone()
-        delta = now - created
+PRIORITIES = ["high", "normal", "low"]
+SEARCH_LIMIT = 20
+# Commands allowed in a --stdin batch: reads would not see the batch's own unwritten changes
+BATCH_COMMANDS = ("add", "complete", "done", "delete", "tag", "sort")
 
-        days = delta.days
-        hours = delta.seconds // 3600
-        minutes = (delta.seconds % 3600) // 60
 
-        if days > 0:
-            return f"{days}d"
-        elif hours > 0:
-            return f"{hours}h"
-        elif minutes > 0:
-            return f"{minutes}m"
-        else:
-            return "now"
-    except:
-        return "?"
+def parse_task_ids(args: List[str]) -> List[int]:
+    """IDs and inclusive ranges ("3", "10-25") in order; raises ValueError naming the bad argument"""
+    task_ids = []
+    for arg in args:
+        first, sep, last = arg.partition("-")
+        try:
+            start = int(first)
+            end = int(last) if sep else start
+        except ValueError:
+            raise ValueError(arg) from None
+        if end < start:
+            raise ValueError(arg)
+        task_ids.extend(range(start, end + 1))
+    return task_ids
+
+
+def pop_limit(args: List[str], default: Optional[int]) -> Optional[int]:
+    """Take `--limit N` out of args: N, None for 0 (no limit), `default` without one
+
+    Raises ValueError when N is missing or not a number >= 0.
+    """
+    if "--limit" not in args:
+        return default
+    i = args.index("--limit")
+    try:
+        limit = int(args[i + 1])
+    except IndexError:
+        raise ValueError("--limit") from None
+    if limit < 0:
+        raise ValueError(args[i + 1])
+    del args[i:i + 2]
+    return limit or None
+
 
-# Import the Task and TaskManager classes from task_manager.py
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from task_manager import Task, TaskManager
+def _valid_priority(priority: str) -> str:
+    if priority not in PRIORITIES:
+        print(f"\033[33mWarning: Invalid priority '{priority}', using 'normal'\033[0m")
+        return "normal"
+    return priority
 
 class TaskCLI:
     def __init__(self):
-        # Load configuration and determine data directory
-        self.config = self._load_config()
-        data_dir = self.config.get('data_directory', os.path.expanduser('~/.taskman'))
-        
-        # Initialize task manager with configured data directory
-        self.task_manager = TaskManager(data_file=os.path.join(data_dir, 'tasks.json'))
-    
+        # Configuration and the task manager are both loaded on first use
+        self._config = None
+        self._task_manager = None
+
+    @property
+    def config(self) -> Dict:
+        if self._config is None:
+            self._config = self._load_config()
+        return self._config
+
+    @property
+    def data_dir(self) -> str:
+        return self.config.get('data_directory', os.path.expanduser('~/.taskman'))
+
+    @property
+    def data_file(self) -> str:
+        # The environment wins over the config, so don't read the config if it is set
+        return os.environ.get('TASKMAN_DATA_FILE') or resolve_data_file(self.config)
+
+    @property
+    def data_format(self) -> str:
+        return os.environ.get('TASKMAN_DATA_FORMAT') or resolve_data_format(self.config)
+
+    @property
+    def task_manager(self):
+        if self._task_manager is None:
+            from task_manager_modern import ModernTaskManager
+            # Lazy so indexed stores answer queries directly
+            self._task_manager = ModernTaskManager(data_file=self.data_file, lazy=True, data_format=self.data_format)
+        return self._task_manager
+
+    @task_manager.setter
+    def task_manager(self, manager):
+        self._task_manager = manager
+
     def _load_config(self):
         """Load configuration from config file"""
         config_file = os.path.expanduser('~/.taskman/config.json')
@@ -93,7 +168,9 @@ class TaskCLI:
             'dino_animation': True,
             'auto_save': True,
             'default_priority': 'normal',
-            'date_format': 'relative'
+            'date_format': 'relative',
+            'storage_backend': 'json',
+            'data_format': 'json'
         }
 
     def add_task(self, text: str, priority: str = "normal"):
@@ -101,78 +178,147 @@ class TaskCLI:
         task = self.task_manager.add_task(text, priority)
         return task
 
-    def list_tasks(self, filter_type: str = "all"):
-        """List tasks with vintage OSH colors and styling"""
-        tasks = self.task_manager.tasks
-
-        if filter_type == "pending":
-            tasks = [t for t in tasks if not t.completed]
-        elif filter_type == "completed":
-            tasks = [t for t in tasks if t.completed]
+    def add_tasks(self, lines, priority: str = "normal") -> int:
+        """Add one task per non-empty line, writing the journal once"""
+        added = 0
+        with self.task_manager.batch():
+            for line in lines:
+                text = line.strip()
+                if text:
+                    self.task_manager.add_task(text, priority)
+                    added += 1
+        print(f"\033[32m✓ Added {added} tasks\033[0m")
+        return added
+
+    def list_tasks(self, filter_type: str = "all", limit: Optional[int] = None, where: Optional[TaskFilter] = None):
+        """List tasks with vintage OSH colors and styling (the first `limit` only, if given)"""
+        completed = {"pending": False, "completed": True}.get(filter_type)
+        tasks = self.task_manager.query_tasks(completed, limit, where)
 
         if not tasks:
-            if filter_type == "all":
+            if where:
+                print(f"{VintageColors.WARNING}No {'' if filter_type == 'all' else filter_type + ' '}tasks match {where}.{VintageColors.RESET}")
+            elif filter_type == "all":
                 print(f"{VintageColors.WARNING}No tasks found. Add your first task with: tasks add 'task description'{VintageColors.RESET}")
             else:
                 print(f"{VintageColors.WARNING}No {filter_type} tasks found.{VintageColors.RESET}")
             return
 
         # Vintage header
-        print(f"{VintageColors.BOLD}{filter_type.title()} Tasks (Sort: {self.task_manager.sort_mode}):{VintageColors.RESET}")
+        title = f"{filter_type.title()} Tasks {where}" if where else f"{filter_type.title()} Tasks"
+        print(f"{VintageColors.BOLD}{title} (Sort: {self.task_manager.sort_mode}):{VintageColors.RESET}")
         print()
 
-        # Track if we need to show separator
-        completed_separator_shown = False
+        # Pending tasks come first, so a separator is needed only if the list starts with one
+        completed_separator_shown = tasks[0].completed
+        humanizer = Humanizer()
 
         for task in tasks:
             # Show vintage separator before first completed task
-            if not completed_separator_shown and task.completed and any(not t.completed for t in tasks):
+            if not completed_separator_shown and task.completed:
                 separator = "─" * 60
                 print(f"{VintageColors.DIM}{separator}{VintageColors.RESET}")
                 completed_separator_shown = True
-
-            # Get humanized time
-            time_str = humanize_time_delta(task.created_at)
-
-            # Vintage status and priority icons
-            status_icon = "✓" if task.completed else "◯"
-            priority_icons = {"high": "◆", "normal": "◇", "low": "◦"}
-            priority_icon = priority_icons.get(task.priority, "◇")
-
-            # Vintage color scheme based on priority
-            if task.completed:
-                bullet_color = VintageColors.SUCCESS  # Green for completed bullet
-                if task.priority == "high":
-                    text_color = VintageColors.VINTAGE_RED + VintageColors.DIM
-                elif task.priority == "low":
-                    text_color = VintageColors.VINTAGE_TEAL + VintageColors.DIM
-                else:
-                    text_color = VintageColors.VINTAGE_YELLOW + VintageColors.DIM
-            else:
-                # Active tasks with vintage colors
-                if task.priority == "high":
-                    bullet_color = VintageColors.VINTAGE_RED
-                    text_color = VintageColors.VINTAGE_RED
-                elif task.priority == "low":
-                    bullet_color = VintageColors.VINTAGE_TEAL
-                    text_color = VintageColors.VINTAGE_TEAL
-                else:
-                    bullet_color = VintageColors.VINTAGE_YELLOW
-                    text_color = VintageColors.VINTAGE_YELLOW
-
-            # Format task line with vintage styling
-            timer_part = f"{VintageColors.DIM}[{time_str:>3}]{VintageColors.RESET}"
-            bullet_part = f"{bullet_color} {status_icon} [{priority_icon}]{VintageColors.RESET}"
-            text_part = f"{text_color} (ID: {task.id}) {task.text}{VintageColors.RESET}"
-            task_line = timer_part + bullet_part + text_part
-            print(task_line)
+            print(self.format_task_line(task, humanizer))
 
         print()
-        pending_count = len([t for t in self.task_manager.tasks if not t.completed])
-        completed_count = len([t for t in self.task_manager.tasks if t.completed])
-        stats_text = f"Total: {len(tasks)} tasks | Pending: {pending_count}, Completed: {completed_count}"
+        if limit is not None:
+            # Counting would read the rest of the file, which --limit is meant to skip
+            print(f"{VintageColors.DIM}Showing first {len(tasks)} {filter_type} tasks (--limit {limit}){VintageColors.RESET}")
+            return
+        pending_count = self.task_manager.count_tasks(completed=False)
+        completed_count = self.task_manager.count_tasks(completed=True)
+        stats_text = f"{'Matching' if where else 'Total'}: {len(tasks)} tasks | Pending: {pending_count}, Completed: {completed_count}"
         print(f"{VintageColors.DIM}{stats_text}{VintageColors.RESET}")
 
+    def list_overdue(self, limit: Optional[int] = None, where: Optional[TaskFilter] = None):
+        """Pending tasks past their due time, most overdue first"""
+        manager = self.task_manager
+        tasks = manager.overdue_tasks(limit=None if where else limit)
+        if where:
+            tasks = [task for task in tasks if where.matches(task.to_dict())][:limit]
+        if not tasks:
+            print(f"{VintageColors.SUCCESS}No overdue tasks{' matching ' + str(where) if where else ''}.{VintageColors.RESET}")
+            return
+        title = f"Overdue Tasks {where}" if where else "Overdue Tasks"
+        print(f"{VintageColors.BOLD}{title}:{VintageColors.RESET}")
+        print()
+        humanizer = Humanizer()
+        for task in tasks:
+            print(self.format_task_line(task, humanizer))
+        print()
+        print(f"{VintageColors.DIM}{len(tasks)} overdue{' (--limit ' + str(limit) + ')' if limit is not None else ''}{VintageColors.RESET}")
+
+    def format_task_line(self, task, humanizer: Humanizer) -> str:
+        """One task as `list` prints it: age, status and priority icons, ID and text"""
+        # Get humanized time
+        time_str = humanizer.label(task.created_ts)
+
+        # Vintage status and priority icons
+        status_icon = "✓" if task.completed else "◯"
+        priority_icons = {"high": "◆", "normal": "◇", "low": "◦"}
+        priority_icon = priority_icons.get(task.priority, "◇")
+
+        # Vintage color scheme based on priority
+        if task.completed:
+            bullet_color = VintageColors.SUCCESS  # Green for completed bullet
+            if task.priority == "high":
+                text_color = VintageColors.VINTAGE_RED + VintageColors.DIM
+            elif task.priority == "low":
+                text_color = VintageColors.VINTAGE_TEAL + VintageColors.DIM
+            else:
+                text_color = VintageColors.VINTAGE_YELLOW + VintageColors.DIM
+        else:
+            # Active tasks with vintage colors
+            if task.priority == "high":
+                bullet_color = VintageColors.VINTAGE_RED
+                text_color = VintageColors.VINTAGE_RED
+            elif task.priority == "low":
+                bullet_color = VintageColors.VINTAGE_TEAL
+                text_color = VintageColors.VINTAGE_TEAL
+            else:
+                bullet_color = VintageColors.VINTAGE_YELLOW
+                text_color = VintageColors.VINTAGE_YELLOW
+
+        # Format task line with vintage styling
+        timer_part = f"{VintageColors.DIM}[{time_str:>3}]{VintageColors.RESET}"
+        bullet_part = f"{bullet_color} {status_icon} [{priority_icon}]{VintageColors.RESET}"
+        text_part = f"{text_color} (ID: {task.id}) {task.text}{VintageColors.RESET}"
+        if task.tags or task.project:
+            text_part += f" {VintageColors.DIM}{format_tags(task.tags, task.project)}{VintageColors.RESET}"
+        if task.due and not task.completed and task.due_ts is not None:
+            due_color = VintageColors.ERROR if task.due_ts <= humanizer.now else VintageColors.DIM
+            text_part += f" {due_color}[{due_label(task.due_ts, humanizer.now)}]{VintageColors.RESET}"
+        return timer_part + bullet_part + text_part
+
+    def list_tags(self):
+        """Print each project and tag with its number of pending tasks, most used first"""
+        tag_counts, project_counts = self.task_manager.tag_counts()
+        if not tag_counts and not project_counts:
+            print(f"{VintageColors.WARNING}No tagged pending tasks. Tag one with: tasks tag 3 +work{VintageColors.RESET}")
+            return
+        for title, counts, prefix in (("Projects", project_counts, "project:"), ("Tags", tag_counts, "+")):
+            if not counts:
+                continue
+            print(f"{VintageColors.BOLD}{title}:{VintageColors.RESET}")
+            for name, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+                print(f"  {VintageColors.ACCENT}{prefix}{name}{VintageColors.RESET} {VintageColors.DIM}{count}{VintageColors.RESET}")
+
+    def search_tasks(self, query: str, limit: Optional[int] = SEARCH_LIMIT):
+        """Print the tasks matching every word of `query`, best match first"""
+        tasks = self.task_manager.search_tasks(query, limit)
+        if not tasks:
+            print(f"{VintageColors.WARNING}No tasks match '{query}'.{VintageColors.RESET}")
+            return
+        print(f"{VintageColors.BOLD}Search: {query}{VintageColors.RESET}")
+        print()
+        humanizer = Humanizer()
+        for task in tasks:
+            print(self.format_task_line(task, humanizer))
+        print()
+        if limit is not None and len(tasks) == limit:
+            print(f"{VintageColors.DIM}Best {limit} matches (--limit N for more, --limit 0 for all){VintageColors.RESET}")
+
     def complete_task(self, task_id: str):
         """Mark a task as completed"""
         try:
@@ -181,16 +327,16 @@ class TaskCLI:
             print(f"\033[31mError: Invalid task ID '{task_id}'. Must be a number.\033[0m")
             return False
 
-        task = next((t for t in self.task_manager.tasks if t.id == task_id_int), None)
+        # One lookup, under the lock: the lazy JSON store has to scan for the task
+        task, changed = self.task_manager.set_completed(task_id_int, True)
         if not task:
             print(f"\033[31mError: Task with ID {task_id_int} not found.\033[0m")
             return False
 
-        if task.completed:
+        if not changed:
             print(f"\033[33mTask '{task.text}' is already completed.\033[0m")
             return True
 
-        self.task_manager.toggle_task(task_id_int)
         print(f"\033[32m✓ Completed task: {task.text}\033[0m")
         return True
 
@@ -202,16 +348,84 @@ class TaskCLI:
             print(f"\033[31mError: Invalid task ID '{task_id}'. Must be a number.\033[0m")
             return False
 
-        task = next((t for t in self.task_manager.tasks if t.id == task_id_int), None)
+        task = self.task_manager.delete_task_by_id(task_id_int)
         if not task:
             print(f"\033[31mError: Task with ID {task_id_int} not found.\033[0m")
             return False
 
-        task_text = task.text
-        self.task_manager.delete_task(task_id_int)
-        print(f"\033[31m× Deleted task: {task_text}\033[0m")
+        print(f"\033[31m× Deleted task: {task.text}\033[0m")
+        return True
+
+    def tag_task(self, task_id: int, change: TaskFilter) -> bool:
+        """Add change.tags, remove change.without and set change.project on one task"""
+        task = self.task_manager.retag(task_id, change.tags, change.without, change.project)
+        if not task:
+            print(f"\033[31mError: Task with ID {task_id} not found.\033[0m")
+            return False
+        print(f"\033[32m✓ Tagged task: {task.text} {format_tags(task.tags, task.project)}\033[0m".rstrip())
         return True
 
+    def tag_tasks(self, args: List[str]) -> bool:
+        """Retag every ID and range in args (`3 10-12 +work -later project:osh`) in one transaction"""
+        try:
+            change, ids = parse_filter(args)
+        except ValueError as e:
+            print(f"\033[31mError: {e}\033[0m")
+            return False
+        if change.priority or not (change.tags or change.without or change.project is not None) or not ids:
+            print("\033[31mError: Use: tag <ids> +tag -tag project:name (project: clears it)\033[0m")
+            return False
+        return self._each_task(ids, lambda task_id: self.tag_task(task_id, change))
+
+    def complete_tasks(self, args: List[str]) -> bool:
+        """Complete every ID and range in args (`3 7 10-25`) in one transaction"""
+        return self._each_task(args, self.complete_task)
+
+    def delete_tasks(self, args: List[str]) -> bool:
+        """Delete every ID and range in args in one transaction"""
+        return self._each_task(args, self.delete_task)
+
+    def _each_task(self, args: List[str], action) -> bool:
+        try:
+            task_ids = parse_task_ids(args)
+        except ValueError as e:
+            print(f"\033[31mError: Invalid task ID '{e}'. Use numbers or ranges like 10-25.\033[0m")
+            return False
+        if len(task_ids) == 1:
+            return action(task_ids[0])
+        manager = self.task_manager
+        # One full read beats a snapshot scan per ID when the store has no index
+        if not manager.loaded and not manager.store.indexed:
+            manager.load_tasks()
+        with manager.batch():
+            return all([action(task_id) for task_id in task_ids])
+
+    def run_batch(self, lines) -> int:
+        """Run newline-delimited commands (`add "text" high`, `done 3-5`, ...) as one transaction"""
+        import shlex
+        manager = self.task_manager
+        # Tasks added earlier in the batch exist only in memory until it ends
+        if not manager.loaded:
+            manager.load_tasks()
+        status = 0
+        with manager.batch():
+            for number, line in enumerate(lines, 1):
+                try:
+                    argv = shlex.split(line, comments=True)
+                except ValueError as e:
+                    print(f"\033[31mError: line {number}: {e}\033[0m")
+                    status = 1
+                    continue
+                if not argv:
+                    continue
+                if argv[0].lower() not in BATCH_COMMANDS or "--stdin" in argv:
+                    print(f"\033[31mError: line {number}: '{' '.join(argv)}' cannot run in a batch "
+                          f"(use: {', '.join(BATCH_COMMANDS)})\033[0m")
+                    status = 1
+                    continue
+                status = run_command(self, argv) or status
+        return status
+
     def set_sort_mode(self, mode: str):
         """Set sorting mode"""
         if mode in ["default", "priority", "alphabetical"]:
@@ -222,89 +436,208 @@ class TaskCLI:
             print(f"\033[31mError: Invalid sort mode '{mode}'. Use: default, priority, alphabetical\033[0m")
             return False
 
+    def _counts(self):
+        """Counts from a current sidecar without creating the manager, else the manager's"""
+        if self._task_manager is None:
+            counts = open_store(self.data_file).read_counts()
+            if counts is not None:
+                return counts
+        return self.task_manager.counts
+
     def count_tasks(self, filter_type: str = "all"):
         """Count tasks by type. If filter_type is 'all_json', print a JSON object with all counts."""
-        tasks = self.task_manager.tasks
-
+        counts = self._counts()
         if filter_type == "all_json":
-            pending_count = len([t for t in tasks if not t.completed])
-            completed_count = len([t for t in tasks if t.completed])
-            print(json.dumps({"pending": pending_count, "completed": completed_count}))
+            print(json.dumps({"pending": counts.pending, "completed": counts.completed}))
             return
 
         if filter_type == "pending":
-            count = len([t for t in tasks if not t.completed])
+            count = counts.pending
         elif filter_type == "completed":
-            count = len([t for t in tasks if t.completed])
+            count = counts.completed
         else:
-            count = len(tasks)
+            count = counts.total
 
         print(count)
         return count
 
-def main():
-    """Main CLI entry point"""
-    if len(sys.argv) < 2:
-        print("Usage: task_cli.py <command> [args...]")
-        sys.exit(1)
+    def export_tasks(self, path: str = None, fmt: str = None) -> int:
+        """Stream every task to a file (stdout without one) as JSONL, CSV or todo.txt"""
+        from task_exchange import detect_format, write_tasks
+        fmt = detect_format(path, fmt)
+        tasks = open_store(self.data_file, self.data_format).iter_tasks({})
+        if path is None or path == "-":
+            try:
+                return write_tasks(tasks, sys.stdout, fmt)
+            except BrokenPipeError:
+                # The reader stopped early (`| head`); silence the flush at exit
+                os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+                return 0
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            exported = write_tasks(tasks, f, fmt)
+        print(f"\033[32m✓ Exported {exported} tasks to {path}\033[0m")
+        return exported
+
+    def import_tasks(self, path: str, fmt: str = None) -> int:
+        """Add every task in a JSONL, CSV or todo.txt file ("-" for stdin) in one write"""
+        from task_exchange import detect_format, read_tasks
+        fmt = detect_format(path, fmt)
+        store = open_store(self.data_file, self.data_format)
+        if path == "-":
+            imported = store.import_tasks(read_tasks(sys.stdin, fmt))
+        else:
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                imported = store.import_tasks(read_tasks(f, fmt))
+        print(f"\033[32m✓ Imported {imported} tasks from {'stdin' if path == '-' else path}\033[0m")
+        return imported
+
+    def migrate_to_sqlite(self, json_file: str = None, db_file: str = None):
+        """One-shot copy of the JSON store into a SQLite database"""
+        json_file = json_file or os.path.join(self.data_dir, 'tasks.json')
+        db_file = db_file or os.path.join(self.data_dir, 'tasks.db')
+
+        if not os.path.exists(json_file) and not os.path.exists(json_file + JOURNAL_SUFFIX):
+            print(f"\033[31mError: {json_file} not found.\033[0m")
+            return False
+
+        try:
+            migrated = migrate_json_to_sqlite(json_file, db_file)
+        except ValueError as e:
+            print(f"\033[31mError: {e}\033[0m")
+            return False
 
-    cli = TaskCLI()
-    command = sys.argv[1].lower()
+        print(f"\033[32m✓ Migrated {migrated} tasks to {db_file}\033[0m")
+        print(f"{VintageColors.DIM}Set \"storage_backend\": \"sqlite\" in ~/.taskman/config.json to use it.{VintageColors.RESET}")
+        return True
 
-    try:
-        if command == "add":
-            if len(sys.argv) < 3:
-                print("\033[31mError: Please provide task description\033[0m")
-                sys.exit(1)
+def run_command(cli: TaskCLI, argv: List[str]) -> int:
+    """Run one command (argv without the program name); returns the exit status
 
-            text = sys.argv[2]
-            priority = sys.argv[3] if len(sys.argv) > 3 else "normal"
+    main() runs it once per process; task_daemon runs it per request
+    against a TaskCLI whose tasks stay loaded.
+    """
+    command = argv[0].lower()
 
-            # Validate priority
-            if priority not in ["high", "normal", "low"]:
-                print(f"\033[33mWarning: Invalid priority '{priority}', using 'normal'\033[0m")
-                priority = "normal"
+    try:
+        if command == "--stdin":
+            return cli.run_batch(sys.stdin)
 
-            cli.add_task(text, priority)
+        elif command == "add":
+            if len(argv) < 2:
+                print("\033[31mError: Please provide task description\033[0m")
+                return 1
+
+            priority = _valid_priority(argv[2] if len(argv) > 2 else "normal")
+            if argv[1] == "--stdin":
+                cli.add_tasks(sys.stdin, priority)
+            else:
+                cli.add_task(argv[1], priority)
 
         elif command == "list":
-            filter_type = sys.argv[2] if len(sys.argv) > 2 else "all"
+            args = argv[1:]
+            overdue = "--overdue" in args
+            if overdue:
+                args.remove("--overdue")
+            try:
+                limit = pop_limit(args, None)
+            except ValueError:
+                print("\033[31mError: --limit needs a number (0 for all)\033[0m")
+                return 1
+            where, args = parse_filter(args)
+            if overdue:
+                cli.list_overdue(limit, where)
+                return 0
+            filter_type = args[0] if args else "all"
             if filter_type not in ["all", "pending", "completed"]:
                 print(f"\033[33mWarning: Invalid filter '{filter_type}', using 'all'\033[0m")
                 filter_type = "all"
-            cli.list_tasks(filter_type)
+            cli.list_tasks(filter_type, limit, where)
 
-        elif command == "complete":
-            if len(sys.argv) < 3:
+        elif command == "search":
+            args = argv[1:]
+            try:
+                limit = pop_limit(args, SEARCH_LIMIT)
+            except ValueError:
+                print("\033[31mError: --limit needs a number (0 for all)\033[0m")
+                return 1
+            if not args:
+                print("\033[31mError: Please provide search words\033[0m")
+                return 1
+            cli.search_tasks(" ".join(args), limit)
+
+        elif command in ("complete", "done"):
+            if len(argv) < 2:
                 print("\033[31mError: Please provide task ID\033[0m")
-                sys.exit(1)
-            cli.complete_task(sys.argv[2])
+                return 1
+            cli.complete_tasks(argv[1:])
 
         elif command == "delete":
-            if len(sys.argv) < 3:
+            if len(argv) < 2:
                 print("\033[31mError: Please provide task ID\033[0m")
-                sys.exit(1)
-            cli.delete_task(sys.argv[2])
+                return 1
+            cli.delete_tasks(argv[1:])
+
+        elif command == "tag":
+            if len(argv) < 3:
+                print("\033[31mError: Please provide task IDs and +tag, -tag or project:name\033[0m")
+                return 1
+            cli.tag_tasks(argv[1:])
+
+        elif command == "tags":
+            cli.list_tags()
 
         elif command == "sort":
-            if len(sys.argv) < 3:
+            if len(argv) < 2:
                 print("\033[31mError: Please provide sort mode (default, priority, alphabetical)\033[0m")
-                sys.exit(1)
-            cli.set_sort_mode(sys.argv[2])
+                return 1
+            cli.set_sort_mode(argv[1])
 
         elif command == "count":
-            filter_type = sys.argv[2] if len(sys.argv) > 2 else "all"
+            filter_type = argv[1] if len(argv) > 1 else "all"
             cli.count_tasks(filter_type)
 
+        elif command in ("export", "import"):
+            args = argv[1:]
+            fmt = None
+            if "--format" in args:
+                i = args.index("--format")
+                if i + 1 >= len(args):
+                    print("\033[31mError: --format needs one of: jsonl, csv, todo.txt\033[0m")
+                    return 1
+                fmt = args[i + 1]
+                del args[i:i + 2]
+            if command == "export":
+                cli.export_tasks(args[0] if args else None, fmt)
+            elif not args:
+                print("\033[31mError: Please provide a file to import (or - for stdin)\033[0m")
+                return 1
+            else:
+                cli.import_tasks(args[0], fmt)
+
+        elif command == "migrate":
+            json_file = argv[1] if len(argv) > 1 else None
+            db_file = argv[2] if len(argv) > 2 else None
+            if not cli.migrate_to_sqlite(json_file, db_file):
+                return 1
+
         else:
             print(f"\033[31mError: Unknown command '{command}'\033[0m")
-            print("Available commands: add, list, complete, delete, sort, count")
-            sys.exit(1)
+            print("Available commands: add, list, search, complete, delete, tag, tags, sort, count, export, import, migrate, --stdin")
+            return 1
 
     except Exception as e:
         print(f"\033[31mError: {e}\033[0m")
+        return 1
+    return 0
+
+def main():
+    """Main CLI entry point"""
+    if len(sys.argv) < 2:
+        print("Usage: task_cli.py <command> [args...]  (or --stdin to read commands, one per line)")
         sys.exit(1)
 
+    sys.exit(run_command(TaskCLI(), sys.argv[1:]))
+
 if __name__ == "__main__":
     main()
 
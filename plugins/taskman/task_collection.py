@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Taskman Task Collection - Ordered pending/completed partitions
+
+Keeps tasks sorted under the active sort mode without rebuilding the whole
+list on every change. Pending and completed tasks live in two partitions,
+each ordered by a cached sort key; adding, toggling or editing a task moves
+just that task with a bisect search instead of an O(n log n) re-sort.
+
+The collection behaves like the old List[Task] (len, iteration, indexing,
+truthiness), so UI code that walks `task_manager.tasks` keeps working.
+"""
+
+import bisect
+import heapq
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from task_model import Task, intern_priority, intern_tags
+
+PRIORITY_RANK = {"high": 0, "normal": 1, "low": 2}
+SORT_MODES = ["default", "priority", "alphabetical"]
+
+PENDING, COMPLETED = 0, 1
+
+
+def sort_key(task, sort_mode: str) -> Tuple:
+    """Sort key within a partition; the task ID keeps keys unique and stable"""
+    if sort_mode == "priority":
+        return (PRIORITY_RANK.get(task.priority, 1), task.id)
+    if sort_mode == "alphabetical":
+        return (task.text.lower(), task.id)
+    # "default" keeps creation order
+    return (task.id,)
+
+
+class TaskCollection:
+    """Tasks ordered pending-first under a sort mode, with an id -> task index"""
+
+    def __init__(self, tasks: Iterable = (), sort_mode: str = "default"):
+        self.sort_mode = sort_mode
+        self.by_id: Dict[int, object] = {}
+        self._parts: Tuple[List, List] = ([], [])
+        self._part_keys: Tuple[List, List] = ([], [])
+        # id -> (partition, key) as of the task's last insert
+        self._placement: Dict[int, Tuple[int, Tuple]] = {}
+        self.load(tasks)
+
+    def load(self, tasks: Iterable):
+        """Replace the contents and sort once"""
+        self.by_id = {task.id: task for task in tasks}
+        self._rebuild()
+
+    def _rebuild(self):
+        for part in (PENDING, COMPLETED):
+            self._parts[part].clear()
+            self._part_keys[part].clear()
+        self._placement.clear()
+        entries = sorted(((sort_key(task, self.sort_mode), task) for task in self.by_id.values()),
+                         key=lambda entry: entry[0])
+        for key, task in entries:
+            part = COMPLETED if task.completed else PENDING
+            self._parts[part].append(task)
+            self._part_keys[part].append(key)
+            self._placement[task.id] = (part, key)
+
+    def _insert(self, task):
+        part = COMPLETED if task.completed else PENDING
+        key = sort_key(task, self.sort_mode)
+        keys = self._part_keys[part]
+        pos = bisect.bisect_left(keys, key)
+        keys.insert(pos, key)
+        self._parts[part].insert(pos, task)
+        self._placement[task.id] = (part, key)
+
+    def _detach(self, task):
+        part, key = self._placement.pop(task.id)
+        keys = self._part_keys[part]
+        pos = bisect.bisect_left(keys, key)
+        del keys[pos]
+        del self._parts[part][pos]
+
+    def add(self, task):
+        self.by_id[task.id] = task
+        self._insert(task)
+
+    def remove(self, task):
+        self._detach(task)
+        del self.by_id[task.id]
+
+    def reposition(self, task):
+        """Move a task after its completed/priority/text changed"""
+        self._detach(task)
+        self._insert(task)
+
+    def apply_record(self, record: Dict) -> bool:
+        """Replay a journal record written by another process; True if a task changed"""
+        op = record.get("op")
+        if op == "add":
+            if record["task"]["id"] in self.by_id:
+                return False
+            self.add(Task.from_dict(record["task"]))
+            return True
+        task = self.by_id.get(record.get("id"))
+        if task is None:
+            return False
+        if op == "del":
+            self.remove(task)
+        elif op == "set":
+            fields = record["fields"]
+            if "text" in fields:
+                task.text = fields["text"]
+            if "completed" in fields:
+                task.completed = fields["completed"]
+            if "priority" in fields:
+                task.priority = intern_priority(fields["priority"])
+            if "tags" in fields:
+                task.tags = intern_tags(fields["tags"] or ())
+            if "project" in fields:
+                task.project = fields["project"] or None
+            if "due" in fields:
+                task.due = fields["due"] or None
+            if "scheduled" in fields:
+                task.scheduled = fields["scheduled"] or None
+            task.revision += 1
+            self.reposition(task)
+        else:
+            return False
+        return True
+
+    def ordered(self, task_ids: Iterable[int], limit: Optional[int] = None) -> List:
+        """The tasks with these IDs in display order (the first `limit`), sorted by their cached keys (no scan)"""
+        key = self._placement.__getitem__
+        task_ids = sorted(task_ids, key=key) if limit is None else heapq.nsmallest(limit, task_ids, key=key)
+        return [self.by_id[task_id] for task_id in task_ids]
+
+    def set_sort_mode(self, sort_mode: str):
+        self.sort_mode = sort_mode
+        self._rebuild()
+
+    def get(self, task_id: int):
+        return self.by_id.get(task_id)
+
+    def index(self, task) -> int:
+        """Display position of a task, found by bisecting its cached key"""
+        part, key = self._placement[task.id]
+        pos = bisect.bisect_left(self._part_keys[part], key)
+        return pos + (len(self._parts[PENDING]) if part == COMPLETED else 0)
+
+    @property
+    def boundary(self) -> int:
+        """Display index of the first completed task (== the number of pending tasks)"""
+        return len(self._parts[PENDING])
+
+    def window(self, start: int, stop: int) -> List:
+        """Tasks at display positions [start, stop), copying only those"""
+        pending, completed = self._parts
+        split = len(pending)
+        return pending[start:stop] + completed[max(0, start - split):max(0, stop - split)]
+
+    @property
+    def pending(self) -> List:
+        """Pending tasks in display order (read-only view)"""
+        return self._parts[PENDING]
+
+    @property
+    def completed(self) -> List:
+        """Completed tasks in display order (read-only view)"""
+        return self._parts[COMPLETED]
+
+    def __len__(self) -> int:
+        return len(self._parts[PENDING]) + len(self._parts[COMPLETED])
+
+    def __bool__(self) -> bool:
+        return bool(self.by_id)
+
+    def __iter__(self) -> Iterator:
+        return chain(self._parts[PENDING], self._parts[COMPLETED])
+
+    def __contains__(self, task) -> bool:
+        return self.by_id.get(task.id) is task
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            return self.window(start, stop) if step == 1 else list(self)[index]
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("task index out of range")
+        pending = self._parts[PENDING]
+        if index < len(pending):
+            return pending[index]
+        return self._parts[COMPLETED][index - len(pending)]
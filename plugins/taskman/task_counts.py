@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Taskman Counts - Pending/completed/per-priority tallies and their sidecar
+
+The shell's startup summary only needs a handful of numbers, so the
+managers keep them up to date incrementally and the store writes them to a
+one-line sidecar next to the data file (tasks.json.counts) after every
+journal append and snapshot:
+
+    pending 12 completed 40 pending_high 3 pending_normal 8 pending_low 1 stamp 5120.1718000000000000000:0:912
+
+The line is whitespace-separated key/value pairs so zsh can load it into an
+associative array with `read -rA` and no subprocess. Per-priority counts
+are of pending tasks. `stamp` identifies the store state the counts were
+written for (see JournalTaskStore.counts_stamp); a reader that finds a
+different state recounts instead of trusting the file. The shell compares
+it with zstat of the snapshot and the journals (_taskman_counts_current),
+to the second where the stamp has nanoseconds.
+"""
+
+import os
+from typing import Dict, Iterable, Optional, Tuple
+
+from task_model import PRIORITIES
+
+COUNTS_SUFFIX = ".counts"
+
+
+class TaskCounts:
+    __slots__ = ("pending", "completed", "pending_by_priority")
+
+    def __init__(self):
+        self.pending = 0
+        self.completed = 0
+        self.pending_by_priority: Dict[str, int] = dict.fromkeys(PRIORITIES, 0)
+
+    @classmethod
+    def of(cls, tasks: Iterable) -> 'TaskCounts':
+        """Tally Task objects"""
+        counts = cls()
+        for task in tasks:
+            counts.tally(task.completed, task.priority)
+        return counts
+
+    def tally(self, completed: bool, priority: str, delta: int = 1):
+        if completed:
+            self.completed += delta
+        else:
+            self.pending += delta
+            key = priority if priority in self.pending_by_priority else "normal"
+            self.pending_by_priority[key] += delta
+
+    def add(self, task):
+        self.tally(task.completed, task.priority)
+
+    def remove(self, task):
+        self.tally(task.completed, task.priority, -1)
+
+    @property
+    def total(self) -> int:
+        return self.pending + self.completed
+
+    def to_line(self, stamp: str) -> str:
+        pairs = [("pending", self.pending), ("completed", self.completed)]
+        pairs += [(f"pending_{priority}", count) for priority, count in self.pending_by_priority.items()]
+        pairs.append(("stamp", stamp or "-"))
+        return " ".join(f"{key} {value}" for key, value in pairs) + "\n"
+
+    @classmethod
+    def parse(cls, line: str) -> Tuple['TaskCounts', str]:
+        words = line.split()
+        fields = dict(zip(words[::2], words[1::2]))
+        counts = cls()
+        counts.pending = int(fields["pending"])
+        counts.completed = int(fields["completed"])
+        for priority in counts.pending_by_priority:
+            counts.pending_by_priority[priority] = int(fields.get(f"pending_{priority}", 0))
+        return counts, fields.get("stamp", "-")
+
+
+def read_counts_file(path: str) -> Optional[Tuple[TaskCounts, str]]:
+    try:
+        with open(path, 'r') as f:
+            return TaskCounts.parse(f.readline())
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def write_counts_file(path: str, counts: TaskCounts, stamp: str):
+    """Replace the sidecar atomically (it is derived data, so no fsync)"""
+    tmp_file = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w') as f:
+        f.write(counts.to_line(stamp))
+    os.replace(tmp_file, path)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Taskman Daemon - Serve CLI commands from one long-lived process
+
+Every `tasks add/list/done/delete/sort` used to start python3, import the
+CLI, read the config and load the store, only to run one command. With the
+daemon running (`tasks daemon start`, or "daemon": true in config.json to
+start it on first use) the task set stays in memory and the zsh wrappers
+send their arguments over a per-user Unix socket with zsh's zsocket
+module, so no process is spawned at all.
+
+Protocol, one request per connection:
+
+    request:   "<n>\\n", then n NUL-terminated fields: the client's data
+               file followed by the task_cli.py arguments
+    response:  "<exit status>\\n", then the command's output until EOF
+
+Status 75 (EX_TEMPFAIL) means "run it yourself": the daemon serves a
+different data file, or the command (migrate, export/import with their
+client-relative paths, anything reading --stdin) is not served here.
+Clients then run task_cli.py in-process, exactly as when no daemon is
+listening.
+
+Other processes (the TUIs, in-process CLI runs) may still change the
+files. Before each request the daemon takes the store lock and merges the
+records they appended (ModernTaskManager.sync), reloading only when those
+were already compacted into a snapshot.
+
+Between requests the daemon sleeps in accept() until the next due or
+scheduled time in the manager's DueScheduler (at most IDLE_WAKE seconds,
+to notice times other processes added), and announces what fired with
+notify-send when it is installed.
+
+Usage: task_daemon.py [serve|stop|status]
+"""
+
+import io
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stderr, redirect_stdout
+from typing import List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from task_cli import TaskCLI, run_command
+from task_manager_modern import ModernTaskManager
+from task_store import JournalTaskStore, resolve_data_file, resolve_data_format
+
+EX_TEMPFAIL = 75
+# Commands that touch files other than the served store
+LOCAL_COMMANDS = ("migrate", "export", "import")
+REQUEST_TIMEOUT = 5.0
+RECV_SIZE = 65536
+# Longest sleep between reminder checks
+IDLE_WAKE = 60.0
+
+
+def socket_path() -> str:
+    """Per-user socket: TASKMAN_SOCKET, else $XDG_RUNTIME_DIR, else a private temp dir"""
+    if os.environ.get("TASKMAN_SOCKET"):
+        return os.environ["TASKMAN_SOCKET"]
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        return os.path.join(os.environ["XDG_RUNTIME_DIR"], "taskman.sock")
+    return os.path.join(tempfile.gettempdir(), f"taskman-{os.getuid()}", "taskman.sock")
+
+
+def _private_directory(directory: str):
+    """Create the socket's directory, refusing one another user could write to"""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.stat(directory)
+    if st.st_uid != os.getuid() or st.st_mode & 0o022:
+        raise PermissionError(f"{directory} is not a private directory")
+
+
+def _encode_request(fields: List[str]) -> bytes:
+    return f"{len(fields)}\n".encode() + b"".join(field.encode("utf-8") + b"\0" for field in fields)
+
+
+def _read_request(conn: socket.socket) -> List[str]:
+    """Receive until the header's field count is satisfied"""
+    buf = b""
+    count = None
+    while True:
+        if count is None and b"\n" in buf:
+            header, buf = buf.split(b"\n", 1)
+            count = int(header)
+        if count is not None and buf.count(b"\0") >= count:
+            return [field.decode("utf-8") for field in buf.split(b"\0")[:count]]
+        chunk = conn.recv(RECV_SIZE)
+        if not chunk:
+            raise ValueError("connection closed mid-request")
+        buf += chunk
+
+
+def request(argv: List[str], data_file: str, path: str = None) -> Optional[Tuple[int, str]]:
+    """Run argv on the daemon: (status, output), or None if nothing is listening"""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(REQUEST_TIMEOUT)
+            conn.connect(path or socket_path())
+            conn.sendall(_encode_request([os.path.realpath(data_file)] + argv))
+            chunks = []
+            while True:
+                chunk = conn.recv(RECV_SIZE)
+                if not chunk: break
+                chunks.append(chunk)
+    except OSError:
+        return None
+    header, _, output = b"".join(chunks).partition(b"\n")
+    if not header.isdigit():
+        return None
+    return int(header), output.decode("utf-8")
+
+
+class TaskDaemon:
+    """Answers task_cli.py commands against an in-memory ModernTaskManager"""
+
+    def __init__(self, path: str = None):
+        self.path = path or socket_path()
+        self.cli = TaskCLI()
+        self.data_file = os.path.realpath(resolve_data_file(self.cli.config))
+        self.data_format = resolve_data_format(self.cli.config)
+        self.stopping = False
+        self._reload()
+
+    def _reload(self):
+        """(Re)open the manager; the journal store is held fully in memory"""
+        manager = ModernTaskManager(self.data_file, lazy=True, data_format=self.data_format)
+        # SQLite stays lazy: its indexed queries are already cheap
+        if isinstance(manager.store, JournalTaskStore): manager.load_tasks()
+        self.cli.task_manager = manager
+
+    def execute(self, data_file: str, argv: List[str]) -> Tuple[int, str]:
+        if argv[:1] == ["daemon"]:
+            return self._control(argv[1:])
+        if not argv or os.path.realpath(data_file) != self.data_file or argv[0].lower() in LOCAL_COMMANDS:
+            return EX_TEMPFAIL, ""
+        # The client's stdin is not forwarded, so batches read it in the client's own process
+        if "--stdin" in argv:
+            return EX_TEMPFAIL, ""
+        # Catch up with whatever other processes wrote since our last request
+        manager = self.cli.task_manager
+        with manager.store.locked(): manager.sync()
+        out = io.StringIO()
+        with redirect_stdout(out), redirect_stderr(out):
+            status = run_command(self.cli, argv)
+        return status, out.getvalue()
+
+    def _control(self, argv: List[str]) -> Tuple[int, str]:
+        action = argv[0] if argv else "status"
+        if action == "stop":
+            self.stopping = True
+            return 0, "Taskman daemon stopped\n"
+        if action == "status":
+            manager = self.cli.task_manager
+            alarm = manager.due_scheduler.next_alarm()
+            reminder = f", next reminder {time.strftime('%Y-%m-%d %H:%M', time.localtime(alarm))}" if alarm else ""
+            return 0, f"Taskman daemon running (pid {os.getpid()}): {self.data_file}, {manager.count_tasks()} tasks{reminder}\n"
+        return 1, f"Unknown daemon action '{action}' (use: status, stop)\n"
+
+    def wait_seconds(self) -> float:
+        """How long accept() may block: until the next alarm, at most IDLE_WAKE"""
+        alarm = self.cli.task_manager.due_scheduler.next_alarm()
+        # Never 0: that would make accept() non-blocking instead of timing out
+        return IDLE_WAKE if alarm is None else max(0.01, min(IDLE_WAKE, alarm - time.time()))
+
+    def remind(self):
+        """Catch up with other writers, then announce the due and scheduled times that arrived"""
+        manager = self.cli.task_manager
+        with manager.store.locked(): manager.sync()
+        for task_id, kind in manager.due_scheduler.fire(time.time()):
+            task = manager.find_task(task_id)
+            if task: notify("Task due" if kind == "due" else "Task reminder", task.text)
+
+    def _bind(self) -> socket.socket:
+        _private_directory(os.path.dirname(self.path))
+        if os.path.exists(self.path):
+            if request(["daemon", "status"], self.data_file, self.path) is not None:
+                raise RuntimeError(f"a taskman daemon is already listening on {self.path}")
+            os.unlink(self.path)  # left behind by a daemon that died
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o077)
+        try:
+            server.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        server.listen(16)
+        return server
+
+    def serve(self):
+        server = self._bind()
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            while not self.stopping:
+                server.settimeout(self.wait_seconds())
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    self.remind()
+                    continue
+                with conn:
+                    try:
+                        conn.settimeout(REQUEST_TIMEOUT)
+                        fields = _read_request(conn)
+                    except (OSError, ValueError):
+                        # A client that hung up or sent garbage only loses its own request
+                        continue
+                    try:
+                        status, output = self.execute(fields[0], fields[1:]) if fields else (EX_TEMPFAIL, "")
+                    except Exception as e:
+                        # A failing sync or command fails this request, not the daemon (clients would fall back for good)
+                        status, output = 1, f"\033[31mError: {e}\033[0m\n"
+                    try:
+                        conn.sendall(f"{status}\n".encode() + output.encode("utf-8"))
+                    except OSError:
+                        continue
+        finally:
+            server.close()
+            # Every change is already in the journal; only the search index is worth keeping
+            self.cli.task_manager.save_search_index()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+
+def notify(title: str, text: str):
+    """A desktop notification, if notify-send is installed; the daemon has no terminal to print to"""
+    if shutil.which("notify-send"):
+        try:
+            subprocess.run(["notify-send", "--app-name=taskman", title, text], stdin=subprocess.DEVNULL,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=2)
+        except (OSError, subprocess.SubprocessError):
+            pass
+
+
+def main():
+    action = sys.argv[1] if len(sys.argv) > 1 else "serve"
+    if action == "serve":
+        try:
+            TaskDaemon().serve()
+        except (RuntimeError, PermissionError) as e:
+            print(f"\033[31mError: {e}\033[0m")
+            sys.exit(1)
+        return
+    if action not in ("stop", "status"):
+        print("Usage: task_daemon.py [serve|stop|status]")
+        sys.exit(1)
+    # Control requests are answered whichever data file the daemon serves
+    reply = request(["daemon", action], "")
+    if reply is None:
+        print("Taskman daemon is not running")
+        sys.exit(1)
+    print(reply[1], end="")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Taskman Due Dates - Due and scheduled times, and the heaps that watch them
+
+A task may be due at a time (it is overdue after that) and scheduled for
+one (a reminder fires then). Both are typed inline like tags:
+
+    tasks add "Pay rent due:2024-06-01 scheduled:tomorrow"
+
+Values are ISO dates or times ("2024-06-01", "2024-06-01T17:00"), today,
+tomorrow, or an offset from now ("+3d", "+2h", "+30m", "+1w"). They are
+stored as written after resolving the relative ones, so a date stays a
+date: due on a date means due by the end of that day, scheduled on a
+date means reminded at its start.
+
+DueScheduler keeps every pending task's due time in a min-heap and every
+future due or scheduled time in a second one, the alarm queue. The UI and
+the daemon sleep until the alarm queue's head and pop what fired;
+`tasks list --overdue` walks the due heap from the root and stops at the
+first time still in the future, so it visits the k overdue tasks (and
+their children) instead of every task. Changes push fresh entries and
+leave the old ones to be skipped when they surface; the heaps are rebuilt
+once they hold several entries per indexed task.
+"""
+
+import heapq
+import re
+import time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DUE, SCHEDULED = "due", "scheduled"
+_DATE_WORD = re.compile(r"(due|scheduled):(\S+)")
+_OFFSET = re.compile(r"\+(\d+)([mhdw])")
+_OFFSET_SECONDS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+# The heaps are rebuilt past this many entries per indexed task (at most 3 are live), plus a slack
+_ENTRIES_PER_TASK = 4
+_STALE_SLACK = 64
+
+
+def resolve_when(value: str, now: Optional[float] = None) -> Optional[str]:
+    """The stored form of a due/scheduled value: relative ones resolved; None if it does not parse"""
+    now = time.time() if now is None else now
+    word = value.lower()
+    if word in ("today", "tomorrow"):
+        return (date.fromtimestamp(now) + timedelta(days=word == "tomorrow")).isoformat()
+    offset = _OFFSET.fullmatch(word)
+    if offset:
+        then = now + int(offset.group(1)) * _OFFSET_SECONDS[offset.group(2)]
+        return datetime.fromtimestamp(then).astimezone().isoformat(timespec="minutes")
+    return value if when_timestamp(value) is not None else None
+
+
+@lru_cache(maxsize=4096)
+def when_timestamp(value: Optional[str], end_of_day: bool = False) -> Optional[float]:
+    """Epoch seconds of a stored value; a bare date is its local midnight, or the next one with end_of_day
+
+    Cached: many tasks share a date, and rows ask on every frame.
+    """
+    if not value:
+        return None
+    try:
+        if len(value) == 10:
+            day = date.fromisoformat(value) + timedelta(days=end_of_day)
+            return datetime(day.year, day.month, day.day).timestamp()
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def due_timestamp(value: Optional[str]) -> Optional[float]:
+    return when_timestamp(value, True)
+
+
+def scheduled_timestamp(value: Optional[str]) -> Optional[float]:
+    return when_timestamp(value, False)
+
+
+def split_dates(spec: str, now: Optional[float] = None) -> Tuple[str, Optional[str], Optional[str]]:
+    """Take due:X and scheduled:X words out of spec: (rest, due, scheduled)
+
+    Words whose value does not parse stay in the text, as do both words
+    when nothing else is left.
+    """
+    words, found = [], {DUE: None, SCHEDULED: None}
+    for word in spec.split():
+        match = _DATE_WORD.fullmatch(word)
+        value = resolve_when(match.group(2), now) if match else None
+        if value:
+            found[match.group(1)] = value
+        else:
+            words.append(word)
+    if not words:
+        return spec.strip(), None, None
+    return " ".join(words), found[DUE], found[SCHEDULED]
+
+
+def format_dates(due: Optional[str], scheduled: Optional[str]) -> str:
+    """The inline words for a due and scheduled value; "" if neither"""
+    return " ".join(f"{kind}:{value}" for kind, value in ((DUE, due), (SCHEDULED, scheduled)) if value)
+
+
+def due_label(due_ts: float, now: float) -> str:
+    """Compact time to or past a due time: "due 3d", "overdue 2h" """
+    seconds = due_ts - now
+    if seconds < 0:
+        return f"overdue {_span(-seconds)}"
+    return f"due {_span(seconds)}"
+
+
+def _span(seconds: float) -> str:
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size:
+            return f"{int(seconds // size)}{unit}"
+    return "now"
+
+
+class DueScheduler:
+    """Pending tasks' due times in a min-heap, and future due/scheduled times in an alarm heap"""
+
+    def __init__(self, now: Optional[float] = None, completed_of: Callable[[int], bool] = lambda task_id: False):
+        # Alarms at or before this time have fired (or were already past when indexed)
+        self.now = time.time() if now is None else now
+        # Status of a task not indexed yet, for a "set" record that gives it a time
+        self.completed_of = completed_of
+        # task ID -> (due_ts, scheduled_ts, completed), for tasks with either time
+        self.docs: Dict[int, Tuple[Optional[float], Optional[float], bool]] = {}
+        self._due: List[Tuple[float, int]] = []
+        self._alarms: List[Tuple[float, int, str]] = []
+
+    @classmethod
+    def of(cls, tasks: Iterable, now: Optional[float] = None, completed_of: Callable[[int], bool] = lambda task_id: False) -> 'DueScheduler':
+        """Index Task objects with one heapify per heap"""
+        scheduler = cls(now, completed_of)
+        for task in tasks:
+            if task.due or task.scheduled:
+                scheduler.docs[task.id] = (due_timestamp(task.due), scheduled_timestamp(task.scheduled), task.completed)
+        scheduler._rebuild()
+        return scheduler
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def _rebuild(self):
+        self._due = [(due, task_id) for task_id, (due, _, completed) in self.docs.items() if due is not None and not completed]
+        self._alarms = [(when, task_id, kind) for task_id, (due, scheduled, completed) in self.docs.items() if not completed
+                        for kind, when in ((DUE, due), (SCHEDULED, scheduled)) if when is not None and when > self.now]
+        heapq.heapify(self._due)
+        heapq.heapify(self._alarms)
+
+    def set(self, task_id: int, due_ts: Optional[float], scheduled_ts: Optional[float], completed: bool):
+        """Index a task's times, replacing what it had (the old heap entries go stale)"""
+        old = self.docs.get(task_id)
+        if due_ts is None and scheduled_ts is None:
+            self.docs.pop(task_id, None)
+        else:
+            self.docs[task_id] = (due_ts, scheduled_ts, completed)
+        if completed:
+            # Its entries go stale; completed tasks are neither overdue nor reminded
+            self._maybe_rebuild()
+            return
+        if due_ts is not None and (old is None or old[2] or old[0] != due_ts):
+            heapq.heappush(self._due, (due_ts, task_id))
+        for kind, when, before in ((DUE, due_ts, old and old[0]), (SCHEDULED, scheduled_ts, old and old[1])):
+            if when is not None and when > self.now and (old is None or old[2] or before != when):
+                heapq.heappush(self._alarms, (when, task_id, kind))
+        self._maybe_rebuild()
+
+    def remove(self, task_id: int):
+        if self.docs.pop(task_id, None) is not None:
+            self._maybe_rebuild()
+
+    def _maybe_rebuild(self):
+        if len(self._due) + len(self._alarms) > _ENTRIES_PER_TASK * len(self.docs) + _STALE_SLACK:
+            self._rebuild()
+
+    def apply_record(self, record: Dict):
+        """Follow one journal record (see task_store)"""
+        op = record.get("op")
+        if op == "add":
+            task_data = record["task"]
+            if task_data.get("due") or task_data.get("scheduled"):
+                self.set(task_data["id"], due_timestamp(task_data.get("due")), scheduled_timestamp(task_data.get("scheduled")),
+                         bool(task_data.get("completed", False)))
+        elif op == "set":
+            fields = record["fields"]
+            doc = self.docs.get(record["id"])
+            if doc is None and not (fields.get("due") or fields.get("scheduled")):
+                return
+            due, scheduled, completed = doc or (None, None, None)
+            if completed is None and "completed" not in fields:
+                # A task without times gaining one: its status is not in the record
+                completed = self.completed_of(record["id"])
+            self.set(record["id"],
+                     due_timestamp(fields["due"]) if "due" in fields else due,
+                     scheduled_timestamp(fields["scheduled"]) if "scheduled" in fields else scheduled,
+                     bool(fields.get("completed", completed)))
+        elif op == "del":
+            self.remove(record["id"])
+
+    def _current(self, task_id: int, kind: str, when: float) -> bool:
+        doc = self.docs.get(task_id)
+        return doc is not None and not doc[2] and doc[0 if kind == DUE else 1] == when
+
+    def overdue(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[int]:
+        """IDs of pending tasks due at or before now, most overdue first
+
+        Walks the heap from the root and never descends below an entry
+        still in the future, so the cost follows the number of overdue
+        tasks, not the number of tasks.
+        """
+        now = time.time() if now is None else now
+        heap, found, seen = self._due, [], set()
+        stack = [0] if heap else []
+        while stack:
+            i = stack.pop()
+            when, task_id = heap[i]
+            if when > now:
+                continue
+            if task_id not in seen and self._current(task_id, DUE, when):
+                seen.add(task_id)
+                found.append((when, task_id))
+            stack.extend(child for child in (2 * i + 1, 2 * i + 2) if child < len(heap))
+        found = heapq.nsmallest(limit, found) if limit is not None else sorted(found)
+        return [task_id for _, task_id in found]
+
+    def next_alarm(self) -> Optional[float]:
+        """When the next due or scheduled time arrives; None if nothing is ahead"""
+        alarms = self._alarms
+        while alarms and not self._current(alarms[0][1], alarms[0][2], alarms[0][0]):
+            heapq.heappop(alarms)
+        return alarms[0][0] if alarms else None
+
+    def fire(self, now: Optional[float] = None) -> List[Tuple[int, str]]:
+        """Pop the alarms that are due: (task ID, "due" or "scheduled"), in time order"""
+        now = time.time() if now is None else now
+        alarms, fired = self._alarms, []
+        while alarms and alarms[0][0] <= now:
+            when, task_id, kind = heapq.heappop(alarms)
+            if self._current(task_id, kind, when) and (task_id, kind) not in fired:
+                fired.append((task_id, kind))
+        self.now = max(self.now, now)
+        return fired
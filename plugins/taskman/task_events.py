@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Taskman Events - Sleep until there is something to do
+
+Both UIs used to poll: getch() with a 100 ms (modern) or 80 ms (vintage)
+timeout, so they woke 10-12 times a second to check the writer, the
+watcher, status messages and reminders even when nothing could change.
+
+EventLoop waits in one selectors call on the terminal's input, the store
+watcher's inotify descriptor and a SIGWINCH wakeup pipe, with a timeout
+that reaches the earliest deadline in its TimerQueue: the background
+writer's next snapshot, a status message's expiry, the next due or
+scheduled time, the next minute (ages are shown per minute), the dino's
+next frame. An idle UI wakes a few times a minute; a key, a resize or a
+write from another shell wakes it at once.
+
+Work finishing on another thread (the background load, the filter
+worker) has no descriptor to wait on, so a short poll timer runs only
+while it is busy, as it does for the stat() watcher where inotify is not
+available.
+"""
+
+import curses
+import os
+import selectors
+import signal
+import sys
+import time
+from typing import Dict, List, Optional, Set
+
+# Sources wait() reports as ready
+INPUT, WATCH, RESIZE = "input", "watch", "resize"
+# Timers the UIs arm
+AUTOSAVE, STATUS, ALARM, MINUTE, TICK, POLL = "autosave", "status", "alarm", "minute", "tick", "poll"
+
+
+class TimerQueue:
+    """Named deadlines; setting a name again replaces its deadline
+
+    The UIs hold a handful of timers, so next() takes the min() of a dict
+    rather than keeping a heap of stale entries.
+    """
+
+    def __init__(self):
+        self.deadlines: Dict[str, float] = {}
+
+    def set(self, name: str, when: Optional[float]):
+        """Arm name for `when` (epoch seconds), or disarm it with None"""
+        if when is None:
+            self.deadlines.pop(name, None)
+        else:
+            self.deadlines[name] = when
+
+    def next(self) -> Optional[float]:
+        """The earliest deadline; None if no timer is armed"""
+        return min(self.deadlines.values(), default=None)
+
+    def expired(self, now: Optional[float] = None) -> List[str]:
+        """Disarm and return the timers whose deadline has passed, earliest first"""
+        now = time.time() if now is None else now
+        fired = sorted((when, name) for name, when in self.deadlines.items() if when <= now)
+        for _, name in fired:
+            del self.deadlines[name]
+        return [name for _, name in fired]
+
+
+class EventLoop:
+    """Waits for a key, a store change, a resize or the next timer, whichever comes first"""
+
+    def __init__(self, watcher=None, stdin_fd: Optional[int] = None):
+        self.timers = TimerQueue()
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(sys.stdin.fileno() if stdin_fd is None else stdin_fd, selectors.EVENT_READ, INPUT)
+        # The stat() fallback has no descriptor; callers arm a timer for it instead
+        if watcher is not None and watcher.fileno() is not None:
+            self.selector.register(watcher.fileno(), selectors.EVENT_READ, WATCH)
+        self._wakeup = None
+        self._old_wakeup_fd = -1
+        self._old_handler = None
+        if hasattr(signal, "SIGWINCH"):
+            self._watch_resize()
+
+    def _watch_resize(self):
+        """Wake up on SIGWINCH, which only interrupts select() once Python handles the signal
+
+        curses' own handler is replaced, so wait() resizes curses itself.
+        """
+        read_fd, write_fd = os.pipe()
+        os.set_blocking(read_fd, False)
+        os.set_blocking(write_fd, False)
+        try:
+            self._old_wakeup_fd = signal.set_wakeup_fd(write_fd, warn_on_full_buffer=False)
+            self._old_handler = signal.signal(signal.SIGWINCH, lambda signum, frame: None)
+        except ValueError:
+            # Not the main thread: resizes then show up with the next key
+            os.close(read_fd)
+            os.close(write_fd)
+            return
+        self._wakeup = (read_fd, write_fd)
+        self.selector.register(read_fd, selectors.EVENT_READ, RESIZE)
+
+    def wait(self, deadline: Optional[float]) -> Set[str]:
+        """Block until a source is ready or deadline passes (None: no deadline); returns the ready sources"""
+        timeout = None if deadline is None else max(0.0, deadline - time.time())
+        ready = {key.data for key, _ in self.selector.select(timeout)}
+        if RESIZE in ready:
+            try:
+                while os.read(self._wakeup[0], 512):
+                    pass
+            except BlockingIOError:
+                pass
+            resize_curses()
+        return ready
+
+    def close(self):
+        self.selector.close()
+        if self._wakeup:
+            signal.set_wakeup_fd(self._old_wakeup_fd)
+            # None: the old handler was curses' C handler, which cannot be put back
+            signal.signal(signal.SIGWINCH, self._old_handler if self._old_handler is not None else signal.SIG_DFL)
+            for fd in self._wakeup:
+                os.close(fd)
+            self._wakeup = None
+
+
+def resize_curses():
+    """Give curses the terminal's current size (what its own SIGWINCH handler would have done)"""
+    try:
+        size = os.get_terminal_size(sys.__stdout__.fileno())
+    except (AttributeError, OSError, ValueError):
+        return
+    try:
+        curses.resizeterm(size.lines, size.columns)
+    except curses.error:
+        pass
+
+
+def next_minute(now: Optional[float] = None) -> float:
+    """The next minute boundary, when per-minute age labels change"""
+    now = time.time() if now is None else now
+    return (now // 60 + 1) * 60
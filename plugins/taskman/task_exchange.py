@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Taskman Import/Export - Tasks as JSONL, CSV or todo.txt, one record at a time
+
+`tasks export` and `tasks import` move tasks in and out of the store in
+three line-oriented formats:
+
+    jsonl     one task object per line, exactly as the store holds it
+    csv       a header row, then id,text,completed,priority,created_at,tags,project,due,scheduled
+    todo.txt  "(A) 2024-05-01 Call the bank +money"; "x Call the bank pri:A" when done
+
+Both directions stream: the writer formats each task as the store's
+iterator yields it, and the reader yields one normalized task per input
+line, so memory does not grow with the file. The store then assigns the
+imported tasks IDs as one block and commits them in a single write (see
+import_tasks in task_store). IDs in the input are ignored, so importing a
+file twice adds its tasks twice.
+
+todo.txt has no "normal" priority: high is (A), low is (C), normal has
+none, and on import B means normal and C-Z mean low. A completed line's
+first date is its completion date, which taskman does not track, so
+completed tasks are exported without dates and keep their priority as a
+pri: tag, as the todo.txt format suggests. Tags are written as +tag
+words and the project as a project:name tag; both are read back from the
+text the way `tasks add` parses them (see task_tags). Due and scheduled
+times are due:/scheduled: tags there, as todo.txt tools already write
+due dates. CSV holds tags space-separated in one column.
+"""
+
+import csv
+import json
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, Optional, TextIO
+
+from task_due import format_dates, split_dates, when_timestamp
+from task_model import PRIORITIES
+from task_tags import format_tags, parse_task_spec
+from task_time import parse_timestamp
+
+FORMATS = ("jsonl", "csv", "todo.txt")
+DEFAULT_FORMAT = "jsonl"
+CSV_COLUMNS = ("id", "text", "completed", "priority", "created_at", "tags", "project", "due", "scheduled")
+_EXTENSIONS = {".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "jsonl", ".csv": "csv", ".txt": "todo.txt"}
+
+TODO_PRIORITY = {"high": "A", "low": "C"}
+_TODO_DATE = re.compile(r"(\d{4}-\d{2}-\d{2}) ")
+_TODO_PRIORITY = re.compile(r"\(([A-Z])\) ")
+_TODO_PRI_TAG = re.compile(r"(?:^| )pri:([A-Z])(?= |$)")
+_TRUE = ("true", "1", "yes", "x")
+
+
+def detect_format(path: Optional[str], fmt: Optional[str] = None) -> str:
+    """An explicit format, else the file extension's, else jsonl"""
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown format '{fmt}' (use: {', '.join(FORMATS)})")
+        return fmt
+    for extension, name in _EXTENSIONS.items():
+        if path and path.lower().endswith(extension):
+            return name
+    return DEFAULT_FORMAT
+
+
+def _todo_priority(letter: Optional[str]) -> str:
+    if letter == "A":
+        return "high"
+    if letter and letter > "B":
+        return "low"
+    return "normal"
+
+
+def _todo_date(created_at: str) -> str:
+    """Local calendar date of an ISO timestamp, or "" if it does not parse"""
+    timestamp = parse_timestamp(created_at)
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d") if timestamp is not None else ""
+
+
+@lru_cache(maxsize=1024)
+def _todo_timestamp(date: str) -> str:
+    """Local midnight of a todo.txt date; many lines share a date, hence the cache"""
+    return datetime.strptime(date, "%Y-%m-%d").astimezone().isoformat()
+
+
+def _todo_line(task_data: Dict) -> str:
+    text = " ".join(filter(None, [" ".join(task_data["text"].split()), format_tags(task_data.get("tags") or (), task_data.get("project")),
+                                  format_dates(task_data.get("due"), task_data.get("scheduled"))]))
+    letter = TODO_PRIORITY.get(task_data.get("priority", "normal"))
+    if task_data.get("completed"):
+        return f"x {text} pri:{letter}" if letter else f"x {text}"
+    date = _todo_date(task_data.get("created_at", ""))
+    parts = [f"({letter})" if letter else "", date, text]
+    return " ".join(part for part in parts if part)
+
+
+def write_tasks(tasks: Iterable[Dict], f: TextIO, fmt: str) -> int:
+    """Write task dicts to a text stream as they arrive; returns how many"""
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(CSV_COLUMNS)
+        for task_data in tasks:
+            writer.writerow([task_data["id"], task_data["text"], "true" if task_data.get("completed") else "false",
+                             task_data.get("priority", "normal"), task_data.get("created_at", ""),
+                             " ".join(task_data.get("tags") or ()), task_data.get("project") or "",
+                             task_data.get("due") or "", task_data.get("scheduled") or ""])
+            count += 1
+    elif fmt == "todo.txt":
+        for task_data in tasks:
+            f.write(_todo_line(task_data) + "\n")
+            count += 1
+    else:
+        for task_data in tasks:
+            f.write(json.dumps(task_data, ensure_ascii=False, separators=(",", ":")) + "\n")
+            count += 1
+    return count
+
+
+def _normalize(number: int, text, completed, priority, created_at, tags=(), project=None, due=None, scheduled=None) -> Dict:
+    """The fields a new task needs, checked; errors name the input line"""
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError(f"line {number}: task has no text")
+    if not isinstance(tags, (list, tuple)) or not all(isinstance(tag, str) and tag for tag in tags):
+        raise ValueError(f"line {number}: tags must be a list of words")
+    if project is not None and not isinstance(project, str):
+        raise ValueError(f"line {number}: invalid project '{project}'")
+    for name, value in (("due", due), ("scheduled", scheduled)):
+        if value and (not isinstance(value, str) or when_timestamp(value) is None):
+            raise ValueError(f"line {number}: invalid {name} '{value}'")
+    if priority not in PRIORITIES:
+        raise ValueError(f"line {number}: invalid priority '{priority}' (use: {', '.join(PRIORITIES)})")
+    if created_at:
+        if not isinstance(created_at, str) or parse_timestamp(created_at) is None:
+            raise ValueError(f"line {number}: invalid created_at '{created_at}'")
+    else:
+        created_at = datetime.now().astimezone().isoformat()
+    task_data = {"text": text.strip(), "completed": bool(completed), "priority": priority, "created_at": created_at}
+    if tags:
+        task_data["tags"] = list(dict.fromkeys(tags))
+    if project:
+        task_data["project"] = project
+    if due:
+        task_data["due"] = due
+    if scheduled:
+        task_data["scheduled"] = scheduled
+    return task_data
+
+
+def _read_jsonl(f: TextIO) -> Iterator[Dict]:
+    for number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            task_data = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"line {number}: {e}") from None
+        if not isinstance(task_data, dict):
+            raise ValueError(f"line {number}: expected a task object")
+        yield _normalize(number, task_data.get("text"), task_data.get("completed", False),
+                         task_data.get("priority", "normal"), task_data.get("created_at"),
+                         task_data.get("tags") or (), task_data.get("project"), task_data.get("due"), task_data.get("scheduled"))
+
+
+def _read_csv(f: TextIO) -> Iterator[Dict]:
+    reader = csv.DictReader(f)
+    if reader.fieldnames is None:
+        return
+    if "text" not in reader.fieldnames:
+        raise ValueError("line 1: CSV header has no 'text' column")
+    for row in reader:
+        completed = (row.get("completed") or "").strip().lower() in _TRUE
+        yield _normalize(reader.line_num, row.get("text"), completed,
+                         (row.get("priority") or "normal").strip().lower(), (row.get("created_at") or "").strip(),
+                         (row.get("tags") or "").split(), (row.get("project") or "").strip() or None,
+                         (row.get("due") or "").strip() or None, (row.get("scheduled") or "").strip() or None)
+
+
+def _read_todo(f: TextIO) -> Iterator[Dict]:
+    for number, line in enumerate(f, 1):
+        rest = line.strip()
+        if not rest:
+            continue
+        completed = rest.startswith("x ")
+        letter = None
+        dates = []
+        if completed:
+            rest = rest[2:]
+            # Completion date, then creation date; without a creation date the one date is all there is
+            for _ in range(2):
+                match = _TODO_DATE.match(rest)
+                if match:
+                    dates.append(match.group(1))
+                    rest = rest[match.end():]
+            tag = _TODO_PRI_TAG.search(rest)
+            if tag:
+                letter = tag.group(1)
+                rest = (rest[:tag.start()] + rest[tag.end():]).strip()
+        else:
+            match = _TODO_PRIORITY.match(rest)
+            if match:
+                letter = match.group(1)
+                rest = rest[match.end():]
+            match = _TODO_DATE.match(rest)
+            if match:
+                dates.append(match.group(1))
+                rest = rest[match.end():]
+        created_at = None
+        if dates:
+            try:
+                created_at = _todo_timestamp(dates[-1])
+            except ValueError:
+                raise ValueError(f"line {number}: invalid date '{dates[-1]}'") from None
+        text, due, scheduled = split_dates(rest)
+        text, tags, project = parse_task_spec(text)
+        yield _normalize(number, text, completed, _todo_priority(letter), created_at, tags, project, due, scheduled)
+
+
+def read_tasks(f: TextIO, fmt: str) -> Iterator[Dict]:
+    """Yield {text, completed, priority, created_at[, tags, project, due, scheduled]} per input record; raises ValueError on a bad one"""
+    if fmt == "csv":
+        return _read_csv(f)
+    if fmt == "todo.txt":
+        return _read_todo(f)
+    return _read_jsonl(f)
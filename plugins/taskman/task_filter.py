@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Taskman Fuzzy Filter - Narrow the task list as you type, off the UI thread
+
+The modern UI's `/` mode shows only the tasks whose text contains the
+typed characters in order ("rvwinv" finds "Review invoice"), best match
+first: the tightest match (fewest characters from the first typed one
+to the last), then one starting a word, then the earliest one, then
+display order.
+
+Filtering never rescans more than it has to. Every finished result set is
+pushed on a stack with its pattern. A task matching a pattern also
+matches any pattern it contains in order, so typing (anywhere in the
+line) narrows the newest cached set, and deleting pops the sets whose
+pattern is no longer contained in the input; when the top one is the
+input itself it is shown at once without scoring anything.
+
+Scoring runs on a worker thread. The UI hands it the newest job and
+keeps drawing the previous results until it finishes; a job overtaken by
+another keystroke stops at its next check and is dropped.
+"""
+
+import re
+import threading
+from array import array
+from operator import itemgetter
+from typing import List, Optional, Sequence, Tuple
+
+from task_model import Task
+
+# Candidates scored between checks for a newer job
+CHECK_EVERY = 2048
+
+# Display positions and tasks, best first; positions live in an int array, so a
+# popped result set of 100k tasks is freed at once instead of tuple by tuple
+_Ranked = Tuple[array, List[Task]]
+
+
+def contains_in_order(pattern: str, text: str) -> bool:
+    """True if every character of pattern appears in text, in order"""
+    chars = iter(text)
+    return all(char in chars for char in pattern)
+
+
+def fuzzy_regex(pattern: str):
+    """Leftmost, shortest-from-there match of pattern's characters in order"""
+    return re.compile(".*?".join(map(re.escape, pattern.lower())), re.DOTALL)
+
+
+def score_tasks(pattern: str, candidates: _Ranked, stale=lambda: False) -> Optional[_Ranked]:
+    """The candidates matching pattern, best first; None if stale() says to give up"""
+    search = fuzzy_regex(pattern).search
+    scored = []
+    for n, (position, task) in enumerate(zip(*candidates)):
+        if n % CHECK_EVERY == 0 and stale():
+            return None
+        text = task.text.lower()
+        match = search(text)
+        if match is None:
+            continue
+        start = match.start()
+        word_start = start == 0 or not text[start - 1].isalnum()
+        scored.append(((match.end() - start, not word_start, start, position), position, task))
+    scored.sort(key=itemgetter(0))
+    return array("i", [entry[1] for entry in scored]), [entry[2] for entry in scored]
+
+
+class FuzzyFilter:
+    """The filtered view of a task list for the current pattern
+
+    Call update() on every edit of the pattern and poll() from the UI loop;
+    `results` holds the newest finished result set (which may belong to an
+    earlier pattern while busy() is true).
+    """
+
+    def __init__(self, tasks: Sequence[Task]):
+        self.pattern = ""
+        self.results: List[Task] = list(tasks)
+        # (pattern, ranked results); the bottom entry is the whole list
+        self.stack: List[Tuple[str, _Ranked]] = [("", (array("i", range(len(self.results))), self.results))]
+        self.shown = ""  # pattern of `results`
+        self._generation = 0
+        self._job = None
+        self._done = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._work, name="taskman-filter", daemon=True)
+        self._thread.start()
+
+    def update(self, pattern: str):
+        """Show pattern's results: cached ones at once, else narrow the newest cached set"""
+        pattern = pattern.lower()
+        self.pattern = pattern
+        while len(self.stack) > 1 and not contains_in_order(self.stack[-1][0], pattern):
+            self.stack.pop()
+        base_pattern, base = self.stack[-1]
+        with self._cond:
+            self._generation += 1
+            if base_pattern == pattern:
+                self._job = None
+                self.results, self.shown = base[1], pattern
+            else:
+                self._job = (self._generation, pattern, base)
+                self._cond.notify()
+
+    def poll(self) -> bool:
+        """Take a finished job's results; True if `results` changed"""
+        with self._cond:
+            done, self._done = self._done, None
+            if done is None or done[0] != self._generation:
+                return False
+        _, pattern, ranked = done
+        self.stack.append((pattern, ranked))
+        self.results, self.shown = ranked[1], pattern
+        return True
+
+    def busy(self) -> bool:
+        return self.shown != self.pattern
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while self._job is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                job, self._job = self._job, None
+            generation, pattern, candidates = job
+            ranked = score_tasks(pattern, candidates, lambda: self._generation != generation or self._closed)
+            if ranked is not None:
+                with self._cond:
+                    self._done = (generation, pattern, ranked)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Taskman Background Loader - First page now, the rest on a thread
+
+A full load decodes every task before the UI can draw anything, so time to
+first frame grew with the file. The loader instead reads just the first
+page from the store's streaming iterator (task_store iter_tasks) and stops;
+a worker thread then does the full load (whole-file decoding is faster
+than streaming when every task is needed) and builds the TaskCollection
+off the UI thread. The UI swaps it in with one assignment.
+
+The worker is only started (start()) after the first frame is painted:
+whole-file decoding runs in C and holds the GIL, so starting it earlier
+would delay exactly the frame this is meant to speed up.
+
+Snapshots are written in display order, so the first page of the file is
+the first page on screen.
+"""
+
+import threading
+from itertools import islice
+from typing import List, Optional
+
+from task_collection import TaskCollection
+from task_model import Task
+
+
+class BackgroundLoader:
+    """Streams a store into Task objects: `first` now, `collection` when done"""
+
+    def __init__(self, store, first_count: int):
+        self.store = store
+        # Filled from the snapshot header now, replaced by the full load's when done
+        self.meta = {}
+        records = store.iter_tasks(self.meta)
+        self.first: List[Task] = [Task.from_dict(td) for td in islice(records, first_count)]
+        records.close()
+        self.collection: Optional[TaskCollection] = None
+        self.error: Optional[Exception] = None
+        self._thread = threading.Thread(target=self._finish, name="taskman-loader", daemon=True)
+
+    def start(self):
+        """Begin the full load; call once the first frame is on screen"""
+        if self._thread.ident is None:
+            self._thread.start()
+
+    def _finish(self):
+        try:
+            meta = {}
+            tasks = [Task.from_dict(td) for td in self.store.iter_tasks(meta, stream=False)]
+            self.collection = TaskCollection(tasks, meta["sort_mode"])
+            self.meta = meta
+        except Exception as e:
+            self.error = e
+
+    def done(self) -> bool:
+        return self._thread.ident is not None and not self._thread.is_alive()
+
+    def join(self) -> TaskCollection:
+        """Wait for the full load; re-raises a load error on the caller's thread"""
+        self.start()
+        self._thread.join()
+        if self.error:
+            raise self.error
+        return self.collection
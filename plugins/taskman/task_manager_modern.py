@@ -5,103 +5,420 @@ A modern, performant, and Gemini-CLI-inspired task manager.
 """
 
 import curses
-import json
 import os
 import time
 import textwrap
-from datetime import datetime, timezone
-from typing import List, Dict, Optional
-
-def humanize_time_delta(created_at: str) -> str:
-    try:
-        created = datetime.fromisoformat(created_at.replace('Z', '+00:00')).astimezone()
-        now = datetime.now().astimezone()
-        delta = now - created
-        if delta.total_seconds() < 0: return "future"
-        days, rem = divmod(delta.total_seconds(), 86400)
-        hours, rem = divmod(rem, 3600)
-        minutes, _ = divmod(rem, 60)
-        if days > 0: return f"{int(days)}d"
-        if hours > 0: return f"{int(hours)}h"
-        if minutes > 0: return f"{int(minutes)}m"
-        return "now"
-    except Exception:
-        return "?"
-
-class Task:
-    def __init__(self, id: int, text: str, completed: bool = False, priority: str = "normal", created_at: str = None):
-        self.id = id
-        self.text = text
-        self.completed = completed
-        self.priority = priority
-        self.created_at = created_at or datetime.now().astimezone().isoformat()
-
-    def to_dict(self) -> Dict: return self.__dict__
-    @classmethod
-    def from_dict(cls, data: Dict) -> 'Task': return cls(**data)
+from contextlib import contextmanager
+from typing import Callable, List, Dict, Optional, Set, Tuple
+
+from task_collection import SORT_MODES, TaskCollection
+from task_counts import TaskCounts
+from task_due import DueScheduler, due_label, format_dates, split_dates
+from task_events import ALARM, AUTOSAVE, MINUTE, POLL, RESIZE, STATUS, EventLoop, next_minute
+from task_filter import FuzzyFilter
+from task_loader import BackgroundLoader
+from task_model import Task, intern_tags
+from task_screen import LineCache, Screen
+from task_search import SEARCH_SUFFIX, SearchIndex, open_index
+from task_store import open_store
+from task_tags import TagIndex, TaskFilter, format_tags, parse_task_spec
+from task_time import Humanizer
+from task_watch import POLL_INTERVAL, open_watcher
+from task_writer import BackgroundWriter
 
 class ModernTaskManager:
-    def __init__(self, data_file: str = None):
+    def __init__(self, data_file: str = None, lazy: bool = False, data_format: str = None):
         self.data_file = data_file or os.environ.get('TASKMAN_DATA_FILE', os.path.expanduser("~/.taskman/tasks.json"))
-        self.tasks: List[Task] = []
+        self.store = open_store(self.data_file, data_format)
+        self._tasks = TaskCollection()
+        self.loaded = False
         self.selected_index = 0
         self.next_id = 1
         self.sort_mode = "default"
-        self.load_tasks()
+        self.writer = None  # BackgroundWriter, attached by the UI
+        self.loader = None  # BackgroundLoader while the UI streams tasks in
+        self._counts = None  # TaskCounts, kept current once computed
+        self._transactions = 0  # Nesting depth of transaction()
+        self._batch = None  # Records held back by batch(), written when it ends
+        self._search: Optional[SearchIndex] = None  # Opened by the first search, then kept current
+        self._tags: Optional[TagIndex] = None  # Built from the loaded tasks on first use, then kept current
+        self._due: Optional[DueScheduler] = None  # Likewise, for due and scheduled times
+        # Stores answer queries without materializing every task: SQLite by
+        # index, the journal store by streaming the snapshot
+        if lazy:
+            meta = self.store.load_meta()
+            self.next_id, self.sort_mode = meta["next_id"], meta["sort_mode"]
+        else:
+            self.load_tasks()
+
+    @property
+    def tasks(self) -> TaskCollection:
+        if not self.loaded: self.load_tasks()
+        return self._tasks
 
     def load_tasks(self):
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r') as f:
-                    data = json.load(f)
-                    self.tasks = [Task.from_dict(td) for td in data.get("tasks", [])]
-                    self.next_id = data.get("next_id", len(self.tasks) + 1)
-                    self.sort_mode = data.get("sort_mode", "default")
-            except (json.JSONDecodeError, KeyError): pass
-        self.sort_tasks()
+        data = self.store.load()
+        self.loaded = True
+        self.next_id = data["next_id"]
+        self.sort_mode = data["sort_mode"]
+        self._tasks = TaskCollection((Task.from_dict(td) for td in data["tasks"]), self.sort_mode)
+        self._counts = None
+        self._tags = self._due = None
+
+    def start_loading(self, first_count: int):
+        """Load the first page now and the remaining tasks in the background"""
+        self.loader = BackgroundLoader(self.store, first_count)
+        self.sort_mode = self.loader.meta["sort_mode"]
+        self._tasks = TaskCollection(self.loader.first, self.sort_mode)
+        self.loaded = True
+        self._tags = self._due = None
+
+    def poll_loading(self) -> bool:
+        """Start/finish a background load; True once the full task set is swapped in"""
+        if self.loader is None: return False
+        self.loader.start()
+        if not self.loader.done(): return False
+        self.wait_loaded()
+        return True
+
+    def wait_loaded(self):
+        """Block until a background load finishes (before any mutation)"""
+        if self.loader is None: return
+        loader, self.loader = self.loader, None
+        self._tasks = loader.join()
+        self.next_id, self.sort_mode = loader.meta["next_id"], loader.meta["sort_mode"]
+        self.store.adopt(loader.meta)
+        self._counts = None
+        self._tags = self._due = None
+        if self.selected_index >= len(self._tasks): self.selected_index = max(0, len(self._tasks) - 1)
+
+    def sync(self) -> Optional[Set[int]]:
+        """Merge what other processes wrote since we last looked
+
+        Returns the IDs of the tasks they added, changed or removed (empty if
+        none), or None when the whole list may differ (reload or new sort).
+        """
+        records = self.store.sync()
+        if records == []: return set()
+        selected = self._tasks[self.selected_index].id if self.loaded and self.selected_index < len(self._tasks) else None
+        changed: Optional[Set[int]] = set()
+        if records is None:
+            # Part of it was already compacted away: re-read instead of replaying
+            changed = None
+            self._search = self._tags = self._due = None
+            if self.loaded: self.load_tasks()
+            else:
+                meta = self.store.load_meta()
+                self.next_id, self.sort_mode = meta["next_id"], meta["sort_mode"]
+        else:
+            for record in records:
+                op = record.get("op")
+                if op == "add": self.next_id = max(self.next_id, record["task"]["id"] + 1)
+                elif op == "meta":
+                    if "next_id" in record: self.next_id = max(self.next_id, record["next_id"])
+                    if record.get("sort_mode", self.sort_mode) != self.sort_mode:
+                        self.sort_mode = record["sort_mode"]
+                        if self.loaded: self.sort_tasks()
+                        changed = None
+                if self._search is not None: self._search.apply_record(record)
+                if self._tags is not None: self._tags.apply_record(record)
+                if self._due is not None: self._due.apply_record(record)
+                if self.loaded and self._tasks.apply_record(record) and changed is not None:
+                    changed.add(record["task"]["id"] if op == "add" else record["id"])
+        self._counts = None
+        # Keep the same task selected while rows move around it
+        if selected is not None and selected in self._tasks.by_id: self.selected_index = self._tasks.index(self._tasks.by_id[selected])
+        elif self.selected_index >= len(self._tasks): self.selected_index = max(0, len(self._tasks) - 1)
+        return changed
+
+    @contextmanager
+    def transaction(self):
+        """Hold the store's write lock for one mutation, starting from everyone's latest state
+
+        Compaction waits until the lock is released, so other writers are
+        only ever blocked for the append itself.
+        """
+        self.wait_loaded()
+        with self.store.locked():
+            if self._transactions == 0: self.sync()
+            self._transactions += 1
+            try: yield
+            finally: self._transactions -= 1
+        if self._transactions == 0 and not self.writer and self.store.needs_compaction(): self.save_tasks()
+
+    @contextmanager
+    def batch(self):
+        """Many mutations as one transaction: the lock is held throughout and the journal written once
+
+        Everything applied before an error is still written, so the store
+        matches memory either way.
+        """
+        with self.transaction():
+            if self._batch is not None:
+                yield
+                return
+            self._batch = []
+            try: yield
+            finally:
+                records, self._batch = self._batch, None
+                if records:
+                    self.store.append_many(records)
+                    self.store.write_counts(self.counts)
+                    if self.writer: self.writer.mark_dirty()
+
+    @property
+    def counts(self) -> TaskCounts:
+        """Pending/completed/per-priority counts; read before mutating a task"""
+        if self._counts is None:
+            self.wait_loaded()
+            if self.loaded: self._counts = TaskCounts.of(self._tasks)
+            else: self._counts = self.store.read_counts()
+            if self._counts is None:
+                # Missing or stale sidecar: recount once and leave it for the shell
+                self._counts = self.store.recount()
+        return self._counts
+
+    def query_tasks(self, completed: Optional[bool] = None, limit: Optional[int] = None,
+                    where: Optional[TaskFilter] = None) -> List[Task]:
+        """Tasks in display order, by status and tag/project/priority filter"""
+        if not self.loaded:
+            return [Task.from_dict(td) for td in self.store.query(completed, self.sort_mode, limit, where)]
+        if where: return self.tasks.ordered(self.tag_index.select(where, completed), limit)
+        if completed is None: tasks = list(self.tasks)
+        else: tasks = list(self.tasks.completed if completed else self.tasks.pending)
+        return tasks if limit is None else tasks[:limit]
+
+    def count_tasks(self, completed: Optional[bool] = None) -> int:
+        if not self.loaded:
+            counts = self.counts
+            if completed is None: return counts.total
+            return counts.completed if completed else counts.pending
+        if completed is None: return len(self.tasks)
+        return len(self.tasks.completed if completed else self.tasks.pending)
+
+    def find_task(self, task_id: int) -> Optional[Task]:
+        if not self.loaded:
+            td = self.store.get(task_id)
+            return Task.from_dict(td) if td else None
+        return self.tasks.get(task_id)
+
+    @property
+    def tag_index(self) -> TagIndex:
+        if self._tags is None:
+            self.wait_loaded()
+            self._tags = TagIndex.of(self.tasks)
+        return self._tags
+
+    @property
+    def due_scheduler(self) -> DueScheduler:
+        if self._due is None:
+            self.wait_loaded()
+            # An indexed store hands over just the tasks with times, so SQLite stays lazy
+            if not self.loaded and self.store.indexed: tasks = [Task.from_dict(td) for td in self.store.pending_with_times()]
+            else: tasks = self.tasks
+            self._due = DueScheduler.of(tasks, completed_of=lambda task_id: getattr(self.find_task(task_id), "completed", False))
+        return self._due
+
+    def overdue_tasks(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[Task]:
+        """Pending tasks past their due time, most overdue first"""
+        return [task for task in map(self.find_task, self.due_scheduler.overdue(now, limit)) if task]
+
+    def tag_counts(self) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """Pending tasks per tag and per project"""
+        if not self.loaded and self.store.indexed: return self.store.tag_counts()
+        return dict(self.tag_index.tag_counts), dict(self.tag_index.project_counts)
+
+    @property
+    def search_index(self) -> SearchIndex:
+        if self._search is None: self._search = open_index(self.store)
+        return self._search
+
+    def search_tasks(self, query: str, limit: Optional[int] = None) -> List[Task]:
+        """Tasks whose text contains every word of `query`, best match first"""
+        self.wait_loaded()
+        ids = self.search_index.search(query, limit)
+        if not self.loaded:
+            if self.store.indexed: return [task for task in map(self.find_task, ids) if task]
+            # Stream the store until the last match turns up, decoding only the matches
+            wanted, found = set(ids), {}
+            scan = self.store.iter_tasks({})
+            for td in scan if wanted else ():
+                if td["id"] in wanted:
+                    found[td["id"]] = Task.from_dict(td)
+                    if len(found) == len(wanted): break
+            scan.close()
+            return [found[task_id] for task_id in ids if task_id in found]
+        return [self.tasks.by_id[task_id] for task_id in ids if task_id in self.tasks.by_id]
+
+    def save_search_index(self):
+        """Leave the in-memory index for the next process (the UI and daemon call this on exit)"""
+        if self._search is None: return
+        with self.store.locked():
+            self.sync()
+            # A reload dropped it: it no longer matches any version
+            if self._search is None: return
+            self._search.version = self.store.revision()
+            self._search.save(self.data_file + SEARCH_SUFFIX)
 
     def save_tasks(self):
-        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-        with open(self.data_file, 'w') as f:
-            json.dump({"tasks": [t.to_dict() for t in self.tasks], "next_id": self.next_id, "sort_mode": self.sort_mode}, f, indent=2)
+        """Write a snapshot now; skipped while another process is writing one"""
+        job = self.capture_snapshot()
+        if job: job()
+
+    def capture_snapshot(self) -> Optional[Callable[[], None]]:
+        """Rotate the journal and return a job that writes the snapshot (outside the lock)"""
+        self.wait_loaded()
+        if not self.loaded: self.load_tasks()
+        # Not transaction(): that would try to compact again on the way out
+        with self.store.locked():
+            self.sync()
+            if not self.store.begin_compaction(): return None
+            tasks, next_id, sort_mode, counts = list(self.tasks), self.next_id, self.sort_mode, self.counts
+            version = self.store.revision()
+        def job():
+            self.store.write_snapshot([t.to_dict() for t in tasks], next_id, sort_mode)
+            # The snapshot changed the stamp; the counts still hold unless someone wrote since the capture
+            self.store.write_counts(counts, version)
+        return job
+
+    def _load_for_snapshot(self):
+        """A batch this size ends in a snapshot: load now and replay it, so the snapshot comes from memory"""
+        next_id, sort_mode = self.next_id, self.sort_mode
+        self.load_tasks()
+        for record in self._batch: self._tasks.apply_record(record)
+        self.next_id = max(self.next_id, next_id)
+        if sort_mode != self.sort_mode: self.sort_mode = sort_mode; self.sort_tasks()
+        self._counts = None
+
+    def journal(self, record: Dict):
+        """Append one mutation (or queue it until the batch ends); call inside transaction()"""
+        if self._search is not None: self._search.apply_record(record)
+        if self._tags is not None: self._tags.apply_record(record)
+        if self._due is not None: self._due.apply_record(record)
+        if self._batch is not None:
+            self._batch.append(record)
+            if not self.loaded and not self.store.indexed and len(self._batch) + self.store.journal_records == self.store.compact_threshold:
+                self._load_for_snapshot()
+            return
+        self.store.append(record)
+        self.store.write_counts(self.counts)
+        if self.writer: self.writer.mark_dirty()
 
     def add_task(self, text: str, priority: str = "normal"):
-        self.tasks.append(Task(self.next_id, text, priority=priority))
-        self.next_id += 1
-        self.sort_tasks()
-
+        """Add a task; +tag, project:name, due:when and scheduled:when words in text set those fields"""
+        text, due, scheduled = split_dates(text)
+        text, tags, project = parse_task_spec(text)
+        with self.transaction():
+            task = Task(self.next_id, text, priority=priority, tags=tags, project=project, due=due, scheduled=scheduled)
+            self.next_id += 1
+            self.counts.add(task)
+            if self.loaded: self.tasks.add(task)
+            self.journal({"op": "add", "task": task.to_dict()})
+        return task
+
+    def _follow_selection(self, task, was_selected: bool):
+        if was_selected: self.selected_index = self.tasks.index(task)
+
+    # ID-based mutations: one lookup each, O(1) when loaded or on SQLite; the lazy JSON store scans for it
+    def edit_task_by_id(self, task_id: int, new_text: str) -> Optional[Task]:
+        """Replace text, tags, project and times from one spec ("Text +tag project:name due:friday")"""
+        text, due, scheduled = split_dates(new_text)
+        text, tags, project = parse_task_spec(text)
+        with self.transaction():
+            task = self.find_task(task_id)
+            if task is None: return None
+            was_selected = self.loaded and self.tasks.index(task) == self.selected_index
+            task.text, task.tags, task.project, task.due, task.scheduled = text, tags, project, due, scheduled
+            task.revision += 1
+            if self.loaded:
+                self.tasks.reposition(task)
+                self._follow_selection(task, was_selected)
+            self.journal({"op": "set", "id": task_id, "fields": {"text": text, "tags": list(tags), "project": project,
+                                                                  "due": due, "scheduled": scheduled}})
+        return task
+
+    def retag(self, task_id: int, add=(), remove=(), project: Optional[str] = None) -> Optional[Task]:
+        """Add and remove tags; project "" clears the project, None leaves it"""
+        with self.transaction():
+            task = self.find_task(task_id)
+            if task is None: return None
+            tags = intern_tags(tag for tag in task.tags + tuple(add) if tag not in remove)
+            fields = {}
+            if tags != task.tags: fields["tags"] = list(tags)
+            if project is not None and (project or None) != task.project: fields["project"] = project or None
+            if not fields: return task
+            # Tags and project are not sort keys, so the task keeps its place
+            task.tags = tags
+            if "project" in fields: task.project = project or None
+            task.revision += 1
+            self.journal({"op": "set", "id": task_id, "fields": fields})
+        return task
+
+    def set_completed(self, task_id: int, completed: bool) -> Tuple[Optional[Task], bool]:
+        """(task, changed): (None, False) if there is no such task, changed False if it already was"""
+        with self.transaction():
+            task = self.find_task(task_id)
+            if task is None or task.completed == completed: return task, False
+            self._set_completed(task, completed)
+        return task, True
+
+    def toggle_task_by_id(self, task_id: int) -> Optional[Task]:
+        with self.transaction():
+            task = self.find_task(task_id)
+            if task: self._set_completed(task, not task.completed)
+        return task
+
+    def _set_completed(self, task: Task, completed: bool):
+        """Inside transaction(), on a task already looked up (one lookup: the lazy JSON store scans for it)"""
+        self.counts.remove(task)
+        task.completed = completed
+        task.revision += 1
+        self.counts.add(task)
+        if self.loaded: self.tasks.reposition(task)
+        self.journal({"op": "set", "id": task.id, "fields": {"completed": completed}})
+
+    def delete_task_by_id(self, task_id: int) -> Optional[Task]:
+        with self.transaction():
+            task = self.find_task(task_id)
+            if task is None: return None
+            self.counts.remove(task)
+            if self.loaded:
+                self.tasks.remove(task)
+                if self.selected_index >= len(self.tasks) and self.tasks: self.selected_index = len(self.tasks) - 1
+                elif not self.tasks: self.selected_index = 0
+            self.journal({"op": "del", "id": task_id})
+        return task
+
+    # Index-based wrappers used by the UI's selection
     def edit_task(self, index: int, new_text: str):
-        if 0 <= index < len(self.tasks): self.tasks[index].text = new_text
+        if 0 <= index < len(self.tasks): self.edit_task_by_id(self.tasks[index].id, new_text)
 
     def toggle_task(self, index: int):
-        if 0 <= index < len(self.tasks):
-            self.tasks[index].completed = not self.tasks[index].completed
-            self.sort_tasks()
+        if 0 <= index < len(self.tasks): self.toggle_task_by_id(self.tasks[index].id)
 
     def delete_task(self, index: int):
-        if 0 <= index < len(self.tasks):
-            del self.tasks[index]
-            if self.selected_index >= len(self.tasks) and self.tasks: self.selected_index = len(self.tasks) - 1
-            elif not self.tasks: self.selected_index = 0
+        if 0 <= index < len(self.tasks): self.delete_task_by_id(self.tasks[index].id)
 
     def sort_tasks(self):
-        pending = [t for t in self.tasks if not t.completed]
-        completed = [t for t in self.tasks if t.completed]
-        prio = {"high": 0, "normal": 1, "low": 2}
-        if self.sort_mode == "priority":
-            pending.sort(key=lambda t: prio.get(t.priority, 1))
-            completed.sort(key=lambda t: prio.get(t.priority, 1))
-        elif self.sort_mode == "alphabetical":
-            pending.sort(key=lambda t: t.text.lower())
-            completed.sort(key=lambda t: t.text.lower())
-        self.tasks = pending + completed
+        self.tasks.set_sort_mode(self.sort_mode)
+
+    def set_sort_mode(self, mode: str):
+        with self.transaction():
+            self.sort_mode = mode
+            if self.loaded: self.sort_tasks()
+            self.journal({"op": "meta", "sort_mode": mode})
 
     def cycle_sort_mode(self):
-        modes = ["default", "priority", "alphabetical"]
-        self.sort_mode = modes[(modes.index(self.sort_mode) + 1) % len(modes)]
-        self.sort_tasks()
+        with self.transaction():
+            self.set_sort_mode(SORT_MODES[(SORT_MODES.index(self.sort_mode) + 1) % len(SORT_MODES)])
 
 class ModernTaskUI:
+    SEARCH_RESULTS = 8  # Rows in the search panel
+    SIDEBAR_WIDTH = 24  # Columns of the tag sidebar, when the list keeps at least 40
+    STATUS_SECONDS = 2  # How long a status message stays
+    POLL_SECONDS = 0.05  # Wake-up interval while the background load runs or a snapshot write is in flight
+    FILTER_POLL_SECONDS = 0.01  # Wake up soon while the filter worker is scoring, to show its results promptly
+
     def __init__(self, task_manager: ModernTaskManager):
         self.task_manager = task_manager
         self.mode = "normal"
@@ -112,46 +429,119 @@ class ModernTaskUI:
         self.ui_is_dirty = True
         self.status_message = ""
         self.status_message_time = 0
-        self.last_save_time = time.time()
+        self.humanizer = Humanizer()
+        self.external_change = False  # Another process wrote; sync once loading is done
+        self.search_results: List[Task] = []  # Best matches for input_text in the search panel
+        self.search_choice = 0
+        self.filter: Optional[FuzzyFilter] = None  # The `/` view of the list while filtering
+        self.filter_choice = 0
+        self.show_tags = False  # Project and tag sidebar
+        self.scroll_top = 0  # First list line on screen; the separator counts as a line
+        self.rows = LineCache()  # Formatted task rows, reused while their task and the minute stay the same
 
     def set_dirty(self): self.ui_is_dirty = True
     def set_status_message(self, msg): self.status_message, self.status_message_time = msg, time.time()
 
     def run(self, stdscr):
         curses.curs_set(0)
-        stdscr.nodelay(1)
-        stdscr.timeout(100)
+        stdscr.nodelay(1)  # Keys are read only once the event loop saw input, until none is left
         self.init_colors()
+        writer = self.task_manager.writer = BackgroundWriter(self.task_manager)
+        # Paint the first screen as soon as it is parsed; the rest streams in behind it
+        if not self.task_manager.loaded: self.task_manager.start_loading(stdscr.getmaxyx()[0])
+        watcher = open_watcher(self.task_manager.store.watch_files())
+        # Sleeps until a key, a store change, a resize or the next timer
+        events = EventLoop(watcher)
+        # Frames are drawn into this and only their changed lines reach the terminal
+        screen = Screen(stdscr)
         try:
             while True:
-                # Auto-save logic
-                if time.time() - self.last_save_time > 30:
-                    self.task_manager.save_tasks()
-                    self.last_save_time = time.time()
-                    self.set_status_message("Auto-saved.")
-                    self.set_dirty()
+                # Snapshot in the background once edits settle
+                writer.tick()
+                error = writer.take_error()
+                if error:
+                    self.set_status_message(f"Save failed: {error}"); self.set_dirty()
+
+                # Another shell or UI wrote the store: merge just its records
+                if watcher.changed(): self.external_change = True
+                if self.external_change and not self.task_manager.loader: self.apply_external_changes()
 
-                if self.status_message and time.time() - self.status_message_time > 2:
+                if self.status_message and time.time() - self.status_message_time >= self.STATUS_SECONDS:
                     self.status_message = ""; self.set_dirty()
+                if not self.task_manager.loader: self.fire_reminders()
                 
                 h, w = stdscr.getmaxyx()
-                if w < 50 or h < 10:
-                    self.draw_small_terminal_message(stdscr, h, w); key = stdscr.getch()
-                    if key == ord('q'): break
-                    continue
-                
-                if self.ui_is_dirty:
-                    self.draw_modern_ui(stdscr)
-                    self.ui_is_dirty = False
-                
-                key = stdscr.getch()
-                if key != -1:
-                    if self.mode == "normal":
-                        if self.handle_normal_mode(key, h - 3): break
-                    else: self.handle_panel_mode(key)
+                small = w < 50 or h < 10
+                if small: self.draw_small_terminal_message(screen)
+                elif self.ui_is_dirty: self.draw_modern_ui(screen)
+                self.ui_is_dirty = False
+                # After the draw, so the first page is on screen before the full load starts
+                if self.task_manager.poll_loading(): self.set_dirty()
+                if self.filter and self.filter.poll():
+                    self.filter_choice = 0; self.set_dirty()
+
+                self.set_timers(events.timers, writer, watcher)
+                # Something changed after the draw (the load finished, filter results came in): draw it first
+                if RESIZE in events.wait(time.time() if self.ui_is_dirty else events.timers.next()): self.set_dirty()
+                # Ages and due labels are per minute
+                if MINUTE in events.timers.expired(): self.set_dirty()
+                while True:
+                    key = stdscr.getch()
+                    if key == -1: break
                     self.set_dirty()
+                    if key == curses.KEY_RESIZE: continue
+                    if small:
+                        if key == ord('q'): return
+                        continue
+                    self.task_manager.wait_loaded()
+                    if self.mode == "normal":
+                        if self.handle_normal_mode(key, h - 3): return
+                    else: self.handle_panel_mode(key, h - 4)
         finally:
-            self.task_manager.save_tasks()
+            # Runs inside curses.wrapper, so the final flush finishes before teardown
+            events.close()
+            writer.close()
+            watcher.close()
+            self.close_filter()
+            self.task_manager.writer = None
+            self.task_manager.save_search_index()
+
+    def set_timers(self, timers, writer, watcher):
+        """Arm the deadlines the loop must wake up for; everything else waits for an event"""
+        now = time.time()
+        due = writer.due()
+        # Past due means a write is still in flight: look again shortly
+        timers.set(AUTOSAVE, None if due is None else max(due, now + self.POLL_SECONDS))
+        timers.set(STATUS, self.status_message_time + self.STATUS_SECONDS if self.status_message else None)
+        timers.set(ALARM, None if self.task_manager.loader else self.task_manager.due_scheduler.next_alarm())
+        timers.set(MINUTE, next_minute(now))
+        # Threads and the stat() watcher have no descriptor to wait on
+        if self.filter and self.filter.busy(): poll = self.FILTER_POLL_SECONDS
+        elif self.task_manager.loader or writer.busy(): poll = self.POLL_SECONDS
+        elif watcher.fileno() is None: poll = POLL_INTERVAL
+        else: poll = None
+        timers.set(POLL, None if poll is None else now + poll)
+
+    def fire_reminders(self):
+        """Announce the due and scheduled times that have arrived; rows then show them as overdue"""
+        fired = self.task_manager.due_scheduler.fire(time.time())
+        if not fired: return
+        tasks = self.task_manager.tasks.by_id
+        labels = [f"{'Due' if kind == 'due' else 'Reminder'}: {tasks[task_id].text}" for task_id, kind in fired if task_id in tasks]
+        if labels:
+            self.set_status_message(labels[0] if len(labels) == 1 else f"{labels[0]} (+{len(labels) - 1} more)")
+        self.set_dirty()
+
+    def apply_external_changes(self):
+        self.external_change = False
+        changed = self.task_manager.sync()
+        if changed == set(): return
+        if self.filter:
+            # Cached result sets hold the old tasks; filter the new list for the same pattern
+            pattern = self.filter.pattern
+            self.close_filter(); self.filter = FuzzyFilter(self.task_manager.tasks); self.filter.update(pattern)
+        # The frame is redrawn whole, but only rows whose task changed or moved reach the terminal
+        self.set_dirty()
 
     def init_colors(self):
         curses.start_color()
@@ -185,18 +575,24 @@ class ModernTaskUI:
         try: stdscr.addstr(y, x, text, attr)
         except curses.error: pass
 
-    def draw_modern_ui(self, stdscr):
-        stdscr.clear()
-        h, w = stdscr.getmaxyx()
-        self.draw_header(stdscr, w)
-        self.draw_tasks(stdscr, h, w)
-        if self.mode != "normal":
-            self.draw_floating_panel(stdscr, h, w)
+    def draw_modern_ui(self, screen):
+        """Draw the frame into screen (see task_screen), which sends only the lines that changed"""
+        screen.begin()
+        self.humanizer.begin_frame()
+        self.rows.follow(self.task_manager.tasks)
+        h, w = screen.getmaxyx()
+        self.draw_header(screen, w)
+        self.draw_tasks(screen, h, self.list_width(w))
+        if self.list_width(w) < w: self.draw_tag_sidebar(screen, h, w)
+        if self.mode == "filter":
+            self.draw_filter_bar(screen, h, w)
+        elif self.mode != "normal":
+            self.draw_floating_panel(screen, h, w)
         else:
-            self.draw_status_bar(stdscr, h, w)
+            self.draw_status_bar(screen, h, w)
         if self.show_help:
-            self.draw_help_panel(stdscr, h, w)
-        stdscr.refresh()
+            self.draw_help_panel(screen, h, w)
+        screen.present()
 
     def draw_header(self, stdscr, w):
         title = "◇ TASKMAN ◇"
@@ -205,41 +601,114 @@ class ModernTaskUI:
         for i, char in enumerate(title):
             self.safe_addstr(stdscr, 0, x + i, char, curses.color_pair(rainbow[i % len(rainbow)]) | curses.A_BOLD)
 
+    def task_rows(self, h) -> List:
+        """(y, index, task) for each visible row; task is None on the pending/completed separator
+
+        The viewport scrolls just enough to keep the selection on screen, and
+        only its slice of the list is read, so the cost follows the height.
+        """
+        tasks = self.task_manager.tasks
+        start_y, visible = 2, max(0, h - 4)
+        # List lines: the tasks, plus the separator line before the first completed one
+        split = tasks.boundary
+        separator = 0 < split < len(tasks)
+        lines = len(tasks) + separator
+        selected = self.task_manager.selected_index
+        selected_line = selected + (separator and selected >= split)
+        if selected_line < self.scroll_top:
+            # Scrolling up onto the first completed task shows the separator above it
+            self.scroll_top = selected_line - (separator and selected == split)
+        elif selected_line >= self.scroll_top + visible:
+            self.scroll_top = selected_line - visible + 1
+        self.scroll_top = max(0, min(self.scroll_top, lines - visible))
+        top, bottom = self.scroll_top, min(lines, self.scroll_top + visible)
+        first = top - (separator and top > split)
+        window = tasks.window(first, bottom)
+        rows = []
+        for line in range(top, bottom):
+            if separator and line == split: rows.append((start_y + line - top, split, None)); continue
+            i = line - (separator and line > split)
+            rows.append((start_y + line - top, i, window[i - first]))
+        return rows
+
+    def filter_rows(self, h) -> List:
+        """(y, index, task) for the filter results around the chosen one"""
+        results = self.filter.results
+        visible = h - 4
+        top = max(0, self.filter_choice - visible + 1)
+        return [(2 + n, i, results[i]) for n, i in enumerate(range(top, min(len(results), top + visible)))]
+
+    def selected_row(self) -> int:
+        """Index of the highlighted row: into the filter results while filtering, else the task list"""
+        return self.filter_choice if self.filter else self.task_manager.selected_index
+
     def draw_tasks(self, stdscr, h, w):
-        start_y, max_y = 2, h - 2
-        completed_separator_drawn = False
-        y = start_y
-        for i, task in enumerate(self.task_manager.tasks):
-            if y >= max_y: break
-            if not completed_separator_drawn and task.completed:
-                if any(not t.completed for t in self.task_manager.tasks):
-                    self.safe_addstr(stdscr, y, 1, "─" * (w - 2), curses.color_pair(8))
-                    y += 1
-                    if y >= max_y: break
-                completed_separator_drawn = True
-            is_selected = (i == self.task_manager.selected_index)
-            line = self.format_task_line(task, w)
-            color = curses.color_pair(8)
-            attr = curses.A_DIM
-            if hasattr(curses, 'A_STRIKEOUT'): attr |= curses.A_STRIKEOUT
-            if not task.completed:
-                prio_color_map = {"high": 3, "low": 5, "normal": 4}
-                color = curses.color_pair(prio_color_map.get(task.priority, 4))
-                attr = curses.A_NORMAL
-            if is_selected:
-                bg_attr = curses.color_pair(1) | curses.A_REVERSE
-                self.safe_addstr(stdscr, y, 0, " " * (w - 1), bg_attr)
-                self.safe_addstr(stdscr, y, 1, line, color | bg_attr)
-            else:
-                self.safe_addstr(stdscr, y, 1, line, color | attr)
-            y += 1
+        for y, i, task in (self.filter_rows(h) if self.filter else self.task_rows(h)):
+            self.draw_task_row(stdscr, y, i, task, w)
+
+    def list_width(self, w) -> int:
+        """Columns left for the task list beside the tag sidebar"""
+        return w - self.SIDEBAR_WIDTH if self.show_tags and w - self.SIDEBAR_WIDTH >= 40 else w
+
+    def draw_tag_sidebar(self, stdscr, h, w):
+        """Pending tasks per project and tag, read from the tag index's running counts"""
+        x = w - self.SIDEBAR_WIDTH
+        for y in range(2, h - 1): self.safe_addstr(stdscr, y, x, "│" + " " * (self.SIDEBAR_WIDTH - 2), curses.color_pair(8))
+        if self.task_manager.loader:
+            self.safe_addstr(stdscr, 2, x + 2, "Loading...", curses.color_pair(8))
+            return
+        index = self.task_manager.tag_index
+        lines = []
+        for title, counts, prefix in (("Projects", index.project_counts, ""), ("Tags", index.tag_counts, "+")):
+            if lines: lines.append(None)
+            lines.append(title)
+            lines.extend((f"{prefix}{name}", count) for name, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+        for y, line in zip(range(2, h - 1), lines):
+            if isinstance(line, str):
+                self.safe_addstr(stdscr, y, x + 2, line, curses.color_pair(1) | curses.A_BOLD)
+            elif line:
+                name, count = line
+                count = str(count)
+                room = self.SIDEBAR_WIDTH - 5 - len(count)
+                if len(name) > room: name = name[:room - 1] + "…"
+                self.safe_addstr(stdscr, y, x + 2, name, curses.color_pair(4))
+                self.safe_addstr(stdscr, y, w - 2 - len(count), count, curses.color_pair(8))
+
+    def draw_task_row(self, stdscr, y, i, task, w):
+        if task is None:
+            self.safe_addstr(stdscr, y, 1, "─" * (w - 2), curses.color_pair(8))
+            return
+        is_selected = (i == self.selected_row())
+        line, color, attr = self.rows.get(task, w, int(self.humanizer.now // 60), lambda: self.task_row(task, w))
+        if is_selected:
+            bg_attr = curses.color_pair(1) | curses.A_REVERSE
+            self.safe_addstr(stdscr, y, 0, " " * (w - 1), bg_attr)
+            self.safe_addstr(stdscr, y, 1, line, color | bg_attr)
+        else:
+            self.safe_addstr(stdscr, y, 1, line, color | attr)
+
+    def task_row(self, task, w):
+        """(line, color, attr) of a task's row, short of the selection highlight"""
+        line = self.format_task_line(task, w)
+        color = curses.color_pair(8)
+        attr = curses.A_DIM
+        if hasattr(curses, 'A_STRIKEOUT'): attr |= curses.A_STRIKEOUT
+        if not task.completed:
+            prio_color_map = {"high": 3, "low": 5, "normal": 4}
+            color = curses.color_pair(prio_color_map.get(task.priority, 4))
+            # Due times fall on whole minutes, so this holds for the row's minute
+            overdue = task.due and task.due_ts is not None and task.due_ts <= self.humanizer.now
+            attr = curses.A_BOLD if overdue else curses.A_NORMAL
+        return line, color, attr
 
     def format_task_line(self, task, w):
         status = "[✓]" if task.completed else "[ ]"
         prio = {"high": "[H]", "normal": "[M]", "low": "[L]"}.get(task.priority, "[M]")
-        time = humanize_time_delta(task.created_at).rjust(4)
+        time = self.humanizer.label(task.created_ts).rjust(4)
         max_w = max(0, w - len(status) - len(prio) - len(time) - 5)
         text = task.text
+        if task.tags or task.project: text = f"{text}  {format_tags(task.tags, task.project)}"
+        if task.due and not task.completed: text = f"{text}  [{due_label(task.due_ts, self.humanizer.now)}]"
         if len(text) > max_w: text = text[:max_w-1] + "…"
         return f"{status} {prio} {text.ljust(max_w)} {time}"
 
@@ -249,8 +718,22 @@ class ModernTaskUI:
         if self.status_message:
             self.safe_addstr(stdscr, y, 1, self.status_message, curses.color_pair(7))
             return
-        bar = " (n)ew | (e)dit | (d)elete | (s)ort | (h)elp | (q)uit "
-        self.safe_addstr(stdscr, y, (w - len(bar)) // 2, bar, curses.color_pair(7))
+        if self.task_manager.loader:
+            self.safe_addstr(stdscr, y, 1, "Loading tasks...", curses.color_pair(7))
+            return
+        bar = " (n)ew | (e)dit | (d)elete | (f)ind | (/)filter | (s)ort | (h)elp | (q)uit "
+        self.safe_addstr(stdscr, y, max(0, (w - len(bar)) // 2), bar, curses.color_pair(7))
+
+    def draw_filter_bar(self, stdscr, h, w):
+        y = h - 1
+        self.safe_addstr(stdscr, y, 0, " " * (w - 1), curses.color_pair(7))
+        if not self.filter.results and not self.filter.busy():
+            self.safe_addstr(stdscr, 2, 2, "No matching tasks", curses.color_pair(8))
+        count = f"{len(self.filter.results)}/{len(self.task_manager.tasks)}{'…' if self.filter.busy() else ''} "
+        self.safe_addstr(stdscr, y, max(0, w - 1 - len(count)), count, curses.color_pair(7))
+        self.safe_addstr(stdscr, y, 1, "/" + self.input_text, curses.color_pair(7) | curses.A_BOLD)
+        curses.curs_set(1)
+        stdscr.move(y, min(w - 2, 2 + self.cursor_pos))
 
     def draw_floating_panel(self, stdscr, h, w):
         p_h, p_w = 5, 60
@@ -263,6 +746,8 @@ class ModernTaskUI:
         if self.mode == "edit": title = "Edit Task"
         elif self.mode == "input": title = f"New Task - Priority: {self.input_priority.upper()}"
         elif self.mode == "confirm_delete": title = "Confirm Deletion"
+        elif self.mode == "search":
+            return self.draw_search_panel(stdscr, h, w)
         
         self.safe_addstr(stdscr, p_y + 1, p_x + 2, title, bg_attr | curses.A_BOLD)
 
@@ -278,6 +763,28 @@ class ModernTaskUI:
             opts = "(y)es / (n)o"
             self.safe_addstr(stdscr, p_y + 3, p_x + (p_w - len(opts)) // 2, opts, bg_attr)
 
+    def draw_search_panel(self, stdscr, h, w):
+        rows = max(1, len(self.search_results))
+        p_h, p_w = 5 + rows, 60
+        p_y, p_x = (h - p_h) // 2, (w - p_w) // 2
+        bg_attr = curses.color_pair(9)
+        for i in range(p_h): self.safe_addstr(stdscr, p_y + i, p_x, " " * p_w, bg_attr)
+
+        found = len(self.search_results)
+        title = "Search" if not self.input_text.strip() else f"Search - {'best ' if found == self.SEARCH_RESULTS else ''}{found} match{'es' if found != 1 else ''}"
+        self.safe_addstr(stdscr, p_y + 1, p_x + 2, title, bg_attr | curses.A_BOLD)
+        for i, task in enumerate(self.search_results):
+            line = f"{'[✓]' if task.completed else '[ ]'} #{task.id} {task.text}"
+            if len(line) > p_w - 4: line = line[:p_w - 5] + "…"
+            attr = bg_attr | curses.A_REVERSE if i == self.search_choice else bg_attr
+            self.safe_addstr(stdscr, p_y + 4 + i, p_x + 2, line.ljust(p_w - 4), attr)
+
+        input_y = p_y + 2
+        self.safe_addstr(stdscr, input_y, p_x + 2, "/ ", bg_attr)
+        self.safe_addstr(stdscr, input_y, p_x + 4, self.input_text, bg_attr | curses.A_UNDERLINE)
+        curses.curs_set(1)
+        stdscr.move(input_y, p_x + 4 + self.cursor_pos)
+
     def draw_help_panel(self, stdscr, h, w):
         lines = [
             "~ TASKMAN HELP ~",
@@ -285,6 +792,9 @@ class ModernTaskUI:
             "  n, e, d    New, Edit, Delete task",
             "  space      Toggle task completion",
             "  s          Cycle sort mode",
+            "  f          Search tasks (enter jumps)",
+            "  /          Fuzzy filter (enter jumps)",
+            "  t          Project and tag sidebar",
             "  tab        Cycle priority (in new mode)",
             "  ↑/↓, k/j   Navigate tasks",
             "  pgup/pgdn  Page up/down",
@@ -308,14 +818,23 @@ class ModernTaskUI:
         if key == ord('q'): return True
         elif key == ord('n'): self.mode = "input"; self.input_text = ""; self.cursor_pos = 0; self.input_priority = "normal"
         elif key == ord('e'):
-            if self.task_manager.tasks: self.mode = "edit"; self.input_text = self.task_manager.tasks[self.task_manager.selected_index].text; self.cursor_pos = len(self.input_text)
+            if self.task_manager.tasks:
+                # Tags and project are edited as words of the text (see task_tags)
+                task = self.task_manager.tasks[self.task_manager.selected_index]
+                words = [task.text, format_tags(task.tags, task.project), format_dates(task.due, task.scheduled)]
+                self.mode = "edit"; self.input_text = " ".join(filter(None, words)); self.cursor_pos = len(self.input_text)
         elif key == ord('d'):
             if self.task_manager.tasks: self.mode = "confirm_delete"
         elif key == ord(' '):
             if self.task_manager.tasks: self.task_manager.toggle_task(self.task_manager.selected_index)
+        elif key == ord('f'): self.mode = "search"; self.input_text = ""; self.cursor_pos = 0; self.search_results = []; self.search_choice = 0
+        elif key == ord('/'):
+            self.mode = "filter"; self.input_text = ""; self.cursor_pos = 0; self.show_help = False
+            self.filter = FuzzyFilter(self.task_manager.tasks); self.filter_choice = 0
         elif key == ord('s'):
             self.task_manager.cycle_sort_mode(); self.set_status_message(f"Sort: {self.task_manager.sort_mode}")
         elif key == ord('h'): self.show_help = not self.show_help
+        elif key == ord('t'): self.show_tags = not self.show_tags
         elif key in [curses.KEY_UP, ord('k')]:
             if self.task_manager.tasks and self.task_manager.selected_index > 0: self.task_manager.selected_index -= 1
         elif key in [curses.KEY_DOWN, ord('j')]:
@@ -328,9 +847,9 @@ class ModernTaskUI:
             if self.task_manager.tasks: self.task_manager.selected_index = len(self.task_manager.tasks) - 1
         return False
 
-    def handle_panel_mode(self, key):
+    def handle_panel_mode(self, key, page_size=1):
         if key == 27:
-            self.mode = "normal"; curses.curs_set(0); self.set_status_message("Cancelled.")
+            self.mode = "normal"; curses.curs_set(0); self.close_filter(); self.set_status_message("Cancelled.")
         elif self.mode in ["input", "edit"]:
             if key in [ord('\n'), ord('\r')]:
                 if self.input_text.strip():
@@ -344,17 +863,34 @@ class ModernTaskUI:
             elif key == ord('\t') and self.mode == "input":
                 priorities = ["normal", "high", "low"]
                 self.input_priority = priorities[(priorities.index(self.input_priority) + 1) % len(priorities)]
-            elif key in [curses.KEY_BACKSPACE, 127]:
-                if self.cursor_pos > 0:
-                    self.input_text = self.input_text[:self.cursor_pos-1] + self.input_text[self.cursor_pos:]
-                    self.cursor_pos -= 1
-            elif key == curses.KEY_LEFT:
-                if self.cursor_pos > 0: self.cursor_pos -= 1
-            elif key == curses.KEY_RIGHT:
-                if self.cursor_pos < len(self.input_text): self.cursor_pos += 1
-            elif 32 <= key <= 126:
-                self.input_text = self.input_text[:self.cursor_pos] + chr(key) + self.input_text[self.cursor_pos:]
-                self.cursor_pos += 1
+            else: self.edit_input(key)
+        elif self.mode == "search":
+            if key in [ord('\n'), ord('\r')]:
+                tasks = self.task_manager.tasks
+                if self.search_results:
+                    task = self.search_results[self.search_choice]
+                    # It may have been deleted by another process since the results were drawn
+                    if task.id in tasks.by_id:
+                        self.task_manager.selected_index = tasks.index(tasks.by_id[task.id])
+                self.mode = "normal"; curses.curs_set(0)
+            elif key == curses.KEY_UP: self.search_choice = max(0, self.search_choice - 1)
+            elif key == curses.KEY_DOWN: self.search_choice = min(max(0, len(self.search_results) - 1), self.search_choice + 1)
+            elif self.edit_input(key):
+                self.search_results = self.task_manager.search_tasks(self.input_text, self.SEARCH_RESULTS)
+                self.search_choice = 0
+        elif self.mode == "filter":
+            results = self.filter.results
+            if key in [ord('\n'), ord('\r')]:
+                tasks = self.task_manager.tasks
+                if results and results[self.filter_choice].id in tasks.by_id:
+                    self.task_manager.selected_index = tasks.index(tasks.by_id[results[self.filter_choice].id])
+                self.mode = "normal"; curses.curs_set(0); self.close_filter()
+            elif key == curses.KEY_UP: self.filter_choice = max(0, self.filter_choice - 1)
+            elif key == curses.KEY_DOWN: self.filter_choice = min(max(0, len(results) - 1), self.filter_choice + 1)
+            elif key == curses.KEY_PPAGE: self.filter_choice = max(0, self.filter_choice - page_size)
+            elif key == curses.KEY_NPAGE: self.filter_choice = min(max(0, len(results) - 1), self.filter_choice + page_size)
+            elif self.edit_input(key):
+                self.filter.update(self.input_text); self.filter_choice = 0
         elif self.mode == "confirm_delete":
             if key == ord('y'):
                 self.task_manager.delete_task(self.task_manager.selected_index)
@@ -363,12 +899,32 @@ class ModernTaskUI:
                 self.set_status_message("Deletion cancelled.")
             self.mode = "normal"
 
-    def draw_small_terminal_message(self, stdscr, h, w):
-        stdscr.clear(); msg = "Terminal too small"
-        self.safe_addstr(stdscr, h // 2, (w - len(msg)) // 2, msg); stdscr.refresh()
+    def close_filter(self):
+        if self.filter: self.filter.close(); self.filter = None
+
+    def edit_input(self, key) -> bool:
+        """Apply a line-editing key to input_text; True if the text changed"""
+        if key in [curses.KEY_BACKSPACE, 127]:
+            if self.cursor_pos > 0:
+                self.input_text = self.input_text[:self.cursor_pos-1] + self.input_text[self.cursor_pos:]
+                self.cursor_pos -= 1
+                return True
+        elif key == curses.KEY_LEFT:
+            if self.cursor_pos > 0: self.cursor_pos -= 1
+        elif key == curses.KEY_RIGHT:
+            if self.cursor_pos < len(self.input_text): self.cursor_pos += 1
+        elif 32 <= key <= 126:
+            self.input_text = self.input_text[:self.cursor_pos] + chr(key) + self.input_text[self.cursor_pos:]
+            self.cursor_pos += 1
+            return True
+        return False
+
+    def draw_small_terminal_message(self, screen):
+        screen.begin(); h, w = screen.getmaxyx(); msg = "Terminal too small"
+        self.safe_addstr(screen, h // 2, (w - len(msg)) // 2, msg); screen.present()
 
 def main():
-    try: curses.wrapper(ModernTaskUI(ModernTaskManager()).run)
+    try: curses.wrapper(ModernTaskUI(ModernTaskManager(lazy=True)).run)
     except curses.error as e: print(f"Curses error: {e}")
     except KeyboardInterrupt: print("Exiting.")
 
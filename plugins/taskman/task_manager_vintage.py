@@ -17,181 +17,295 @@ Features:
 """
 
 import curses
-import json
 import os
 import random
 import time
-from datetime import datetime, timezone
-from typing import List, Dict, Optional
+from contextlib import contextmanager
+from typing import Callable, List, Dict, Optional, Set, Tuple
 
 # Import the separate animation module
 from dino_animation import DinoAnimation
-
-def humanize_time_delta(created_at: str) -> str:
-    """Convert ISO timestamp to human-readable time delta using local timezone"""
-    try:
-        # Handle different timestamp formats
-        if created_at.endswith('Z'):
-            # UTC timestamp with Z suffix
-            created = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-        elif '+' in created_at or created_at.count('-') > 2:
-            # Already has timezone info
-            created = datetime.fromisoformat(created_at)
-        else:
-            # Assume local time if no timezone info
-            created = datetime.fromisoformat(created_at)
-            # If no timezone info, assume it's local time
-            if created.tzinfo is None:
-                created = created.replace(tzinfo=datetime.now().astimezone().tzinfo)
-        
-        # Convert to local timezone for comparison
-        if created.tzinfo is not None:
-            created = created.astimezone()
-        
-        now = datetime.now().astimezone()
-        delta = now - created
-
-        # Handle negative deltas (future timestamps)
-        if delta.total_seconds() < 0:
-            return "future"
-
-        days = delta.days
-        hours = delta.seconds // 3600
-        minutes = (delta.seconds % 3600) // 60
-
-        if days > 0:
-            return f"{days}d"
-        elif hours > 0:
-            return f"{hours}h"
-        elif minutes > 0:
-            return f"{minutes}m"
-        else:
-            return "now"
-    except Exception as e:
-        # For debugging - you can remove this in production
-        return f"?({str(e)[:10]})"
-
-class Task:
-    def __init__(self, id: int, text: str, completed: bool = False, priority: str = "normal", created_at: str = None):
-        self.id = id
-        self.text = text
-        self.completed = completed
-        self.priority = priority  # "high", "normal", "low"
-        # Use timezone-aware datetime to avoid timezone confusion
-        self.created_at = created_at or datetime.now().astimezone().isoformat()
-
-    def to_dict(self) -> Dict:
-        return {
-            "id": self.id,
-            "text": self.text,
-            "completed": self.completed,
-            "priority": self.priority,
-            "created_at": self.created_at
-        }
-
-    @classmethod
-    def from_dict(cls, data: Dict) -> 'Task':
-        return cls(
-            id=data["id"],
-            text=data["text"],
-            completed=data["completed"],
-            priority=data.get("priority", "normal"),
-            created_at=data.get("created_at")
-        )
+from task_collection import SORT_MODES, TaskCollection
+from task_counts import TaskCounts
+from task_events import AUTOSAVE, MINUTE, POLL, STATUS, TICK, EventLoop, next_minute
+from task_loader import BackgroundLoader
+from task_model import Task, intern_priority
+from task_screen import LineCache, Screen
+from task_store import open_store
+from task_time import Humanizer
+from task_watch import POLL_INTERVAL, open_watcher
+from task_writer import BackgroundWriter
 
 class VintageTaskManager:
-    def __init__(self, data_file: str = None):
+    def __init__(self, data_file: str = None, lazy: bool = False):
         # Use environment variable or default path
         self.data_file = data_file or os.environ.get('TASKMAN_DATA_FILE', os.path.expanduser("~/.taskman/tasks.json"))
-        self.tasks: List[Task] = []
+        self.store = open_store(self.data_file)
+        self.tasks = TaskCollection()  # Ordered pending/completed partitions with id index
         self.selected_index = 0
         self.next_id = 1
         self.sort_mode = "default"  # "default", "priority", "alphabetical"
-        self.load_tasks()
+        self.writer = None  # BackgroundWriter, attached by the UI
+        self.loader = None  # BackgroundLoader while the UI streams tasks in
+        self.loaded = False
+        self._counts = None  # TaskCounts, kept current once computed
+        self._transactions = 0  # Nesting depth of transaction()
+        self.version = 0  # Bumped on every change to the tasks, ours or merged, so the UI redraws in O(1)
+        if lazy:
+            # Only the metadata for now; the UI streams the tasks in with start_loading()
+            meta = self.store.load_meta()
+            self.next_id, self.sort_mode = meta["next_id"], meta["sort_mode"]
+        else:
+            self.load_tasks()
 
     def load_tasks(self):
-        """Load tasks from JSON file"""
-        if os.path.exists(self.data_file):
+        """Load tasks from the snapshot and replay the journal"""
+        data = self.store.load()
+        self.next_id = data["next_id"]
+        self.sort_mode = data["sort_mode"]
+        self.tasks = TaskCollection((Task.from_dict(task_data) for task_data in data["tasks"]), self.sort_mode)
+        self.loaded = True
+        self._counts = None
+        self.version += 1
+
+    def start_loading(self, first_count: int):
+        """Load the first page now and the remaining tasks in the background"""
+        self.loader = BackgroundLoader(self.store, first_count)
+        self.sort_mode = self.loader.meta["sort_mode"]
+        self.tasks = TaskCollection(self.loader.first, self.sort_mode)
+        self.loaded = True
+        self.version += 1
+
+    def poll_loading(self) -> bool:
+        """Start/finish a background load; True once the full task set is swapped in"""
+        if self.loader is None:
+            return False
+        self.loader.start()
+        if not self.loader.done():
+            return False
+        self.wait_loaded()
+        return True
+
+    def wait_loaded(self):
+        """Block until a background load finishes (before any mutation)"""
+        if self.loader is None:
+            return
+        loader, self.loader = self.loader, None
+        self.tasks = loader.join()
+        self.next_id, self.sort_mode = loader.meta["next_id"], loader.meta["sort_mode"]
+        self.store.adopt(loader.meta)
+        self._counts = None
+        self.version += 1
+        if self.selected_index >= len(self.tasks):
+            self.selected_index = max(0, len(self.tasks) - 1)
+
+    def sync(self) -> Optional[Set[int]]:
+        """Merge changes other processes made since we last looked
+
+        Returns the IDs of the tasks they touched (empty if none), or None
+        when the whole list may differ (a reload or a new sort mode).
+        """
+        records = self.store.sync()
+        if records == []:
+            return set()
+        selected = None
+        if self.selected_index < len(self.tasks):
+            selected = self.tasks[self.selected_index].id
+        changed: Optional[Set[int]] = set()
+        if records is None:
+            # Some of them are only in a snapshot by now: re-read everything
+            self.load_tasks()
+            changed = None
+        else:
+            for record in records:
+                op = record.get("op")
+                if op == "add":
+                    self.next_id = max(self.next_id, record["task"]["id"] + 1)
+                elif op == "meta":
+                    if "next_id" in record:
+                        self.next_id = max(self.next_id, record["next_id"])
+                    if record.get("sort_mode", self.sort_mode) != self.sort_mode:
+                        self.sort_mode = record["sort_mode"]
+                        self.sort_tasks()
+                        changed = None
+                if self.tasks.apply_record(record) and changed is not None:
+                    changed.add(record["task"]["id"] if op == "add" else record["id"])
+        self._counts = None
+        self.version += 1
+        # Keep the same task selected while other rows move around it
+        if selected is not None and selected in self.tasks.by_id:
+            self.selected_index = self.tasks.index(self.tasks.by_id[selected])
+        elif self.selected_index >= len(self.tasks):
+            self.selected_index = max(0, len(self.tasks) - 1)
+        return changed
+
+    @contextmanager
+    def transaction(self):
+        """Hold the store's write lock around one mutation, after merging other writers' changes"""
+        self.wait_loaded()
+        with self.store.locked():
+            if self._transactions == 0:
+                self.sync()
+            self._transactions += 1
             try:
-                with open(self.data_file, 'r') as f:
-                    data = json.load(f)
-                    self.tasks = [Task.from_dict(task_data) for task_data in data.get("tasks", [])]
-                    self.next_id = data.get("next_id", 1)
-                    self.sort_mode = data.get("sort_mode", "default")
-            except (json.JSONDecodeError, KeyError):
-                self.tasks = []
-                self.next_id = 1
-        
-        self.sort_tasks()
+                yield
+            finally:
+                self._transactions -= 1
+        # Compact after releasing the lock so other writers only wait for appends
+        if self._transactions == 0 and not self.writer and self.store.needs_compaction():
+            self.save_tasks()
+
+    @property
+    def counts(self) -> TaskCounts:
+        """Pending/completed/per-priority counts; read before mutating a task"""
+        if self._counts is None:
+            self.wait_loaded()
+            self._counts = TaskCounts.of(self.tasks)
+        return self._counts
 
     def save_tasks(self):
-        """Save tasks to JSON file"""
-        os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-        data = {
-            "tasks": [task.to_dict() for task in self.tasks],
-            "next_id": self.next_id,
-            "sort_mode": self.sort_mode
-        }
-        with open(self.data_file, 'w') as f:
-            json.dump(data, f, indent=2)
+        """Write a full snapshot of all tasks (compacts the journal); skipped while another process is"""
+        job = self.capture_snapshot()
+        if job:
+            job()
+
+    def capture_snapshot(self) -> Optional[Callable[[], None]]:
+        """Rotate the journal and return a job that writes the snapshot outside the lock"""
+        self.wait_loaded()
+        # Not transaction(), which would try to compact again on the way out
+        with self.store.locked():
+            self.sync()
+            if not self.store.begin_compaction():
+                return None
+            tasks, next_id, sort_mode, counts = list(self.tasks), self.next_id, self.sort_mode, self.counts
+            version = self.store.revision()
+
+        def job():
+            self.store.write_snapshot([task.to_dict() for task in tasks], next_id, sort_mode)
+            # The snapshot changed the stamp; the counts still hold unless someone wrote since the capture
+            self.store.write_counts(counts, version)
+        return job
+
+    def journal(self, record: Dict):
+        """Persist a single mutation and refresh the counts sidecar; call inside transaction()"""
+        self.store.append(record)
+        self.store.write_counts(self.counts)
+        self.version += 1
+        if self.writer:
+            self.writer.mark_dirty()
 
     def add_task(self, text: str, priority: str = "normal"):
         """Add a new task"""
-        task = Task(self.next_id, text, priority=priority)
-        self.tasks.append(task)
-        self.next_id += 1
-        self.sort_tasks()
-        self.save_tasks()
+        with self.transaction():
+            task = Task(self.next_id, text, priority=priority)
+            self.counts.add(task)
+            self.tasks.add(task)
+            self.next_id += 1
+            self.journal({"op": "add", "task": task.to_dict()})
+        return task
 
-    def toggle_task(self, index: int):
-        """Toggle task completion status"""
-        if 0 <= index < len(self.tasks):
-            self.tasks[index].completed = not self.tasks[index].completed
-            self.sort_tasks()
-            self.save_tasks()
+    def find_task(self, task_id: int) -> Optional[Task]:
+        """Look up a task by ID in O(1)"""
+        return self.tasks.get(task_id)
 
-    def delete_task(self, index: int):
-        """Delete a task"""
-        if 0 <= index < len(self.tasks):
-            del self.tasks[index]
+    def set_completed(self, task_id: int, completed: bool) -> Tuple[Optional[Task], bool]:
+        """Set the completion status of a task by ID; returns (task, changed)
+
+        (None, False) if there is no such task, changed is False if it
+        already had that status.
+        """
+        with self.transaction():
+            task = self.tasks.get(task_id)
+            if task is None or task.completed == completed:
+                return task, False
+            self._set_completed(task, completed)
+        return task, True
+
+    def toggle_task_by_id(self, task_id: int) -> Optional[Task]:
+        """Toggle task completion status by ID"""
+        with self.transaction():
+            task = self.tasks.get(task_id)
+            if task is not None:
+                self._set_completed(task, not task.completed)
+        return task
+
+    def _set_completed(self, task: Task, completed: bool):
+        """Change a task already looked up, inside transaction()"""
+        self.counts.remove(task)
+        task.completed = completed
+        task.revision += 1
+        self.counts.add(task)
+        self.tasks.reposition(task)
+        self.journal({"op": "set", "id": task.id, "fields": {"completed": completed}})
+
+    def set_priority_by_id(self, task_id: int, priority: str) -> Optional[Task]:
+        """Change the priority of a task by ID, keeping it selected if it was"""
+        with self.transaction():
+            task = self.tasks.get(task_id)
+            if task is None:
+                return None
+            was_selected = self.tasks.index(task) == self.selected_index
+            self.counts.remove(task)
+            task.priority = intern_priority(priority)
+            task.revision += 1
+            self.counts.add(task)
+            self.tasks.reposition(task)
+            if was_selected:
+                self.selected_index = self.tasks.index(task)
+            self.journal({"op": "set", "id": task_id, "fields": {"priority": priority}})
+        return task
+
+    def delete_task_by_id(self, task_id: int) -> Optional[Task]:
+        """Delete a task by ID"""
+        with self.transaction():
+            task = self.tasks.get(task_id)
+            if task is None:
+                return None
+            self.counts.remove(task)
+            self.tasks.remove(task)
             if self.selected_index >= len(self.tasks) and self.tasks:
                 self.selected_index = len(self.tasks) - 1
             elif not self.tasks:
                 self.selected_index = 0
-            self.save_tasks()
+            self.journal({"op": "del", "id": task_id})
+        return task
+
+    def toggle_task(self, index: int):
+        """Toggle completion status of the task at a list position"""
+        if 0 <= index < len(self.tasks):
+            self.toggle_task_by_id(self.tasks[index].id)
+
+    def set_priority(self, index: int, priority: str):
+        """Change the priority of the task at a list position"""
+        if 0 <= index < len(self.tasks):
+            self.set_priority_by_id(self.tasks[index].id, priority)
+
+    def delete_task(self, index: int):
+        """Delete the task at a list position"""
+        if 0 <= index < len(self.tasks):
+            self.delete_task_by_id(self.tasks[index].id)
 
     def sort_tasks(self):
-        """Sort tasks based on current sort mode, with completed tasks always at bottom"""
-        # Separate completed and pending tasks
-        pending_tasks = [t for t in self.tasks if not t.completed]
-        completed_tasks = [t for t in self.tasks if t.completed]
-        
-        # Sort pending tasks based on mode
-        if self.sort_mode == "priority":
-            priority_order = {"high": 0, "normal": 1, "low": 2}
-            pending_tasks.sort(key=lambda t: priority_order.get(t.priority, 1))
-        elif self.sort_mode == "alphabetical":
-            pending_tasks.sort(key=lambda t: t.text.lower())
-        # "default" keeps creation order (no additional sorting)
-        
-        # Sort completed tasks the same way
-        if self.sort_mode == "priority":
-            completed_tasks.sort(key=lambda t: priority_order.get(t.priority, 1))
-        elif self.sort_mode == "alphabetical":
-            completed_tasks.sort(key=lambda t: t.text.lower())
-        
-        # Combine: pending first, then completed
-        self.tasks = pending_tasks + completed_tasks
+        """Re-sort everything under the current sort mode (completed tasks stay at bottom)"""
+        self.tasks.set_sort_mode(self.sort_mode)
+
+    def set_sort_mode(self, mode: str):
+        """Switch to a specific sort mode"""
+        with self.transaction():
+            self.sort_mode = mode
+            self.sort_tasks()
+            self.journal({"op": "meta", "sort_mode": mode})
 
     def cycle_sort_mode(self):
         """Cycle through sort modes"""
-        modes = ["default", "priority", "alphabetical"]
-        current_index = modes.index(self.sort_mode)
-        self.sort_mode = modes[(current_index + 1) % len(modes)]
-        self.sort_tasks()
-        self.save_tasks()
+        with self.transaction():
+            current_index = SORT_MODES.index(self.sort_mode)
+            self.set_sort_mode(SORT_MODES[(current_index + 1) % len(SORT_MODES)])
 
 class VintageTaskUI:
+    POLL_SECONDS = 0.05  # Wake-up interval while the background load runs or a snapshot write is in flight
+    STATUS_SECONDS = 2  # How long a status message replaces the control hints
+
     def __init__(self, task_manager: VintageTaskManager):
         self.task_manager = task_manager
         self.input_mode = False
@@ -199,18 +313,18 @@ class VintageTaskUI:
         self.input_priority = "normal"
         self.show_help = False
         self.dino_animation = None
+        self.humanizer = Humanizer()  # One "now" per frame, labels cached per minute
+        self.rows = LineCache()  # Formatted task lines, reused while their task and the minute stay the same
+        self.status_message = ""
+        self.status_message_time = 0
         
-        # 防闪烁优化
-        self.last_ui_hash = None
-        self.last_refresh_time = 0
-        self.min_refresh_interval = 0.05  # 50ms
-        self.force_refresh = False  # 强制刷新标志
+        # 防闪烁优化: redraw only when the tasks, the UI state or the clock moved on
+        self.dirty: Set[str] = set()  # UI state changed since the last frame: "selection", "input", "help", "dino", "status"
+        self.drawn_state = None  # (task version, size, minute, dino frame) of the frame on screen
 
     def run(self, stdscr):
         """Main application loop with vintage styling and responsive design"""
         curses.curs_set(0)  # Hide cursor
-        stdscr.nodelay(1)   # Non-blocking input
-        stdscr.timeout(80)  # Refresh rate
 
         # Check minimum terminal size
         height, width = stdscr.getmaxyx()
@@ -232,6 +346,9 @@ class VintageTaskUI:
             stdscr.getch()  # Wait for key press
             return
 
+        # Keys are read only once the event loop saw input, until none is left
+        stdscr.nodelay(1)
+
         # Initialize vintage color pairs
         curses.start_color()
         
@@ -281,99 +398,136 @@ class VintageTaskUI:
         height, width = stdscr.getmaxyx()
         self.dino_animation = DinoAnimation(max(20, width - 4))  # Ensure minimum width
 
-        # Main loop
-        while True:
-            # Check if terminal was resized
-            new_height, new_width = stdscr.getmaxyx()
-            if new_width < 60 or new_height < 20:
-                # Handle resize to too small
-                stdscr.clear()
-                error_msg = "Terminal too small!"
-                try:
-                    stdscr.addstr(new_height//2, max(0, (new_width - len(error_msg))//2), error_msg)
-                except curses.error:
-                    pass
-                stdscr.refresh()
-                key = stdscr.getch()
-                if key == ord('q'):
-                    break
-                continue
-            
-            self.draw_vintage_ui(stdscr)
-            
-            # Handle input
-            key = stdscr.getch()
-            if key == -1:  # No input
+        # Snapshots are written in the background once edits settle
+        writer = self.task_manager.writer = BackgroundWriter(self.task_manager)
+        # Paint the first screen as soon as it is parsed; the rest streams in behind it
+        if not self.task_manager.loaded:
+            self.task_manager.start_loading(height)
+        # Tells us when another shell or UI writes the store
+        watcher = open_watcher(self.task_manager.store.watch_files())
+        external_change = False
+        # Frames are drawn into this and only their changed lines reach the terminal
+        screen = Screen(stdscr)
+        # Sleeps until a key, a store change, a resize or the next timer
+        events = EventLoop(watcher)
+        try:
+            # Main loop
+            while True:
+                writer.tick()
+                # A snapshot that could not be written: the edits are still in the journal, but say so
+                error = writer.take_error()
+                if error:
+                    self.set_status_message(f"Save failed: {error}")
+                if self.status_message and time.time() - self.status_message_time >= self.STATUS_SECONDS:
+                    self.status_message = ""
+                    self.dirty.add("status")
                 if self.dino_animation:
                     self.dino_animation.update(self.task_manager.tasks)
-                continue
-                
-            if self.input_mode:
-                if self.handle_input_mode(key):
-                    break
-            else:
-                if self.handle_normal_mode(key):
-                    break
 
+                # Merge only the records other processes appended (after loading finishes)
+                if watcher.changed():
+                    external_change = True
+                if external_change and not self.task_manager.loader:
+                    external_change = False
+                    self.task_manager.sync()
 
-    def should_refresh_ui(self, tasks, width, height):
-        """判断是否需要刷新UI"""
-        import time
-        import hashlib
-        
-        current_time = time.time()
-        
-        # 检查强制刷新标志
-        if self.force_refresh:
-            self.force_refresh = False
-            self.last_refresh_time = current_time
-            return True
-        
-        if current_time - self.last_refresh_time < self.min_refresh_interval:
-            return False
-        
-        content_parts = [
-            f"tasks:{len(tasks)}",
-            f"completed:{sum(1 for t in tasks if t.completed)}",
-            f"selected:{self.task_manager.selected_index}",
-            f"size:{width}x{height}",
-            f"input:{self.input_mode}",
-            f"input_text:{self.input_text}",  # 添加输入文本检测
-            f"input_priority:{self.input_priority}",  # 添加输入优先级检测
-            f"help:{self.show_help}",
-        ]
-        
-        # 包含任务优先级信息以检测优先级变化
-        for i, task in enumerate(tasks):
-            content_parts.append(f"task_{i}_priority:{task.priority}")
-            content_parts.append(f"task_{i}_completed:{task.completed}")
-            content_parts.append(f"task_{i}_text:{task.text[:20]}")  # 只取前20个字符避免过长
-        
-        if self.dino_animation and self.dino_animation.is_enabled():
-            content_parts.append(f"dino:{self.dino_animation.current_mood}:{self.dino_animation.frame}")
-        
-        current_hash = hashlib.md5("|".join(content_parts).encode()).hexdigest()
-        if current_hash == self.last_ui_hash:
+                # Check if terminal was resized
+                new_height, new_width = stdscr.getmaxyx()
+                small = new_width < 60 or new_height < 20
+                if small:
+                    # Handle resize to too small
+                    screen.begin()
+                    error_msg = "Terminal too small!"
+                    try:
+                        screen.addstr(new_height//2, max(0, (new_width - len(error_msg))//2), error_msg)
+                    except curses.error:
+                        pass
+                    screen.present()
+                else:
+                    self.draw_vintage_ui(screen)
+                # After the draw, so the first page is on screen before the full load starts
+                if self.task_manager.poll_loading():
+                    self.dirty.add("tasks")
+
+                self.set_timers(events.timers, writer, watcher)
+                # The load finished after the draw: show it before sleeping
+                events.wait(time.time() if self.dirty and not small else events.timers.next())
+
+                # Handle input: every key that arrived, then one frame
+                while True:
+                    key = stdscr.getch()
+                    if key == -1:
+                        break
+                    if key == curses.KEY_RESIZE:
+                        continue
+                    if small:
+                        if key == ord('q'):
+                            return
+                        continue
+
+                    self.task_manager.wait_loaded()
+                    
+                    if self.input_mode:
+                        if self.handle_input_mode(key):
+                            return
+                    else:
+                        if self.handle_normal_mode(key):
+                            return
+        finally:
+            # Runs inside curses.wrapper, so the final flush finishes before teardown
+            events.close()
+            writer.close()
+            watcher.close()
+            self.task_manager.writer = None
+
+    def set_timers(self, timers, writer, watcher):
+        """Arm the deadlines the loop must wake up for; keys and store changes wake it anyway"""
+        now = time.time()
+        due = writer.due()
+        # Past due means a write is still in flight: look again shortly
+        timers.set(AUTOSAVE, None if due is None else max(due, now + self.POLL_SECONDS))
+        # Ages are shown per minute
+        timers.set(MINUTE, next_minute(now))
+        timers.set(STATUS, self.status_message_time + self.STATUS_SECONDS if self.status_message else None)
+        dino = self.dino_animation
+        timers.set(TICK, dino.last_update + 1.0 if dino and dino.is_enabled() else None)
+        # The background load, a snapshot write and the stat() watcher have no descriptor to wait on
+        if self.task_manager.loader or writer.busy():
+            timers.set(POLL, now + self.POLL_SECONDS)
+        else:
+            timers.set(POLL, now + POLL_INTERVAL if watcher.fileno() is None else None)
+
+    def set_status_message(self, message: str):
+        self.status_message, self.status_message_time = message, time.time()
+        self.dirty.add("status")
+
+    def should_refresh_ui(self, width, height):
+        """判断是否需要刷新UI: O(1), from the task version, the dirty UI state and the clock"""
+        dino = self.dino_animation
+        state = (self.task_manager.version, width, height, int(time.time() // 60),  # Ages are shown per minute
+                 dino and dino.is_enabled() and (dino.current_mood, dino.frame))
+        if not self.dirty and state == self.drawn_state:
             return False
-        
-        self.last_ui_hash = current_hash
-        self.last_refresh_time = current_time
+        self.dirty.clear()
+        self.drawn_state = state
         return True
 
-    def draw_vintage_ui(self, stdscr):
-        """Draw the vintage-styled user interface"""
-        height, width = stdscr.getmaxyx()
+    def draw_vintage_ui(self, screen):
+        """Draw the vintage-styled user interface into screen, which sends only the lines that changed"""
+        height, width = screen.window.getmaxyx()
         
-        if not self.should_refresh_ui(self.task_manager.tasks, width, height):
+        if not self.should_refresh_ui(width, height):
             return
         
-        stdscr.clear()
+        screen.begin()
+        self.humanizer.begin_frame()
+        self.rows.follow(self.task_manager.tasks)
 
         # Vintage header with decorative elements
-        self.draw_vintage_header(stdscr, width)
+        self.draw_vintage_header(screen, width)
         
         # Task statistics
-        self.draw_task_stats(stdscr, width)
+        self.draw_task_stats(screen, width)
         
         # Check for celebration message
         if self.dino_animation and self.dino_animation.is_enabled():
@@ -383,23 +537,23 @@ class VintageTaskUI:
                 pass
         
         # Tasks list with vintage styling
-        self.draw_vintage_tasks(stdscr, height, width)
+        self.draw_vintage_tasks(screen, height, width)
         
         # Input area
         if self.input_mode:
-            self.draw_vintage_input(stdscr, height, width)
+            self.draw_vintage_input(screen, height, width)
         
         # Help panel
         if self.show_help:
-            self.draw_vintage_help(stdscr, height, width)
+            self.draw_vintage_help(screen, height, width)
         
         # Animation is now integrated into status bar
         # (removed redundant draw_dino_animation function)
         
         # Vintage status bar with smart dino integration
-        self.draw_vintage_status(stdscr, height, width)
+        self.draw_vintage_status(screen, height, width)
         
-        stdscr.refresh()
+        screen.present()
 
     def draw_vintage_header(self, stdscr, width):
         """Draw retro minimal header - clean and simple"""
@@ -412,7 +566,7 @@ class VintageTaskUI:
             if width > 60 and self.dino_animation and self.dino_animation.is_enabled():
                 # Get productivity status
                 total_tasks = len(self.task_manager.tasks)
-                completed_tasks = len([t for t in self.task_manager.tasks if t.completed])
+                completed_tasks = len(self.task_manager.tasks.completed)
                 
                 if total_tasks > 0:
                     completion_rate = completed_tasks / total_tasks
@@ -439,8 +593,8 @@ class VintageTaskUI:
 
     def draw_task_stats(self, stdscr, width):
         """Draw minimal task statistics - clean and informative"""
-        pending_count = len([t for t in self.task_manager.tasks if not t.completed])
-        completed_count = len([t for t in self.task_manager.tasks if t.completed])
+        pending_count = len(self.task_manager.tasks.pending)
+        completed_count = len(self.task_manager.tasks.completed)
         
         # Responsive stats text - simple and clean
         if width >= 80:
@@ -461,9 +615,9 @@ class VintageTaskUI:
         current_y = start_y
         max_y = height - 4  # Leave room for controls
         
-        # Separate active and completed tasks
-        active_tasks = [t for t in self.task_manager.tasks if not t.completed]
-        completed_tasks = [t for t in self.task_manager.tasks if t.completed]
+        # Active and completed tasks are already partitioned by the collection
+        active_tasks = self.task_manager.tasks.pending
+        completed_tasks = self.task_manager.tasks.completed
         
         # Draw ACTIVE section
         if active_tasks and current_y < max_y:
@@ -499,6 +653,27 @@ class VintageTaskUI:
 
     def draw_minimal_task_line(self, stdscr, task, index, y, width, is_completed):
         """Draw minimal task line with clean icons and layout"""
+        text, color, time_text = self.rows.get(task, width, int(self.humanizer.now // 60),
+                                               lambda: self.format_minimal_task_line(task, width, is_completed))
+        
+        # Selection highlight
+        if index == self.task_manager.selected_index:
+            color |= curses.A_REVERSE
+        
+        try:
+            # Draw icon and task text
+            stdscr.addstr(y, 2, text, color)
+            
+            # Right-aligned time (if there's space)
+            if width > 40:
+                time_x = width - len(time_text) - 2
+                stdscr.addstr(y, time_x, time_text, curses.color_pair(13) | curses.A_DIM)
+                
+        except curses.error:
+            pass
+
+    def format_minimal_task_line(self, task, width, is_completed):
+        """(icon and text, color, time) of a task line, short of the selection highlight"""
         
         # Simple priority icons
         if is_completed:
@@ -520,12 +695,8 @@ class VintageTaskUI:
             else:
                 color = curses.color_pair(4)  # Yellow
         
-        # Selection highlight
-        if index == self.task_manager.selected_index:
-            color |= curses.A_REVERSE
-        
         # Time formatting
-        time_ago = humanize_time_delta(task.created_at)
+        time_ago = self.humanizer.label(task.created_ts)
         if time_ago == "now":
             time_text = "now"
         elif time_ago == "future":
@@ -544,17 +715,7 @@ class VintageTaskUI:
         else:
             task_text = task.text
         
-        try:
-            # Draw icon and task text
-            stdscr.addstr(y, 2, f"{icon} {task_text}", color)
-            
-            # Right-aligned time (if there's space)
-            if width > 40:
-                time_x = width - len(time_text) - 2
-                stdscr.addstr(y, time_x, time_text, curses.color_pair(13) | curses.A_DIM)
-                
-        except curses.error:
-            pass
+        return f"{icon} {task_text}", color, time_text
 
     def draw_vintage_input(self, stdscr, height, width):
         """Draw minimal input area - clean and focused"""
@@ -572,6 +733,8 @@ class VintageTaskUI:
             max_input_width = width - len(prompt) - 4
             display_text = self.input_text[:max_input_width] if len(self.input_text) > max_input_width else self.input_text
             stdscr.addstr(input_y, 2 + len(prompt), display_text, curses.color_pair(6))
+            # Where the cursor is left once the frame is on the terminal
+            stdscr.move(input_y, 2 + len(prompt) + len(display_text))
             
             # Priority indicator on next line
             priority_icons = {"high": "▲", "normal": "■", "low": "▼"}
@@ -783,7 +946,9 @@ class VintageTaskUI:
             pass
         
         # Context-aware controls
-        if self.input_mode:
+        if self.task_manager.loader:
+            controls = "loading tasks..."
+        elif self.input_mode:
             controls = "enter:save  esc:cancel  tab:priority"
         elif self.show_help:
             controls = "h:hide help  q:quit"
@@ -796,10 +961,14 @@ class VintageTaskUI:
             else:
                 controls = "n:new  space:toggle  d:delete  q:quit"
         
+        attr = curses.color_pair(13) | curses.A_DIM
+        if self.status_message:
+            controls, attr = self.status_message[:max(0, width - 4)], curses.color_pair(3) | curses.A_BOLD
+
         # Center the controls
         try:
             control_x = max(0, (width - len(controls)) // 2)
-            stdscr.addstr(control_y, control_x, controls, curses.color_pair(13) | curses.A_DIM)
+            stdscr.addstr(control_y, control_x, controls, attr)
         except curses.error:
             pass
 
@@ -811,6 +980,7 @@ class VintageTaskUI:
             self.input_mode = True
             self.input_text = ""
             self.input_priority = "normal"
+            self.dirty.add("input")
         elif key == ord(' '):
             if self.task_manager.tasks:
                 self.task_manager.toggle_task(self.task_manager.selected_index)
@@ -820,37 +990,35 @@ class VintageTaskUI:
         elif key == ord('s'):
             self.task_manager.cycle_sort_mode()
         elif key == ord('p'):
-            self.task_manager.sort_mode = "priority"
-            self.task_manager.sort_tasks()
-            self.task_manager.save_tasks()
+            self.task_manager.set_sort_mode("priority")
         elif key == ord('a'):
-            self.task_manager.sort_mode = "alphabetical"
-            self.task_manager.sort_tasks()
-            self.task_manager.save_tasks()
+            self.task_manager.set_sort_mode("alphabetical")
         elif key == 9:  # TAB key
             # 循环切换选中任务的优先级
             if self.task_manager.tasks:
                 selected_task = self.task_manager.tasks[self.task_manager.selected_index]
                 if selected_task.priority == 'low':
-                    selected_task.priority = 'normal'
+                    new_priority = 'normal'
                 elif selected_task.priority == 'normal':
-                    selected_task.priority = 'high'
+                    new_priority = 'high'
                 else:  # high
-                    selected_task.priority = 'low'
-                self.task_manager.save_tasks()
-                # 强制刷新UI以立即显示优先级变化
-                self.force_refresh = True
+                    new_priority = 'low'
+                self.task_manager.set_priority(self.task_manager.selected_index, new_priority)
         elif key == ord('h'):
             self.show_help = not self.show_help
+            self.dirty.add("help")
         elif key == ord('x'):
             if self.dino_animation:
                 self.dino_animation.toggle_animation()
+                self.dirty.add("dino")
         elif key == curses.KEY_UP or key == ord('k'):
             if self.task_manager.tasks and self.task_manager.selected_index > 0:
                 self.task_manager.selected_index -= 1
+                self.dirty.add("selection")
         elif key == curses.KEY_DOWN or key == ord('j'):
             if self.task_manager.tasks and self.task_manager.selected_index < len(self.task_manager.tasks) - 1:
                 self.task_manager.selected_index += 1
+                self.dirty.add("selection")
         
         return False
 
@@ -880,15 +1048,15 @@ class VintageTaskUI:
             self.input_text += chr(key)
             refresh_needed = True
         
-        # Force refresh when in input mode to show typing immediately
+        # Show typing immediately
         if refresh_needed:
-            self.last_ui_state = None  # Force UI refresh
+            self.dirty.add("input")
         
         return False
 
 def main():
     """Main entry point with minimal curses checking"""
-    task_manager = VintageTaskManager()
+    task_manager = VintageTaskManager(lazy=True)
     ui = VintageTaskUI(task_manager)
     
     try:
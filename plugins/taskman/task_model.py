@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Taskman Task Model - Compact task record shared by the UIs and CLI
+
+Task uses __slots__ instead of a per-instance __dict__, and priorities are
+interned so every task shares one of three string objects instead of each
+holding its own copy decoded from JSON. Together that keeps the resident
+size of large task sets about a quarter below the old layout (see
+`taskman_bench.py memory`).
+
+`created_ts` is derived from `created_at` on each use rather than kept: a
+float per task cost ~8% of a loaded task set, while the UIs parse only
+the rows they format, about once a minute each (see task_screen.LineCache).
+
+Tags and the project (see task_tags) are interned like priorities, and
+to_dict() leaves them out when empty, so untagged tasks are stored exactly
+as before. So are `due` and `scheduled` (see task_due), kept as the stored
+strings; their timestamps come from a shared parse cache rather than two
+more slots per task. Most tasks have none of these four, so they share one
+slot that is None until one is set.
+
+`revision` counts in-place edits, so the UIs can cache a formatted row
+under (id, revision) and know when it is stale (see task_screen.LineCache).
+Whoever changes a field of a live task bumps it.
+"""
+
+import sys
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from task_due import due_timestamp, scheduled_timestamp
+from task_time import parse_timestamp
+
+PRIORITIES = ("high", "normal", "low")
+_INTERNED_PRIORITIES = {priority: priority for priority in PRIORITIES}
+
+
+def intern_priority(priority: str) -> str:
+    """Return the shared string object for a priority value"""
+    return _INTERNED_PRIORITIES.get(priority) or sys.intern(priority)
+
+
+def intern_tags(tags: Iterable[str]) -> Tuple[str, ...]:
+    """Distinct tags in order, as shared string objects (most tasks repeat a few tags)"""
+    return tuple(dict.fromkeys(map(sys.intern, tags)))
+
+
+_NO_EXTRA = ((), None, None, None)
+
+
+def _extra_field(i: int, doc: str) -> property:
+    """tags, project, due or scheduled: one of the fields most tasks leave empty, kept in Task._extra"""
+    def get(self):
+        return (self._extra or _NO_EXTRA)[i]
+
+    def set(self, value):
+        extra = list(self._extra or _NO_EXTRA)
+        extra[i] = value
+        self._extra = tuple(extra) if any(extra) else None
+    return property(get, set, doc=doc)
+
+
+class Task:
+    # tags, project, due and scheduled share the _extra slot: None for the many tasks without any
+    __slots__ = ("id", "text", "completed", "priority", "created_at", "_extra", "revision")
+
+    def __init__(self, id: int, text: str, completed: bool = False, priority: str = "normal", created_at: str = None,
+                 tags: Iterable[str] = (), project: Optional[str] = None, due: Optional[str] = None,
+                 scheduled: Optional[str] = None):
+        self.id = id
+        self.text = text
+        self.completed = completed
+        self.priority = intern_priority(priority)  # "high", "normal", "low"
+        tags = intern_tags(tags) if tags else ()
+        project = sys.intern(project) if project else None
+        self._extra = (tags, project, due or None, scheduled or None) if tags or project or due or scheduled else None
+        self.revision = 0
+        # Use timezone-aware datetime to avoid timezone confusion
+        self.created_at = created_at or datetime.now().astimezone().isoformat()
+
+    tags = _extra_field(0, "Interned tags, in order")
+    project = _extra_field(1, "Interned project name, or None")
+    due = _extra_field(2, "Due time as stored (see task_due), or None")
+    scheduled = _extra_field(3, "Scheduled time as stored, or None")
+
+    @property
+    def created_ts(self) -> Optional[float]:
+        """created_at in epoch seconds (None if it does not parse)"""
+        return parse_timestamp(self.created_at)
+
+    @property
+    def due_ts(self) -> Optional[float]:
+        """When the task becomes overdue (the end of the day for a bare date)"""
+        return due_timestamp(self.due)
+
+    @property
+    def scheduled_ts(self) -> Optional[float]:
+        return scheduled_timestamp(self.scheduled)
+
+    def __repr__(self) -> str:
+        return f"Task(id={self.id!r}, text={self.text!r}, completed={self.completed!r}, priority={self.priority!r})"
+
+    def to_dict(self) -> Dict:
+        data = {
+            "id": self.id,
+            "text": self.text,
+            "completed": self.completed,
+            "priority": self.priority,
+            "created_at": self.created_at
+        }
+        if self.tags:
+            data["tags"] = list(self.tags)
+        if self.project:
+            data["project"] = self.project
+        if self.due:
+            data["due"] = self.due
+        if self.scheduled:
+            data["scheduled"] = self.scheduled
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Task':
+        return cls(
+            id=data["id"],
+            text=data["text"],
+            completed=data.get("completed", False),
+            priority=data.get("priority", "normal"),
+            created_at=data.get("created_at"),
+            tags=data.get("tags") or (),
+            project=data.get("project"),
+            due=data.get("due"),
+            scheduled=data.get("scheduled")
+        )
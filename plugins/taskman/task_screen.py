@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Taskman Screen - Repaint only the terminal lines that changed
+
+Both UIs used to clear the window and draw every line for every frame.
+stdscr.clear() also tells curses the terminal is garbage, so the next
+refresh rewrote the whole screen: moving the selection one row sent over
+a kilobyte.
+
+Screen stands in for the curses window while a frame is drawn. It takes
+the same addstr/move/getmaxyx calls but only records them: each line
+keeps its (x, text, attr) runs in drawing order, so a panel drawn over
+the list still wins. present() compares every line with the frame on the
+terminal and rewrites just the ones that differ (cleared, then its runs
+replayed), then sends them with one doupdate(). Moving the selection
+repaints its old and its new row; a frame with nothing new sends nothing.
+A resize starts over from a cleared terminal.
+
+LineCache keeps what goes into those runs for each task row: formatting a
+row (truncation, padding, humanized ages, tag and due labels, colors) is
+most of a frame's work, and almost every row is the same as last frame.
+Rows are keyed by (task ID, revision, width, minute), so an edit, a resize
+or the clock moving on each make a fresh row and nothing has to be
+invalidated by hand; the least recently used rows go once it is full, and
+all of them when the width changes or the tasks are loaded afresh (their
+revisions start over).
+"""
+
+import curses
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+# Formatted rows kept by a LineCache: a few screens' worth
+LINE_CACHE_SIZE = 1024
+
+_Run = Tuple[int, str, int]
+
+
+class Screen:
+    """The frame being drawn and the frame on the terminal, line by line"""
+
+    def __init__(self, window):
+        self.window = window
+        self.size = (0, 0)
+        self.lines: List[List[_Run]] = []
+        # Runs per line as last presented; None for a line the terminal may not show as we think
+        self.shown: List[Optional[List[_Run]]] = []
+        self.cursor: Optional[Tuple[int, int]] = None
+        self.repainted = 0  # Lines the last present() rewrote
+
+    def begin(self):
+        """Start an empty frame at the window's current size"""
+        size = self.window.getmaxyx()
+        if size != self.size:
+            self.size = size
+            self.invalidate()
+        self.lines = [[] for _ in range(size[0])]
+        self.cursor = None
+
+    def invalidate(self):
+        """Forget what the terminal shows (after a resize, or drawing past this Screen)"""
+        self.shown = [None] * self.size[0]
+        self.window.clear()
+
+    # The subset of the curses window API the draw methods use
+
+    def getmaxyx(self) -> Tuple[int, int]:
+        return self.size
+
+    def addstr(self, y: int, x: int, text: str, attr: int = 0):
+        """Record text on line y; like curses, raises curses.error off the window"""
+        h, w = self.size
+        if not (0 <= y < h and 0 <= x < w):
+            raise curses.error("addstr() off the window")
+        self.lines[y].append((x, text[:w - x], attr))
+
+    def move(self, y: int, x: int):
+        self.cursor = (y, x)
+
+    def clear(self):
+        self.begin()
+
+    erase = clear
+
+    def refresh(self):
+        self.present()
+
+    def present(self):
+        """Rewrite the lines that differ from the terminal's, and send them"""
+        window, repainted = self.window, 0
+        for y, runs in enumerate(self.lines):
+            if runs == self.shown[y]:
+                continue
+            repainted += 1
+            try:
+                window.move(y, 0)
+                window.clrtoeol()
+            except curses.error:
+                pass
+            for x, text, attr in runs:
+                try:
+                    window.addstr(y, x, text, attr)
+                except curses.error:
+                    pass  # The bottom-right cell: written, but the cursor cannot move past it
+        self.shown, self.repainted = self.lines, repainted
+        if self.cursor:
+            try:
+                window.move(*self.cursor)
+            except curses.error:
+                pass
+        window.noutrefresh()
+        curses.doupdate()
+
+
+class LineCache:
+    """Formatted task rows by (task ID, revision, width, minute), least recently used evicted first"""
+
+    def __init__(self, size: int = LINE_CACHE_SIZE):
+        self.size = size
+        self.width: Optional[int] = None
+        self._tasks = None  # The collection the rows were formatted from
+        self._rows: "OrderedDict[Tuple[int, int, int, int], Tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def follow(self, tasks):
+        """Start over if tasks is not the collection the rows came from (reloaded tasks are at revision 0 again)"""
+        if tasks is not self._tasks:
+            self._rows.clear()
+            self._tasks = tasks
+
+    def get(self, task, width: int, minute: int, build: Callable[[], Tuple]) -> Tuple:
+        """The cached row for task at this width and minute, or build()'s, now cached"""
+        if width != self.width:
+            # Every row is laid out for the old width
+            self._rows.clear()
+            self.width = width
+        key = (task.id, task.revision, width, minute)
+        row = self._rows.get(key)
+        if row is None:
+            row = self._rows[key] = build()
+            if len(self._rows) > self.size:
+                self._rows.popitem(last=False)
+        else:
+            self._rows.move_to_end(key)
+        return row
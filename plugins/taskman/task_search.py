@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Taskman Search Index - Token and trigram inverted index over task text
+
+Finding a task used to mean `tasks list | grep`, which reads and formats
+every task. SearchIndex answers `tasks search` and the UI's search panel
+from two maps instead:
+
+    postings  word -> IDs of the tasks whose text contains it
+    grams     trigram of a word -> the words containing it, plus "^a" and
+              "^ab" keys for the words starting with a or ab
+
+Each query word is expanded to the indexed words that contain it (through
+the trigrams of the vocabulary, which is far smaller than the task list),
+their postings are intersected across query words, and the matches are
+ranked: a word equal to the query word scores 3, one starting with it 2,
+one merely containing it 1. Query words shorter than three characters
+match word prefixes only. A one-word query with a limit (the common case:
+every keystroke in the UI) skips scoring altogether and reads the best
+IDs off the postings in ID order, tier by tier, so a word shared by
+thousands of tasks still costs only the IDs returned.
+
+The index follows the store's journal records (add, set text, del), so
+edits from this process and from others (via sync) keep it current. It
+is saved next to the data file (tasks.json.search, marshal) with the
+store version it covers; the next process loads it and replays just the
+records written since, and rebuilds it only when those were compacted
+away or the file is missing. The sidecar packs each map into two int
+arrays, with each posting list sorted, and entries are unpacked as
+queries and edits reach them, so loading it costs a fraction of a rebuild.
+"""
+
+import heapq
+import marshal
+import os
+import re
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
+
+SEARCH_SUFFIX = ".search"
+INDEX_FORMAT = 1
+_INT = "i"  # packed tables: task IDs and vocabulary numbers as C ints
+# Replayed records after which a loaded index is written back
+RESAVE_RECORDS = 200
+
+_WORD = re.compile(r"\w+")
+SCORE_EXACT, SCORE_PREFIX, SCORE_SUBSTRING = 3, 2, 1
+
+
+def tokenize(text: str) -> Tuple[str, ...]:
+    """Distinct lowercase words, in order of first appearance"""
+    return tuple(dict.fromkeys(_WORD.findall(text.lower())))
+
+
+def _word_grams(word: str) -> List[str]:
+    """Keys a vocabulary word is filed under: its trigrams and its 1-2 character prefixes"""
+    keys = ["^" + word[:1]]
+    if len(word) > 1:
+        keys.append("^" + word[:2])
+    keys.extend({word[i:i + 3] for i in range(len(word) - 2)})
+    return keys
+
+
+class _Table:
+    """Rows of ints packed into one array: row i is values[offsets[i]:offsets[i + 1]]"""
+
+    __slots__ = ("offsets", "values")
+
+    def __init__(self, offsets: bytes, values: bytes):
+        self.offsets = array(_INT)
+        self.offsets.frombytes(offsets)
+        self.values = array(_INT)
+        self.values.frombytes(values)
+
+    def row(self, i: int) -> array:
+        return self.values[self.offsets[i]:self.offsets[i + 1]]
+
+    def size(self, i: int) -> int:
+        return self.offsets[i + 1] - self.offsets[i]
+
+    @staticmethod
+    def pack(rows: Iterable[Iterable[int]]) -> Tuple[bytes, bytes]:
+        offsets, values = array(_INT, [0]), array(_INT)
+        for row in rows:
+            values.extend(row)
+            offsets.append(len(values))
+        return offsets.tobytes(), values.tobytes()
+
+
+class SearchIndex:
+    """Ranked word search over task texts; IDs only, the caller owns the tasks
+
+    postings, grams and docs (task ID -> its words) hold sets and tuples,
+    or, straight after load(), the int row of that entry in the packed
+    tables read from the sidecar. An entry is unpacked the first time a
+    query or an edit touches it, so loading costs a few large reads rather
+    than a million small objects.
+    """
+
+    def __init__(self, version: int = 0):
+        self.postings: Dict[str, Union[Set[int], int]] = {}
+        self.grams: Dict[str, Union[Set[str], int]] = {}
+        self.docs: Dict[int, Union[Tuple[str, ...], int]] = {}
+        self.version = version
+        # Sorted postings of the words recent queries ranked; dropped when a word's tasks change
+        self._sorted: Dict[str, Sequence[int]] = {}
+        # Vocabulary and packed tables of a loaded sidecar
+        self._words: List[str] = []
+        self._tables: Dict[str, _Table] = {}
+
+    @classmethod
+    def build(cls, tasks: Iterable[Dict], version: int = 0) -> 'SearchIndex':
+        """Index every task at once (add() per task, minus the per-call checks)"""
+        index = cls(version)
+        docs, postings = index.docs, index.postings
+        for task_data in tasks:
+            task_id = task_data["id"]
+            words = docs[task_id] = tokenize(task_data["text"])
+            for word in words:
+                ids = postings.get(word)
+                if ids is None:
+                    postings[word] = {task_id}
+                else:
+                    ids.add(task_id)
+        grams = index.grams
+        for word in postings:
+            for key in _word_grams(word):
+                keyed = grams.get(key)
+                if keyed is None:
+                    grams[key] = {word}
+                else:
+                    keyed.add(word)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+
+    def _docs(self, word: str) -> Set[int]:
+        docs = self.postings[word]
+        if docs.__class__ is int:
+            docs = self.postings[word] = set(self._tables["postings"].row(docs))
+        return docs
+
+    def _ranked(self, word: str) -> Sequence[int]:
+        """The word's task IDs in ascending order (packed rows are saved sorted)"""
+        ranked = self._sorted.get(word)
+        if ranked is None:
+            docs = self.postings[word]
+            ranked = self._tables["postings"].row(docs) if docs.__class__ is int else sorted(docs)
+            self._sorted[word] = ranked
+        return ranked
+
+    def _size(self, word: str) -> int:
+        docs = self.postings[word]
+        return self._tables["postings"].size(docs) if docs.__class__ is int else len(docs)
+
+    def _gram(self, key: str, create: bool = False) -> Set[str]:
+        words = self.grams.get(key)
+        if words is None:
+            words = set()
+            if create:
+                self.grams[key] = words
+        elif words.__class__ is int:
+            words = self.grams[key] = {self._words[i] for i in self._tables["grams"].row(words)}
+        return words
+
+    def _doc(self, task_id: int) -> Optional[Tuple[str, ...]]:
+        words = self.docs.get(task_id)
+        if words.__class__ is int:
+            words = self.docs[task_id] = tuple(self._words[i] for i in self._tables["docs"].row(words))
+        return words
+
+
+    def add(self, task_id: int, text: str):
+        """Index a task's text, replacing whatever it had"""
+        words = tokenize(text)
+        old = self._doc(task_id)
+        if old == words:
+            return
+        if old is not None:
+            self.remove(task_id)
+        self.docs[task_id] = words
+        for word in words:
+            if word not in self.postings:
+                self.postings[word] = set()
+                for key in _word_grams(word):
+                    self._gram(key, create=True).add(word)
+            self._docs(word).add(task_id)
+            self._sorted.pop(word, None)
+
+    def remove(self, task_id: int):
+        words = self._doc(task_id)
+        if words is None:
+            return
+        del self.docs[task_id]
+        for word in words:
+            docs = self._docs(word)
+            docs.discard(task_id)
+            self._sorted.pop(word, None)
+            if not docs:
+                # Drop the word from the vocabulary so expansion never finds it empty
+                del self.postings[word]
+                for key in _word_grams(word):
+                    keyed = self._gram(key)
+                    keyed.discard(word)
+                    if not keyed:
+                        self.grams.pop(key, None)
+
+    def apply_record(self, record: Dict):
+        """Follow one journal record (see task_store); only text changes matter"""
+        op = record.get("op")
+        if op == "add":
+            self.add(record["task"]["id"], record["task"]["text"])
+        elif op == "set" and "text" in record["fields"]:
+            self.add(record["id"], record["fields"]["text"])
+        elif op == "del":
+            self.remove(record["id"])
+        if record.get("v", 0) > self.version:
+            self.version = record["v"]
+
+
+    def expand(self, term: str) -> Dict[str, int]:
+        """Indexed words matching one query word, with their scores"""
+        if len(term) < 3:
+            candidates = self._gram("^" + term)
+        else:
+            grams = sorted((self._gram(term[i:i + 3]) for i in range(len(term) - 2)), key=len)
+            candidates = grams[0].intersection(*grams[1:]) if grams[0] else set()
+        matches = {}
+        for word in candidates:
+            if word == term:
+                matches[word] = SCORE_EXACT
+            elif word.startswith(term):
+                matches[word] = SCORE_PREFIX
+            elif term in word:
+                matches[word] = SCORE_SUBSTRING
+        return matches
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[int]:
+        """IDs of the tasks containing every query word, best match first (then lowest ID)"""
+        expansions = [self.expand(term) for term in tokenize(query)]
+        if not expansions or not all(expansions):
+            return []
+        if len(expansions) == 1 and limit is not None:
+            return self._top(expansions[0], limit)
+        # Most selective word first, so each later one only filters the survivors
+        expansions.sort(key=lambda matches: sum(map(self._size, matches)))
+        candidates: Optional[Set[int]] = None
+        for matches in expansions:
+            postings = [self._docs(word) for word in matches]
+            if candidates is None:
+                candidates = postings[0] if len(postings) == 1 else set().union(*postings)
+            else:
+                hits: Set[int] = set()
+                for docs in postings:
+                    hits |= candidates.intersection(docs)
+                candidates = hits
+            if not candidates:
+                return []
+        # Set operations found the matches; scores are only needed where a word's expansions differ
+        scored = [matches for matches in expansions if len(set(matches.values())) > 1]
+        if not scored:
+            # Every match scores the same, so the order is just by ID
+            return sorted(candidates) if limit is None else heapq.nsmallest(limit, candidates)
+        scores = dict.fromkeys(candidates, 0)
+        for matches in scored:
+            best: Dict[int, int] = {}
+            # Ascending, so a task matching several expansions keeps its best score
+            for word, score in sorted(matches.items(), key=lambda item: item[1]):
+                best.update(dict.fromkeys(candidates.intersection(self._docs(word)), score))
+            for task_id, score in best.items():
+                scores[task_id] += score
+        rank = lambda item: (-item[1], item[0])
+        if limit is None:
+            ranked = sorted(scores.items(), key=rank)
+        else:
+            ranked = heapq.nsmallest(limit, scores.items(), key=rank)
+        return [task_id for task_id, _ in ranked]
+
+
+    def _top(self, matches: Dict[str, int], limit: int) -> List[int]:
+        """search() for one query word: merge sorted postings, best score tier first"""
+        tiers: Dict[int, List[Sequence[int]]] = {}
+        for word, score in matches.items():
+            tiers.setdefault(score, []).append(self._ranked(word))
+        found: List[int] = []
+        # A lower tier is reached only once the higher ones are used up, so `taken` holds all of them
+        taken: Set[int] = set()
+        for score in sorted(tiers, reverse=True):
+            for task_id in heapq.merge(*tiers[score]):
+                if task_id not in taken:
+                    if len(found) == limit:
+                        return found
+                    taken.add(task_id)
+                    found.append(task_id)
+        return found
+
+    def save(self, path: str):
+        """Replace the sidecar atomically (derived data, so no fsync)"""
+        words = list(self.postings)
+        number = {word: i for i, word in enumerate(words)}
+        packed = lambda docs: self._tables["postings"].row(docs) if docs.__class__ is int else sorted(docs)
+        gram_keys = list(self.grams)
+        doc_ids = list(self.docs)
+        data = {
+            "format": INDEX_FORMAT, "version": self.version, "words": words,
+            "postings": _Table.pack(packed(self.postings[word]) for word in words),
+            "gram_keys": gram_keys,
+            "grams": _Table.pack([number[word] for word in self._gram(key)] for key in gram_keys),
+            "doc_ids": array(_INT, doc_ids).tobytes(),
+            "docs": _Table.pack([number[word] for word in self._doc(task_id)] for task_id in doc_ids),
+        }
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            marshal.dump(data, f)
+        os.replace(tmp_file, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['SearchIndex']:
+        """The saved index, or None if it is missing, unreadable or from another format"""
+        try:
+            with open(path, 'rb') as f:
+                data = marshal.load(f)
+            if data.get("format") != INDEX_FORMAT:
+                return None
+            index = cls(data["version"])
+            index._words = data["words"]
+            index._tables = {name: _Table(*data[name]) for name in ("postings", "grams", "docs")}
+            index.postings = dict(zip(index._words, range(len(index._words))))
+            index.grams = dict(zip(data["gram_keys"], range(len(data["gram_keys"]))))
+            doc_ids = array(_INT)
+            doc_ids.frombytes(data["doc_ids"])
+            index.docs = dict(zip(doc_ids, range(len(doc_ids))))
+            return index
+        except (OSError, EOFError, ValueError, TypeError, KeyError, AttributeError):
+            return None
+
+
+def open_index(store) -> SearchIndex:
+    """The store's index: the sidecar caught up with newer journal records, else a rebuild
+
+    Replay reads the journal under the store lock; a rebuild reads every
+    task once. Either way the sidecar is left current for the next process.
+    """
+    path = store.data_file + SEARCH_SUFFIX
+    index = SearchIndex.load(path)
+    if index is not None:
+        records = store.records_since(index.version)
+        if records is not None:
+            for record in records:
+                index.apply_record(record)
+            if len(records) >= RESAVE_RECORDS:
+                index.save(path)
+            return index
+    meta: Dict = {}
+    index = SearchIndex.build(store.iter_tasks(meta, stream=False))
+    # Known once the scan is done; records newer than this are replayed next time
+    index.version = meta.get("version", 0)
+    index.save(path)
+    return index
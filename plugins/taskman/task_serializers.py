@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Taskman Serializers - Interchangeable encodings for the task snapshot
+
+The snapshot (tasks.json) used to be hard-coded to `json.dump(indent=2)`.
+It is now written by one of these backends:
+
+    json      compact stdlib JSON (the default; still plain JSON)
+    orjson    the same JSON bytes, produced by orjson when it is installed
+    msgpack   MessagePack, when the msgpack module is installed
+    marshal   stdlib-only binary format (no third-party dependency)
+
+The format is detected on load from the first byte, so switching backends
+never needs a migration: JSON files start with "{" (or whitespace), and the
+binary formats are prefixed with a header byte that can never start JSON.
+JSON files are read with orjson whenever it is available, whichever
+backend wrote them. See `taskman_bench.py serializers` for timings.
+
+The journal is unaffected and stays one JSON record per line.
+
+orjson and msgpack are imported on first use rather than at import time:
+orjson alone pulls in enough of the stdlib to add ~10ms to every CLI
+start, and most commands never decode a whole snapshot.
+
+iter_snapshot() reads a snapshot incrementally: JSON snapshots are parsed
+one task at a time from a buffered reader, so a caller can stop after the
+first page without decoding (or even reading) the rest of the file. The
+binary formats have no streaming decoder and are decoded whole, and so are
+JSON snapshots whose reader needs every task anyway.
+
+dump_snapshot() is the writing counterpart for task sets that do not fit
+in memory (bulk imports): JSON backends encode one task at a time.
+"""
+
+import importlib
+import json
+import marshal
+from itertools import chain
+from typing import BinaryIO, Dict, Iterable, Iterator, List
+
+DEFAULT_FORMAT = "json"
+STREAM_CHUNK_SIZE = 64 * 1024
+
+HEADER_MSGPACK = b"\x01"
+HEADER_MARSHAL = b"\x02"
+# Pinned so files stay readable by other Python versions with the same format
+MARSHAL_VERSION = 4
+
+
+class SerializerUnavailable(RuntimeError):
+    """The data file needs a backend whose module is not installed"""
+
+
+_OPTIONAL_MODULES = {}
+
+
+def _optional_module(name: str):
+    """Import an optional backend module once, on first use; None if it is not installed"""
+    if name not in _OPTIONAL_MODULES:
+        try:
+            _OPTIONAL_MODULES[name] = importlib.import_module(name)
+        except ImportError:
+            _OPTIONAL_MODULES[name] = None
+    return _OPTIONAL_MODULES[name]
+
+
+def _json_loads(raw: bytes):
+    orjson = _optional_module("orjson")
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+class JsonSerializer:
+    name = "json"
+    header = b""
+    available = True
+
+    def dumps(self, data: Dict) -> bytes:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, raw: bytes) -> Dict:
+        return _json_loads(raw)
+
+
+class OrjsonSerializer(JsonSerializer):
+    name = "orjson"
+
+    @property
+    def available(self) -> bool:
+        return _optional_module("orjson") is not None
+
+    def dumps(self, data: Dict) -> bytes:
+        return _optional_module("orjson").dumps(data)
+
+
+class MsgpackSerializer:
+    name = "msgpack"
+    header = HEADER_MSGPACK
+
+    @property
+    def available(self) -> bool:
+        return _optional_module("msgpack") is not None
+
+    def dumps(self, data: Dict) -> bytes:
+        return self.header + _optional_module("msgpack").packb(data, use_bin_type=True)
+
+    def loads(self, raw: bytes) -> Dict:
+        return _optional_module("msgpack").unpackb(raw[1:], raw=False, strict_map_key=False)
+
+
+class MarshalSerializer:
+    name = "marshal"
+    header = HEADER_MARSHAL
+    available = True
+
+    def dumps(self, data: Dict) -> bytes:
+        return self.header + marshal.dumps(data, MARSHAL_VERSION)
+
+    def loads(self, raw: bytes) -> Dict:
+        data = marshal.loads(raw[1:])
+        if not isinstance(data, dict):
+            raise ValueError("marshal snapshot does not hold a task mapping")
+        return data
+
+
+SERIALIZERS = {cls.name: cls() for cls in (JsonSerializer, OrjsonSerializer, MsgpackSerializer, MarshalSerializer)}
+_BY_HEADER = {s.header: s for s in SERIALIZERS.values() if s.header}
+
+
+def available_formats() -> List[str]:
+    return [name for name, serializer in SERIALIZERS.items() if serializer.available]
+
+
+def get_serializer(name: str = None):
+    """Backend for writing; unknown or uninstalled backends fall back to json"""
+    serializer = SERIALIZERS.get(name or DEFAULT_FORMAT)
+    if serializer is None or not serializer.available:
+        return SERIALIZERS[DEFAULT_FORMAT]
+    return serializer
+
+
+def detect(raw: bytes):
+    """Backend that wrote `raw`, from its header byte"""
+    serializer = _BY_HEADER.get(raw[:1])
+    if serializer is None:
+        return SERIALIZERS["json"]
+    if not serializer.available:
+        raise SerializerUnavailable(f"data file is stored as {serializer.name}, but the {serializer.name} module is not installed")
+    return serializer
+
+
+def loads(raw: bytes) -> Dict:
+    """Decode a snapshot written by any backend"""
+    return detect(raw).loads(raw)
+
+
+def dump_snapshot(f: BinaryIO, meta: Dict, tasks: Iterable[Dict], serializer,
+                  encoded: Iterable[bytes] = ()) -> int:
+    """Write {**meta, "tasks": [...]} from iterators; returns the task count
+
+    `encoded` holds more tasks, already encoded as JSON objects, to follow
+    `tasks`; JSON backends copy them through without decoding. JSON
+    backends stream task by task, so memory stays flat however many tasks
+    there are. Binary backends have no streaming encoder and collect the
+    tasks first.
+    """
+    if serializer.header:
+        tasks = list(tasks) + [_json_loads(raw) for raw in encoded]
+        f.write(serializer.dumps(dict(meta, tasks=tasks)))
+        return len(tasks)
+    head = serializer.dumps(meta)[:-1]  # without the closing brace
+    f.write(head + (b',"tasks":[' if meta else b'"tasks":['))
+    count = 0
+    for raw in chain((serializer.dumps(task_data) for task_data in tasks), encoded):
+        if count:
+            f.write(b",")
+        f.write(raw)
+        count += 1
+    f.write(b"]}")
+    return count
+
+
+class _JsonStream:
+    """Pull-parser over a text file: one JSON value at a time via raw_decode"""
+
+    _WHITESPACE = " \t\n\r"
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        chunk = self.f.read(STREAM_CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ("" at end of file)"""
+        while True:
+            buf, pos = self.buf, self.pos
+            while pos < len(buf) and buf[pos] in self._WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof or not self._fill():
+                    raise
+                continue
+            # A value touching the end of the buffer may be cut short ("12" of "123")
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def _iter_json_snapshot(f, meta: Dict) -> Iterator[Dict]:
+    stream = _JsonStream(f)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        if key == "tasks":
+            stream.expect("[")
+            if stream.peek() == "]":
+                stream.pos += 1
+            else:
+                while True:
+                    yield stream.value()
+                    char = stream.peek()
+                    stream.pos += 1
+                    if char == "]":
+                        break
+                    if char != ",":
+                        raise ValueError(f"expected ',' or ']' at offset {stream.pos - 1}")
+        else:
+            meta[key] = stream.value()
+        char = stream.peek()
+        stream.pos += 1
+        if char == "}":
+            return
+        if char != ",":
+            raise ValueError(f"expected ',' or '}}' at offset {stream.pos - 1}")
+
+
+def iter_snapshot(path: str, meta: Dict, stream: bool = True) -> Iterator[Dict]:
+    """Yield the snapshot's task dicts in file order; other top-level keys go to `meta`
+
+    Keys written before "tasks" (next_id, sort_mode) are in `meta` by the
+    time the first task is yielded. Streaming pays off when the caller stops
+    early; a caller that reads every task should pass stream=False, since
+    decoding the whole file at once is several times faster.
+    """
+    with open(path, 'rb') as f:
+        head = f.read(1)
+        serializer = detect(head)
+        if serializer.header or not stream:
+            data = serializer.loads(head + f.read())
+            meta.update((key, value) for key, value in data.items() if key != "tasks")
+            yield from data.get("tasks", [])
+            return
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from _iter_json_snapshot(f, meta)
@@ -0,0 +1,1057 @@
+#!/usr/bin/env python3
+"""
+Taskman Storage Engine - Append-only journal over a JSON snapshot
+
+tasks.json stays the snapshot (same format as always), and every mutation
+appends one compact record to tasks.json.journal instead of rewriting the
+whole file. load() replays the snapshot plus the journal; once the journal
+grows past the compaction threshold it is folded back into the snapshot.
+
+Journal records are one JSON object per line:
+    {"op": "add", "task": {...}}                 insert or replace a task
+    {"op": "set", "id": 3, "fields": {...}}      update some task fields
+    {"op": "del", "id": 3}                       delete a task
+    {"op": "meta", "sort_mode": "priority"}      update store metadata
+
+Records carry absolute values (never "toggle"), so replaying a record twice
+is harmless - a crash between writing the snapshot and truncating the
+journal loses nothing.
+
+Compaction is split in two so the snapshot can be written off the UI
+thread: begin_compaction() rotates the journal to tasks.json.journal.old
+(new appends go to a fresh journal), and write_snapshot() writes the
+snapshot atomically (temp file, fsync, rename) and then drops the rotated
+journal. load() replays snapshot, rotated journal, then journal.
+
+SqliteTaskStore is an optional backend with the same interface. It applies
+each record as a single statement and adds indexed queries (query, count,
+get) so callers can answer list/count/lookup without loading every task.
+It is selected by a .db/.sqlite data file or "storage_backend": "sqlite".
+Tags live in a task_tags (tag, task_id) table, so a tag filter is an
+INTERSECT of index ranges (see task_tags).
+
+The snapshot encoding is pluggable (compact JSON by default; see
+task_serializers). Any format is detected on load, and the configured one
+("data_format" / TASKMAN_DATA_FORMAT) is used for the next snapshot.
+
+Both stores keep a counts sidecar (tasks.json.counts, see task_counts) that
+the managers rewrite after every append and snapshot, so the shell can
+show a summary without starting Python.
+
+Several processes (shells running `tasks add`, open UIs, the daemon) may
+write one store at once. Writers serialize on an fcntl lock over
+tasks.json.lock, which also holds the store version: a counter bumped by
+every append and stamped on the record as "v" (and on snapshots as
+"version"). A manager mutates inside locked(), after sync() has handed it
+the records other processes appended since it last looked, so it merges
+their edits record by record and allocates IDs past theirs instead of
+overwriting the file from a stale copy. The lock is held for one append,
+never for a snapshot write: compactors instead hold a lock on the rotated
+journal until their snapshot is in place, so only one runs at a time.
+
+import_tasks() adds a batch of new tasks of any size (see task_exchange):
+the journal store streams the current tasks and the imported ones into a
+fresh snapshot, assigning the new IDs as one consecutive block, and
+SQLite inserts them in one transaction. Either way memory stays flat and
+the batch lands in a single write.
+"""
+
+import bisect
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks (Windows): writers in one process still serialize
+    fcntl = None
+
+import task_serializers
+from task_collection import PRIORITY_RANK
+from task_counts import COUNTS_SUFFIX, TaskCounts, read_counts_file, write_counts_file
+from task_tags import TaskFilter
+
+JOURNAL_SUFFIX = ".journal"
+ROTATED_SUFFIX = ".old"
+LOCK_SUFFIX = ".lock"
+DEFAULT_COMPACT_THRESHOLD = 500
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+TASK_COLUMNS = ("id", "text", "completed", "priority", "created_at", "tags", "project", "due", "scheduled")
+SQLITE_INSERT = f"INSERT INTO tasks ({', '.join(TASK_COLUMNS)}) VALUES ({', '.join('?' * len(TASK_COLUMNS))})"
+# Columns added after the first schema, for ALTER TABLE on older databases
+SQLITE_ADDED_COLUMNS = {"tags": "TEXT NOT NULL DEFAULT ''", "project": "TEXT", "due": "TEXT", "scheduled": "TEXT"}
+# Optional fields stored as NULL when unset and left out of task dicts
+OPTIONAL_COLUMNS = ("project", "due", "scheduled")
+
+
+def display_key(task_data: Dict, sort_mode: str) -> Tuple:
+    """Display position of a task dict (pending first), as TaskCollection orders tasks"""
+    completed = 1 if task_data.get("completed") else 0
+    if sort_mode == "priority":
+        return (completed, PRIORITY_RANK.get(task_data.get("priority"), 1), task_data["id"])
+    if sort_mode == "alphabetical":
+        return (completed, task_data["text"].lower(), task_data["id"])
+    return (completed, task_data["id"])
+
+
+def resolve_data_file(config: Dict) -> str:
+    """Pick the data file: TASKMAN_DATA_FILE wins, then the configured backend"""
+    if os.environ.get('TASKMAN_DATA_FILE'):
+        return os.environ['TASKMAN_DATA_FILE']
+    data_dir = config.get('data_directory', os.path.expanduser('~/.taskman'))
+    if config.get('storage_backend') == 'sqlite':
+        return os.path.join(data_dir, 'tasks.db')
+    return os.path.join(data_dir, 'tasks.json')
+
+
+def resolve_data_format(config: Dict) -> str:
+    """Snapshot encoding: TASKMAN_DATA_FORMAT wins, then the config"""
+    return os.environ.get('TASKMAN_DATA_FORMAT') or config.get('data_format', task_serializers.DEFAULT_FORMAT)
+
+
+def _fsync_directory(directory: str):
+    """Make a rename durable (best effort; not every platform allows it)"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def open_store(data_file: str, data_format: str = None):
+    """Return the storage backend matching the data file's extension"""
+    if data_file.endswith(SQLITE_SUFFIXES):
+        return SqliteTaskStore(data_file)
+    return JournalTaskStore(data_file, data_format=data_format or os.environ.get('TASKMAN_DATA_FORMAT'))
+
+
+class JournalTaskStore:
+    """Snapshot + journal persistence shared by the vintage and modern managers"""
+
+    indexed = False
+
+    def __init__(self, data_file: str, compact_threshold: int = DEFAULT_COMPACT_THRESHOLD, data_format: str = None):
+        self.data_file = data_file
+        self.data_format = data_format
+        self._serializer = None
+        self.journal_file = data_file + JOURNAL_SUFFIX
+        self.rotated_file = self.journal_file + ROTATED_SUFFIX
+        self.compact_threshold = compact_threshold
+        self.journal_records = 0
+        self.counts_file = data_file + COUNTS_SUFFIX
+        # The UI thread (after appends) and the writer thread (after snapshots) both write it
+        self._counts_lock = threading.Lock()
+        self.lock_file = data_file + LOCK_SUFFIX
+        # Highest store version this process has applied, and how far it has
+        # read each journal file (by inode, so a rotation keeps the offset)
+        self.version = 0
+        self._positions: Dict[int, int] = {}
+        self._lock_fd: Optional[int] = None
+        self._lock_depth = 0
+        self._thread_lock = threading.RLock()
+        # Held (on the rotated journal) from begin_compaction() until write_snapshot() finishes
+        self._compaction_fd: Optional[int] = None
+        self.snapshot_version = 0
+
+    @property
+    def serializer(self):
+        """Snapshot writer, resolved on the first write (optional backends import on use)"""
+        if self._serializer is None:
+            self._serializer = task_serializers.get_serializer(self.data_format)
+        return self._serializer
+
+    def _read_journal(self) -> Tuple[Dict[int, List], Dict]:
+        """Replay both journals into per-task overrides, without the snapshot
+
+        Each override is ["add", task], ["set", fields] or ["del", None]; the
+        snapshot is then streamed once with the overrides applied per task.
+        """
+        overlay: Dict[int, List] = {}
+        jmeta = {"next_id": None, "sort_mode": None, "max_add_id": 0, "version": 0, "positions": {}}
+        self.journal_records = 0
+        # Under the lock so a compaction cannot rotate the journal between the two reads
+        with self.locked():
+            for journal_file in (self.rotated_file, self.journal_file):
+                for record in self._read_records(journal_file, 0, jmeta["positions"]):
+                    self._apply(overlay, jmeta, record)
+                    jmeta["version"] = max(jmeta["version"], record.get("v", 0))
+                    self.journal_records += 1
+        return overlay, jmeta
+
+    @staticmethod
+    def _read_records(journal_file: str, offset: int, positions: Dict[int, int]) -> Iterator[Dict]:
+        """Records of one journal file from `offset` (if it is the same file); records the end in `positions`"""
+        try:
+            f = open(journal_file, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            st = os.fstat(f.fileno())
+            if offset > st.st_size:
+                offset = 0
+            f.seek(offset)
+            for line in f:
+                # Only whole lines count as read; a torn final line is retried next time
+                if line.endswith(b"\n"):
+                    offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from an interrupted append
+                    continue
+                yield record
+            positions[st.st_ino] = offset
+
+    @staticmethod
+    def _apply(overlay: Dict[int, List], jmeta: Dict, record: Dict):
+        """Fold a single journal record into the overrides"""
+        op = record.get("op")
+        if op == "add":
+            task_data = dict(record["task"])
+            overlay[task_data["id"]] = ["add", task_data]
+            jmeta["max_add_id"] = max(jmeta["max_add_id"], task_data["id"])
+            if jmeta["next_id"] is not None and task_data["id"] >= jmeta["next_id"]:
+                jmeta["next_id"] = task_data["id"] + 1
+        elif op == "set":
+            entry = overlay.get(record["id"])
+            if entry is None:
+                overlay[record["id"]] = ["set", dict(record["fields"])]
+            elif entry[0] != "del":
+                entry[1].update(record["fields"])
+        elif op == "del":
+            overlay[record["id"]] = ["del", None]
+        elif op == "meta":
+            for key in ("next_id", "sort_mode"):
+                if key in record:
+                    jmeta[key] = record[key]
+
+    @staticmethod
+    def _merge_meta(meta: Dict, snap_meta: Dict, jmeta: Dict, max_id: Optional[int] = None):
+        meta["sort_mode"] = jmeta["sort_mode"] or snap_meta.get("sort_mode", "default")
+        meta["ordered_by"] = snap_meta.get("ordered_by")
+        meta["version"] = max(snap_meta.get("version", 0), jmeta["version"])
+        meta["positions"] = jmeta["positions"]
+        if jmeta["next_id"] is not None:
+            meta["next_id"] = jmeta["next_id"]
+        elif snap_meta.get("next_id") is not None:
+            meta["next_id"] = max(snap_meta["next_id"], jmeta["max_add_id"] + 1)
+        elif max_id is not None:
+            # Neither file records next_id: fall back to the highest ID seen
+            meta["next_id"] = max(max_id, jmeta["max_add_id"]) + 1
+        else:
+            meta["next_id"] = None
+
+    def _scan(self, meta: Dict, overlay: Dict[int, List], jmeta: Dict,
+              stream: bool = True) -> Iterator[Tuple[Dict, Optional[str]]]:
+        """Stream (task, override) pairs: snapshot order, then journal-only additions
+
+        `override` is None for tasks the journal never touched. `meta` is
+        filled from the snapshot header before the first task is yielded;
+        next_id is only final once the scan is exhausted. Pass stream=False
+        when every task will be read (see task_serializers.iter_snapshot).
+        """
+        snap_meta: Dict = {}
+        self._merge_meta(meta, snap_meta, jmeta)
+        max_id = 0
+        if os.path.exists(self.data_file):
+            snapshot = task_serializers.iter_snapshot(self.data_file, snap_meta, stream)
+            started = False
+            try:
+                # SerializerUnavailable propagates: treating the file as empty would lose it
+                for task_data in snapshot:
+                    if not started:
+                        self._merge_meta(meta, snap_meta, jmeta)
+                        started = True
+                    task_id = task_data["id"]
+                    if task_id > max_id:
+                        max_id = task_id
+                    entry = overlay.get(task_id)
+                    if entry is None:
+                        yield task_data, None
+                    elif entry[0] == "set":
+                        task_data.update(entry[1])
+                        entry[0] = "applied"
+                        yield task_data, "set"
+            except (ValueError, EOFError, KeyError, TypeError, AttributeError):
+                # Corrupt or truncated snapshot: keep what was read, then the journal
+                pass
+            finally:
+                snapshot.close()
+        for kind, task_data in overlay.values():
+            if kind == "add":
+                yield task_data, "add"
+        self._merge_meta(meta, snap_meta, jmeta, max_id)
+
+    def iter_tasks(self, meta: Dict, stream: bool = True) -> Iterator[Dict]:
+        """Replayed task dicts; see _scan for when `meta` is filled"""
+        for task_data, _ in self._scan(meta, *self._read_journal(), stream=stream):
+            yield task_data
+
+    def load(self) -> Dict:
+        """Replay snapshot and journal, returning {"tasks", "next_id", "sort_mode"}
+
+        sync() continues from the state read here (as after load_meta()).
+        """
+        meta: Dict = {}
+        tasks = list(self.iter_tasks(meta, stream=False))
+        self.adopt(meta)
+        return {"tasks": tasks, "next_id": meta["next_id"], "sort_mode": meta["sort_mode"]}
+
+    def load_meta(self) -> Dict:
+        """next_id and sort_mode, reading no further than the snapshot header when possible"""
+        meta: Dict = {}
+        scan = self._scan(meta, *self._read_journal())
+        for _ in scan:
+            if meta["next_id"] is not None:
+                break
+        scan.close()
+        self.adopt(meta)
+        return {"next_id": meta["next_id"], "sort_mode": meta["sort_mode"]}
+
+    def adopt(self, meta: Dict):
+        """Make sync() continue from the state `meta` was read at (by load, load_meta or iter_tasks)"""
+        self.version = meta.get("version", 0)
+        self._positions = dict(meta.get("positions", {}))
+
+    @contextmanager
+    def locked(self):
+        """Exclusive access across processes (fcntl.flock) and threads; reentrant"""
+        with self._thread_lock:
+            if self._lock_depth == 0:
+                if self._lock_fd is None:
+                    directory = os.path.dirname(self.lock_file)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    self._lock_fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o600)
+                if fcntl:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and fcntl:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _disk_version(self) -> int:
+        """The store version in the lock file (hold the lock)"""
+        os.lseek(self._lock_fd, 0, os.SEEK_SET)
+        try:
+            return int(os.read(self._lock_fd, 32) or 0)
+        except ValueError:
+            return 0
+
+    def _set_disk_version(self, version: int):
+        os.lseek(self._lock_fd, 0, os.SEEK_SET)
+        os.write(self._lock_fd, b"%020d\n" % version)
+
+    def sync(self) -> Optional[List[Dict]]:
+        """Records other processes appended since this one last looked; call inside locked()
+
+        Returns [] at the cost of one small read when nothing changed. None
+        means some of those records were already compacted into a snapshot
+        this process has not read, so the caller has to reload.
+        """
+        with self.locked():
+            disk_version = self._disk_version()
+            if disk_version <= self.version:
+                return []
+            records: List[Dict] = []
+            positions: Dict[int, int] = {}
+            for journal_file in (self.rotated_file, self.journal_file):
+                for record in self._read_records(journal_file, self._positions.get(self._inode(journal_file), 0), positions):
+                    if record.get("v", 0) > self.version:
+                        records.append(record)
+            self._positions = positions
+            records.sort(key=lambda record: record["v"])
+            if len({record["v"] for record in records}) < disk_version - self.version:
+                return None
+            self.version = max(disk_version, records[-1]["v"])
+            self.journal_records += len(records)
+            return records
+
+    def revision(self) -> int:
+        """The version this process has caught up to (hold the lock, after sync())"""
+        return self.version
+
+    def records_since(self, version: int) -> Optional[List[Dict]]:
+        """Every record newer than `version`, oldest first, for caches kept beside the store
+
+        Unlike sync() this reads both journals from the start and leaves this
+        process's own position alone. None when some of those records were
+        compacted away (or `version` is from another incarnation of the store).
+        """
+        with self.locked():
+            disk_version = self._disk_version()
+            if version > disk_version:
+                return None
+            records = [record for journal_file in (self.rotated_file, self.journal_file)
+                       for record in self._read_records(journal_file, 0, {}) if record.get("v", 0) > version]
+        records.sort(key=lambda record: record["v"])
+        if len({record["v"] for record in records}) < disk_version - version:
+            return None
+        return records
+
+    def watch_files(self) -> List[str]:
+        """Files whose changes mean another process wrote (see task_watch)"""
+        # Every append rewrites the version in the lock file; snapshots replace the data file
+        return [self.lock_file, self.data_file]
+
+    @staticmethod
+    def _inode(path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_ino
+        except OSError:
+            return None
+
+    def query(self, completed: Optional[bool] = None, sort_mode: str = "default", limit: Optional[int] = None,
+              where: Optional[TaskFilter] = None) -> List[Dict]:
+        """Tasks in display order, streaming the snapshot with a bounded buffer
+
+        Snapshots record the order they were written in ("ordered_by"), so
+        with a limit the scan stops as soon as no later task can rank among
+        the first `limit` matches. `where` (tags, project, priority) is
+        checked per task: there is no index on disk to intersect.
+        """
+        meta: Dict = {}
+        overlay, jmeta = self._read_journal()
+        scan = self._scan(meta, overlay, jmeta, stream=limit is not None)
+        matches = lambda task_data: ((completed is None or bool(task_data.get("completed", False)) == completed)
+                                     and (not where or where.matches(task_data)))
+        if limit is None:
+            rows = [task_data for task_data, _ in scan if matches(task_data)]
+            rows.sort(key=lambda task_data: display_key(task_data, sort_mode))
+            return rows
+
+        best: List[Dict] = []
+        best_keys: List[Tuple] = []
+
+        def offer(task_data: Dict, key: Tuple):
+            if len(best) == limit and key >= best_keys[-1]:
+                return
+            pos = bisect.bisect_left(best_keys, key)
+            best_keys.insert(pos, key)
+            best.insert(pos, task_data)
+            if len(best) > limit:
+                best_keys.pop()
+                best.pop()
+
+        if limit <= 0:
+            return best
+        # Journal-added tasks can sort anywhere, so they are ranked up front
+        for kind, task_data in overlay.values():
+            if kind == "add" and matches(task_data):
+                offer(task_data, display_key(task_data, sort_mode))
+        # Edits still to come that could move a task ahead of where the snapshot has it
+        unresolved = {task_id for task_id, (kind, fields) in overlay.items()
+                      if kind == "set" and self._can_advance(fields, completed, sort_mode, where)}
+        ordered = None
+        for task_data, override in scan:
+            if override == "add":
+                continue
+            if ordered is None:
+                ordered = meta["ordered_by"] == sort_mode
+            if override == "set":
+                unresolved.discard(task_data["id"])
+            key = display_key(task_data, sort_mode)
+            if matches(task_data):
+                offer(task_data, key)
+            # Later untouched tasks sort after this one, and no pending edit can move one ahead
+            if override is None and ordered and not unresolved and len(best) == limit and key >= best_keys[-1]:
+                break
+        scan.close()
+        return best
+
+    @staticmethod
+    def _can_advance(fields: Dict, completed: Optional[bool], sort_mode: str, where: Optional[TaskFilter]) -> bool:
+        """Whether journaled `fields` could bring a task into a query's rows, or ahead within them
+
+        Completing a task moves it out of the pending rows and after them in
+        the full list, and reopening one moves it out of the completed rows.
+        Other fields count only if they are in the sort key or the filter.
+        """
+        if "completed" in fields and bool(fields["completed"]) == bool(completed):
+            return True
+        if "priority" in fields and (sort_mode == "priority" or (where and where.priority)):
+            return True
+        if "text" in fields and sort_mode == "alphabetical":
+            return True
+        if not where:
+            return False
+        return ("tags" in fields and bool(where.tags or where.without)) or ("project" in fields and where.project is not None)
+
+    def get(self, task_id: int) -> Optional[Dict]:
+        """One task, streaming the snapshot until it turns up: O(n), there is no ID index on disk"""
+        for task_data in self.iter_tasks({}):
+            if task_data["id"] == task_id:
+                return task_data
+        return None
+
+    def tally(self) -> TaskCounts:
+        """Count every task in one pass"""
+        counts = TaskCounts()
+        for task_data in self.iter_tasks({}, stream=False):
+            counts.tally(bool(task_data.get("completed", False)), task_data.get("priority", "normal"))
+        return counts
+
+    def recount(self) -> TaskCounts:
+        """tally(), leaving the result in the sidecar for the files as they were before the scan
+
+        The scan holds no lock, so stamping the files as they are afterwards
+        could vouch for an append it missed; with the earlier stamp such an
+        append makes the sidecar stale instead.
+        """
+        stamp = self.counts_stamp()
+        counts = self.tally()
+        with self._counts_lock:
+            write_counts_file(self.counts_file, counts, stamp)
+        return counts
+
+    def count(self, completed: Optional[bool] = None) -> int:
+        counts = self.read_counts() or self.recount()
+        if completed is None:
+            return counts.total
+        return counts.completed if completed else counts.pending
+
+    def counts_stamp(self) -> str:
+        """Identifies the on-disk state: snapshot size and mtime, journal sizes"""
+        stamp = []
+        for path in (self.data_file, self.rotated_file, self.journal_file):
+            try:
+                st = os.stat(path)
+            except OSError:
+                stamp.append("0")
+                continue
+            stamp.append(f"{st.st_size}.{st.st_mtime_ns}" if path == self.data_file else str(st.st_size))
+        return ":".join(stamp)
+
+    def read_counts(self) -> Optional[TaskCounts]:
+        """Counts from the sidecar, if it was written for the current files"""
+        found = read_counts_file(self.counts_file)
+        if found is None or found[1] != self.counts_stamp():
+            return None
+        return found[0]
+
+    def write_counts(self, counts: TaskCounts, version: Optional[int] = None):
+        """Replace the sidecar, stamped with the files as they are now
+
+        Pass the store `version` the counts were taken at when writing
+        outside a transaction (after a snapshot): if another process has
+        appended since, the counts miss its records, so nothing is written
+        and the sidecar's old stamp no longer matches the files.
+        """
+        with self.locked():
+            if version is not None and self._disk_version() != version:
+                return
+            with self._counts_lock:
+                write_counts_file(self.counts_file, counts, self.counts_stamp())
+
+    def append(self, record: Dict):
+        """Append one compact record to the journal, stamped with the next store version
+
+        Call inside locked(), after sync(), so the record (and any ID in it)
+        accounts for every other writer.
+        """
+        self.append_many([record])
+
+    def append_many(self, records: List[Dict]):
+        """Append records with consecutive versions in a single write (see append)"""
+        if not records:
+            return
+        with self.locked():
+            base = max(self._disk_version(), self.version)
+            dumps = json.JSONEncoder(separators=(',', ':')).encode
+            data = "".join(dumps(dict(record, v=base + i)) + "\n" for i, record in enumerate(records, 1)).encode()
+            directory = os.path.dirname(self.journal_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.journal_file, 'ab') as f:
+                start = f.tell()
+                f.write(data)
+                inode = os.fstat(f.fileno()).st_ino
+            # Skip our own records in the next sync, unless foreign records sit before them
+            if self._positions.get(inode, 0) == start:
+                self._positions[inode] = start + len(data)
+            # After the records: a crash in between leaves them for the next load to find
+            self.version = base + len(records)
+            self._set_disk_version(self.version)
+            self.journal_records += len(records)
+
+    def needs_compaction(self) -> bool:
+        return self.journal_records >= self.compact_threshold
+
+    def begin_compaction(self) -> bool:
+        """Rotate the journal; records appended from now on survive the snapshot
+
+        Call inside locked(), after sync(), with the state the snapshot will
+        hold. Returns False while another process is compacting.
+        """
+        with self.locked():
+            if self._compaction_fd is not None:
+                return False
+            stale = os.path.exists(self.rotated_file)
+            fd = os.open(self.rotated_file, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o600)
+            if fcntl:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # Its owner holds this until its snapshot is in place
+                    os.close(fd)
+                    return False
+            if os.path.exists(self.journal_file):
+                if stale:
+                    # A previous snapshot never finished: keep both journals, in order
+                    with open(self.journal_file, 'rb') as src:
+                        os.write(fd, src.read())
+                    os.remove(self.journal_file)
+                else:
+                    os.replace(self.journal_file, self.rotated_file)
+                    os.close(fd)
+                    fd = os.open(self.rotated_file, os.O_RDWR)
+                    if fcntl:
+                        fcntl.flock(fd, fcntl.LOCK_EX)
+            self._compaction_fd = fd
+            self.snapshot_version = self.version
+            self.journal_records = 0
+            return True
+
+    def write_snapshot(self, tasks: List[Dict], next_id: int, sort_mode: str):
+        """Write the snapshot atomically, then drop the rotated journal it covers
+
+        `tasks` must be in display order (as a TaskCollection iterates). The
+        metadata is written ahead of the tasks so streaming readers see it
+        before the first task.
+        """
+        data = {"next_id": next_id, "sort_mode": sort_mode, "ordered_by": sort_mode,
+                "version": self.snapshot_version, "tasks": tasks}
+        self._replace_snapshot(lambda f: f.write(self.serializer.dumps(data)))
+
+    def _replace_snapshot(self, write: Callable[[BinaryIO], object]):
+        """Write the data file through a temp file (fsync, rename), then drop the rotated journal"""
+        directory = os.path.dirname(self.data_file) or "."
+        os.makedirs(directory, exist_ok=True)
+        tmp_file = self.data_file + ".tmp"
+        try:
+            with open(tmp_file, 'wb') as f:
+                write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.data_file)
+            _fsync_directory(directory)
+            with self.locked():
+                if os.path.exists(self.rotated_file):
+                    os.remove(self.rotated_file)
+        finally:
+            # Lets the next compactor in (a failed write leaves the rotated journal for it)
+            if self._compaction_fd is not None:
+                os.close(self._compaction_fd)
+                self._compaction_fd = None
+
+    def compact(self, tasks: List[Dict], next_id: int, sort_mode: str) -> bool:
+        """Write a full snapshot synchronously and discard the journal it covers
+
+        Skipped (returns False) while another process is compacting; the
+        journal keeps every change until the next attempt.
+        """
+        if not self.begin_compaction():
+            return False
+        self.write_snapshot(tasks, next_id, sort_mode)
+        return True
+
+    def import_tasks(self, records: Iterable[Dict]) -> int:
+        """Add new tasks (dicts without "id") in one snapshot write; returns how many
+
+        The records are encoded to a temporary JSONL file first, which
+        validates all of them before anything changes and counts them, so
+        the new next_id can go in the snapshot header. The rewrite then runs
+        under the store lock: other writers wait for it, and their next
+        sync() finds a version with no record and reloads.
+        """
+        directory = os.path.dirname(self.data_file) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, staged_file = tempfile.mkstemp(prefix=os.path.basename(self.data_file) + ".import.", dir=directory)
+        counts = TaskCounts()
+        try:
+            dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+            with os.fdopen(fd, 'wb') as staged:
+                for task_data in records:
+                    staged.write(dumps(task_data).encode() + b"\n")
+                    counts.tally(bool(task_data.get("completed", False)), task_data.get("priority", "normal"))
+            count = counts.total
+            if not count:
+                return 0
+
+            def existing() -> Iterator[Dict]:
+                for task_data in self.iter_tasks({}):
+                    counts.tally(bool(task_data.get("completed", False)), task_data.get("priority", "normal"))
+                    yield task_data
+
+            with self.locked():
+                if not self.begin_compaction():
+                    raise RuntimeError("another process is compacting the store; try again")
+                meta = self.load_meta()
+                base = meta["next_id"] or 1
+                version = max(self._disk_version(), self.version) + 1
+                header = {"next_id": base + count, "sort_mode": meta["sort_mode"],
+                          # Imported tasks follow the existing ones, whatever their rank
+                          "ordered_by": None, "version": version}
+                with open(staged_file, 'rb') as staged:
+                    # Splice the ID into each staged object ({"text":... -> {"id":7,"text":...)
+                    imported = (b'{"id":%d,' % task_id + line[1:].rstrip(b"\n") for task_id, line in enumerate(staged, base))
+                    self._replace_snapshot(lambda f: task_serializers.dump_snapshot(
+                        f, header, existing(), self.serializer, imported))
+                self.version = version
+                self._set_disk_version(version)
+                self._positions = {}
+                self.write_counts(counts)
+            return count
+        finally:
+            os.remove(staged_file)
+
+
+class SqliteTaskStore:
+    """SQLite persistence with indexes on completed, priority and created_at"""
+
+    indexed = True
+    journal_records = 0
+    version = None
+
+    def __init__(self, data_file: str):
+        self.data_file = data_file
+        self.counts_file = data_file + COUNTS_SUFFIX
+        directory = os.path.dirname(data_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Deferred so the JSON backend (and CLI startup) never loads the sqlite3 module
+        import sqlite3
+        self.conn = sqlite3.connect(data_file)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    completed INTEGER NOT NULL DEFAULT 0,
+                    priority TEXT NOT NULL DEFAULT 'normal',
+                    created_at TEXT NOT NULL,
+                    tags TEXT NOT NULL DEFAULT '',
+                    project TEXT,
+                    due TEXT,
+                    scheduled TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks(completed, id);
+                CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks(priority);
+                CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at);
+                CREATE TABLE IF NOT EXISTS task_tags (
+                    tag TEXT NOT NULL,
+                    task_id INTEGER NOT NULL,
+                    PRIMARY KEY (tag, task_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_task_tags_task ON task_tags(task_id);
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            """)
+            # Databases created before tags and due dates existed
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(tasks)")}
+            for column, declaration in SQLITE_ADDED_COLUMNS.items():
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE tasks ADD COLUMN {column} {declaration}")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_project ON tasks(project)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_times ON tasks(completed) "
+                              "WHERE due IS NOT NULL OR scheduled IS NOT NULL")
+
+    @staticmethod
+    def _row_to_dict(row) -> Dict:
+        """A row as the journal store holds the task: tags, project and times only when set"""
+        task_data = dict(row)
+        task_data["completed"] = bool(task_data["completed"])
+        tags = task_data.pop("tags", "")
+        if tags:
+            task_data["tags"] = tags.split()
+        for column in OPTIONAL_COLUMNS:
+            if not task_data.get(column):
+                task_data.pop(column, None)
+        return task_data
+
+    @staticmethod
+    def _row(task_id: int, task_data: Dict) -> Tuple:
+        """SQLITE_INSERT parameters for a task dict"""
+        return (task_id, task_data["text"], int(task_data.get("completed", False)), task_data.get("priority", "normal"),
+                task_data["created_at"], " ".join(task_data.get("tags") or ()),
+                *(task_data.get(column) or None for column in OPTIONAL_COLUMNS))
+
+    def load_meta(self, conn: "sqlite3.Connection" = None) -> Dict:
+        """Return next_id, sort_mode and the revision without touching the tasks table rows"""
+        if conn is None:
+            conn = self.conn
+            self.adopt({})
+        meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        next_id = meta.get("next_id")
+        if next_id is None:
+            next_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM tasks").fetchone()[0]
+        return {"next_id": int(next_id), "sort_mode": meta.get("sort_mode", "default"),
+                "version": int(meta.get("revision", 0))}
+
+    def load(self) -> Dict:
+        tasks = [self._row_to_dict(row) for row in self.conn.execute("SELECT * FROM tasks ORDER BY id")]
+        self.adopt({})
+        return dict(self.load_meta(), tasks=tasks)
+
+    def iter_tasks(self, meta: Dict, stream: bool = True) -> Iterator[Dict]:
+        """Stream tasks in display order; safe to consume on a loader thread"""
+        # Its own connection, opened by whichever thread starts the iteration
+        import sqlite3
+        conn = sqlite3.connect(self.data_file)
+        conn.row_factory = sqlite3.Row
+        try:
+            meta.update(self.load_meta(conn))
+            meta["ordered_by"] = meta["sort_mode"]
+            for row in conn.execute("SELECT * FROM tasks ORDER BY " + self._order_by(meta["sort_mode"])):
+                yield self._row_to_dict(row)
+        finally:
+            conn.close()
+
+    def _order_by(self, sort_mode: str) -> str:
+        if sort_mode == "priority":
+            return "completed, CASE priority WHEN 'high' THEN 0 WHEN 'low' THEN 2 ELSE 1 END, id"
+        if sort_mode == "alphabetical":
+            return "completed, text COLLATE NOCASE, id"
+        return "completed, id"
+
+    def query(self, completed: Optional[bool] = None, sort_mode: str = "default", limit: Optional[int] = None,
+              where: Optional[TaskFilter] = None) -> List[Dict]:
+        """Return tasks in display order, optionally filtered by completion and `where`"""
+        sql, clauses, params = "SELECT * FROM tasks", [], []
+        if completed is not None:
+            clauses.append("completed = ?")
+            params.append(int(completed))
+        if where:
+            if where.priority:
+                clauses.append("priority = ?")
+                params.append(where.priority)
+            if where.project:
+                clauses.append("project = ?")
+                params.append(where.project)
+            elif where.project == "":
+                clauses.append("project IS NULL")
+            if where.tags:
+                # One index range per tag, intersected by SQLite
+                clauses.append("id IN (" + " INTERSECT ".join(["SELECT task_id FROM task_tags WHERE tag = ?"] * len(where.tags)) + ")")
+                params.extend(where.tags)
+            if where.without:
+                clauses.append(f"id NOT IN (SELECT task_id FROM task_tags WHERE tag IN ({', '.join('?' * len(where.without))}))")
+                params.extend(where.without)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY " + self._order_by(sort_mode)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [self._row_to_dict(row) for row in self.conn.execute(sql, params)]
+
+    def count(self, completed: Optional[bool] = None) -> int:
+        if completed is None:
+            return self.conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+        return self.conn.execute("SELECT COUNT(*) FROM tasks WHERE completed = ?", (int(completed),)).fetchone()[0]
+
+    def tally(self) -> TaskCounts:
+        counts = TaskCounts()
+        for completed, priority, count in self.conn.execute(
+                "SELECT completed, priority, COUNT(*) FROM tasks GROUP BY completed, priority"):
+            counts.tally(bool(completed), priority, count)
+        return counts
+
+    def pending_with_times(self) -> List[Dict]:
+        """Pending tasks with a due or scheduled time, read through a partial index"""
+        rows = self.conn.execute(
+            "SELECT * FROM tasks WHERE completed = 0 AND (due IS NOT NULL OR scheduled IS NOT NULL)").fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def tag_counts(self) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """Pending tasks per tag and per project"""
+        tags = dict(self.conn.execute(
+            "SELECT tag, COUNT(*) FROM task_tags JOIN tasks ON tasks.id = task_id WHERE completed = 0 GROUP BY tag"))
+        projects = dict(self.conn.execute(
+            "SELECT project, COUNT(*) FROM tasks WHERE completed = 0 AND project IS NOT NULL GROUP BY project"))
+        return tags, projects
+
+    def counts_stamp(self) -> str:
+        """Changes whenever another connection commits (PRAGMA data_version)"""
+        return str(self.conn.execute("PRAGMA data_version").fetchone()[0])
+
+    @contextmanager
+    def locked(self):
+        """Exclusive write access (BEGIN IMMEDIATE) until the block ends; reentrant"""
+        if self.conn.in_transaction:
+            yield
+            return
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        finally:
+            # append() commits its own changes; this ends a block that wrote nothing
+            if self.conn.in_transaction:
+                self.conn.commit()
+
+    def adopt(self, meta: Dict):
+        self.version = self.counts_stamp()
+
+    def watch_files(self) -> List[str]:
+        """WAL mode: commits land in the -wal file until a checkpoint"""
+        return [self.data_file, self.data_file + "-wal"]
+
+    def sync(self) -> Optional[List[Dict]]:
+        """[] while no other connection has committed since load; None (reload) otherwise
+
+        Changes are applied to the database as they are made, so there are
+        no records to replay; the caller re-reads what it caches.
+        """
+        version = self.counts_stamp()
+        if version == self.version:
+            return []
+        self.version = version
+        return None
+
+    def revision(self) -> int:
+        """Bumped by every write that changes tasks (hold the lock, after sync())"""
+        return self.load_meta(self.conn)["version"]
+
+    def records_since(self, version: int) -> Optional[List[Dict]]:
+        """[] if no task changed since revision `version`; None (rebuild) otherwise
+
+        Changes leave no records behind, only the "revision" counter that
+        every write bumps in the meta table.
+        """
+        return [] if version == self.load_meta(self.conn)["version"] else None
+
+    def _bump_revision(self):
+        self.conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', 0)")
+        self.conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'revision'")
+
+    def read_counts(self) -> Optional[TaskCounts]:
+        """Always recount: the indexes make it cheap and the sidecar is only for the shell"""
+        return None
+
+    def recount(self) -> TaskCounts:
+        """tally() by index, then rewrite the sidecar"""
+        counts = self.tally()
+        self.write_counts(counts)
+        return counts
+
+    def write_counts(self, counts: TaskCounts, version: Optional[int] = None):
+        """Unstamped: the shell checks the database's mtime instead (`version` is for the journal store)"""
+        write_counts_file(self.counts_file, counts, "-")
+
+    def get(self, task_id: int) -> Optional[Dict]:
+        row = self.conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def _insert(self, task_data: Dict):
+        self.conn.execute(SQLITE_INSERT.replace("INSERT", "INSERT OR REPLACE", 1), self._row(task_data["id"], task_data))
+        self._set_tags(task_data["id"], task_data.get("tags") or ())
+
+    def _set_tags(self, task_id: int, tags: Iterable[str]):
+        self.conn.execute("DELETE FROM task_tags WHERE task_id = ?", (task_id,))
+        self.conn.executemany("INSERT OR IGNORE INTO task_tags (tag, task_id) VALUES (?, ?)", [(tag, task_id) for tag in tags])
+
+    def _set_meta(self, key: str, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def append(self, record: Dict):
+        """Apply one journal-style record as a single transaction"""
+        self.append_many([record])
+
+    def append_many(self, records: List[Dict]):
+        """Apply journal-style records in one transaction"""
+        max_add_id = 0
+        with self.conn:
+            for record in records:
+                op = record.get("op")
+                if op == "add":
+                    self._insert(record["task"])
+                    max_add_id = max(max_add_id, record["task"]["id"])
+                elif op == "set":
+                    fields = {k: v for k, v in record["fields"].items() if k in TASK_COLUMNS and k != "id"}
+                    if "completed" in fields:
+                        fields["completed"] = int(fields["completed"])
+                    if "tags" in fields:
+                        self._set_tags(record["id"], fields["tags"] or ())
+                        fields["tags"] = " ".join(fields["tags"] or ())
+                    for column in OPTIONAL_COLUMNS:
+                        if column in fields:
+                            fields[column] = fields[column] or None
+                    if fields:
+                        assignments = ", ".join(f"{column} = ?" for column in fields)
+                        self.conn.execute(f"UPDATE tasks SET {assignments} WHERE id = ?", (*fields.values(), record["id"]))
+                elif op == "del":
+                    self.conn.execute("DELETE FROM tasks WHERE id = ?", (record["id"],))
+                    self.conn.execute("DELETE FROM task_tags WHERE task_id = ?", (record["id"],))
+                elif op == "meta":
+                    for key in ("next_id", "sort_mode"):
+                        if key in record:
+                            self._set_meta(key, record[key])
+            if max_add_id and max_add_id >= self.load_meta(self.conn)["next_id"]:
+                self._set_meta("next_id", max_add_id + 1)
+            if records:
+                self._bump_revision()
+
+    def needs_compaction(self) -> bool:
+        return False
+
+    def begin_compaction(self) -> bool:
+        """Records are applied as they arrive; there is no snapshot to write"""
+        return False
+
+    def compact(self, tasks: List[Dict], next_id: int, sort_mode: str):
+        """Every record is already applied, so only the metadata needs writing"""
+        with self.conn:
+            self._set_meta("next_id", next_id)
+            self._set_meta("sort_mode", sort_mode)
+
+    def import_tasks(self, records: Iterable[Dict]) -> int:
+        """Insert new tasks (dicts without "id") in one transaction; returns how many"""
+        count = 0
+        tag_rows: List[Tuple[str, int]] = []
+
+        def rows(base: int) -> Iterator[Tuple]:
+            nonlocal count
+            for task_id, task_data in enumerate(records, base):
+                count += 1
+                tag_rows.extend((tag, task_id) for tag in task_data.get("tags") or ())
+                yield self._row(task_id, task_data)
+
+        # BEGIN IMMEDIATE first so no other writer takes IDs from the block; rolled back on a bad record
+        with self.locked(), self.conn:
+            base = self.load_meta(self.conn)["next_id"]
+            self.conn.executemany(SQLITE_INSERT, rows(base))
+            self.conn.executemany("INSERT OR IGNORE INTO task_tags (tag, task_id) VALUES (?, ?)", tag_rows)
+            if count:
+                self._set_meta("next_id", base + count)
+                self._bump_revision()
+        if count:
+            self.recount()
+        return count
+
+
+def migrate_json_to_sqlite(json_file: str, db_file: str) -> int:
+    """Copy a tasks.json snapshot (and its journal) into a new SQLite store"""
+    data = JournalTaskStore(json_file).load()
+    store = SqliteTaskStore(db_file)
+    if store.count():
+        raise ValueError(f"{db_file} already contains tasks")
+    with store.conn:
+        store.conn.executemany(SQLITE_INSERT, [store._row(t["id"], t) for t in data["tasks"]])
+        store.conn.executemany("INSERT OR IGNORE INTO task_tags (tag, task_id) VALUES (?, ?)",
+                               [(tag, t["id"]) for t in data["tasks"] for tag in t.get("tags") or ()])
+    store.compact([], data["next_id"], data["sort_mode"])
+    return len(data["tasks"])
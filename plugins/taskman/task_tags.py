@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Taskman Tags - Tags, projects and the set indexes that filter by them
+
+Tasks carry tags and at most one project, written inline the way
+taskwarrior and todo.txt users already type them:
+
+    tasks add "Renew passport +errand +blocked project:home"
+
+parse_task_spec() strips those words from the text. The same words filter
+`tasks list`, together with priority:
+    tasks list +work -blocked priority:high project:osh pending
+
+TagIndex keeps one set of task IDs per tag, project and priority, plus
+the pending and completed sets, so a filter is the intersection of a few
+sets (smallest first) minus the excluded tags. It follows journal records
+like the search index, and keeps the number of pending tasks per tag and
+project current as it goes, which is what the modern UI's sidebar shows.
+It lives only in memory, built from loaded tasks: the UIs and the daemon
+filter without a scan, while a CLI command on the JSON store streams the
+snapshot through TaskFilter.matches. SQLite stores answer the same
+filters with INTERSECT over their task_tags table instead (see task_store).
+"""
+
+import re
+import sys
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from task_model import PRIORITIES, intern_tags
+
+_TAG = r"[^\W\d][\w.-]*|\d+[^\W\d][\w.-]*"  # not all digits, so "-5" stays text
+_TAG_WORD = re.compile(rf"\+({_TAG})")
+_NOT_TAG_WORD = re.compile(rf"-({_TAG})")
+_FIELD_WORD = re.compile(r"(project|priority):(\S*)")
+_EMPTY: Set[int] = frozenset()
+
+
+def parse_task_spec(spec: str) -> Tuple[str, Tuple[str, ...], Optional[str]]:
+    """Split "Text +tag project:name" into (text, tags, project)
+
+    Only whole words count, so "C++" or "a+b" stay in the text. If nothing
+    but tags is left, the spec is kept as the text.
+    """
+    words, tags, project = [], [], None
+    for word in spec.split():
+        tag = _TAG_WORD.fullmatch(word)
+        field = _FIELD_WORD.fullmatch(word)
+        if tag:
+            tags.append(tag.group(1))
+        elif field and field.group(1) == "project" and re.fullmatch(_TAG, field.group(2)):
+            project = sys.intern(field.group(2))
+        else:
+            words.append(word)
+    if not words:
+        return spec.strip(), (), None
+    return " ".join(words), intern_tags(tags), project
+
+
+def format_tags(tags: Iterable[str], project: Optional[str]) -> str:
+    """The inline words for tags and a project ("project:home +errand"); "" if none"""
+    words = [f"project:{project}"] if project else []
+    words.extend(f"+{tag}" for tag in tags)
+    return " ".join(words)
+
+
+class TaskFilter:
+    """Tags a task must have and must not have, and an optional project and priority
+
+    project "" selects tasks without a project.
+    """
+
+    __slots__ = ("tags", "without", "project", "priority")
+
+    def __init__(self, tags: Iterable[str] = (), without: Iterable[str] = (),
+                 project: Optional[str] = None, priority: Optional[str] = None):
+        self.tags = tuple(tags)
+        self.without = tuple(without)
+        self.project = project
+        self.priority = priority
+
+    def __bool__(self) -> bool:
+        return bool(self.tags or self.without or self.project is not None or self.priority)
+
+    def __str__(self) -> str:
+        words = [f"+{tag}" for tag in self.tags] + [f"-{tag}" for tag in self.without]
+        if self.project is not None:
+            words.append(f"project:{self.project}")
+        if self.priority:
+            words.append(f"priority:{self.priority}")
+        return " ".join(words)
+
+    def matches(self, task_data: Dict) -> bool:
+        """Whether a task dict passes (the scan fallback for stores without an index)"""
+        tags = task_data.get("tags") or ()
+        if self.priority and task_data.get("priority", "normal") != self.priority:
+            return False
+        if self.project is not None and (task_data.get("project") or "") != self.project:
+            return False
+        return all(tag in tags for tag in self.tags) and not any(tag in tags for tag in self.without)
+
+
+def parse_filter(args: List[str]) -> Tuple[TaskFilter, List[str]]:
+    """Take +tag, -tag, project:name and priority:level words out of args; returns the rest
+
+    Raises ValueError for an unknown priority.
+    """
+    tags, without, rest = [], [], []
+    project = priority = None
+    for arg in args:
+        tag, not_tag, field = _TAG_WORD.fullmatch(arg), _NOT_TAG_WORD.fullmatch(arg), _FIELD_WORD.fullmatch(arg)
+        if tag:
+            tags.append(tag.group(1))
+        elif not_tag:
+            without.append(not_tag.group(1))
+        elif field and field.group(1) == "project":
+            project = field.group(2)
+        elif field:
+            priority = field.group(2)
+            if priority not in PRIORITIES:
+                raise ValueError(f"invalid priority '{priority}' (use: {', '.join(PRIORITIES)})")
+        else:
+            rest.append(arg)
+    return TaskFilter(tags, without, project, priority), rest
+
+
+class TagIndex:
+    """Task ID sets per tag, project, priority and status, with pending counts per tag and project"""
+
+    def __init__(self):
+        self.tags: Dict[str, Set[int]] = {}
+        self.projects: Dict[str, Set[int]] = {}
+        self.priorities: Dict[str, Set[int]] = {priority: set() for priority in PRIORITIES}
+        self.pending: Set[int] = set()
+        self.completed: Set[int] = set()
+        # Pending tasks per tag and per project, for the sidebar
+        self.tag_counts: Dict[str, int] = {}
+        self.project_counts: Dict[str, int] = {}
+        # task ID -> (tags, project, priority, completed): what "set" records change and removal undoes
+        self.docs: Dict[int, Tuple[Tuple[str, ...], Optional[str], str, bool]] = {}
+
+    @classmethod
+    def of(cls, tasks: Iterable) -> 'TagIndex':
+        """Index Task objects"""
+        index = cls()
+        for task in tasks:
+            index.add(task.id, task.tags, task.project, task.priority, task.completed)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, task_id: int, tags: Tuple[str, ...], project: Optional[str], priority: str, completed: bool):
+        """Index a task, replacing whatever it had"""
+        if task_id in self.docs:
+            self.remove(task_id)
+        self.docs[task_id] = (tags, project, priority, completed)
+        for tag in tags:
+            self.tags.setdefault(tag, set()).add(task_id)
+        if project:
+            self.projects.setdefault(project, set()).add(task_id)
+        self.priorities.setdefault(priority, set()).add(task_id)
+        (self.completed if completed else self.pending).add(task_id)
+        if not completed:
+            self._count(tags, project, 1)
+
+    def remove(self, task_id: int):
+        doc = self.docs.pop(task_id, None)
+        if doc is None:
+            return
+        tags, project, priority, completed = doc
+        for tag in tags:
+            self._discard(self.tags, tag, task_id)
+        if project:
+            self._discard(self.projects, project, task_id)
+        self.priorities[priority].discard(task_id)
+        (self.completed if completed else self.pending).discard(task_id)
+        if not completed:
+            self._count(tags, project, -1)
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[int]], key: str, task_id: int):
+        ids = index[key]
+        ids.discard(task_id)
+        if not ids:
+            del index[key]
+
+    def _count(self, tags: Tuple[str, ...], project: Optional[str], delta: int):
+        for counts, keys in ((self.tag_counts, tags), (self.project_counts, (project,) if project else ())):
+            for key in keys:
+                count = counts.get(key, 0) + delta
+                if count:
+                    counts[key] = count
+                else:
+                    del counts[key]
+
+    def apply_record(self, record: Dict):
+        """Follow one journal record (see task_store)"""
+        op = record.get("op")
+        if op == "add":
+            task_data = record["task"]
+            self.add(task_data["id"], intern_tags(task_data.get("tags") or ()), task_data.get("project") or None,
+                     task_data.get("priority", "normal"), bool(task_data.get("completed", False)))
+        elif op == "set":
+            doc = self.docs.get(record["id"])
+            if doc is None:
+                return
+            fields = record["fields"]
+            tags, project, priority, completed = doc
+            self.add(record["id"],
+                     intern_tags(fields["tags"] or ()) if "tags" in fields else tags,
+                     (fields["project"] or None) if "project" in fields else project,
+                     fields.get("priority", priority), bool(fields.get("completed", completed)))
+        elif op == "del":
+            self.remove(record["id"])
+
+    def select(self, where: TaskFilter, completed: Optional[bool] = None) -> Set[int]:
+        """IDs of the tasks passing `where` (and pending/completed, if given), by set algebra"""
+        sets = [self.tags.get(tag, _EMPTY) for tag in where.tags]
+        if where.project:
+            sets.append(self.projects.get(where.project, _EMPTY))
+        if where.priority:
+            sets.append(self.priorities.get(where.priority, _EMPTY))
+        if completed is not None:
+            sets.append(self.completed if completed else self.pending)
+        if sets:
+            sets.sort(key=len)
+            if not sets[0]:
+                return set()
+            ids = sets[0].intersection(*sets[1:])
+        else:
+            ids = set(self.docs)
+        if where.project == "":
+            for project_ids in self.projects.values():
+                ids -= project_ids
+        for tag in where.without:
+            ids -= self.tags.get(tag, _EMPTY)
+        return ids
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Taskman Time Helpers - Parsed timestamps and a minute-bucketed humanizer
+
+Task.created_ts parses `created_at` into an epoch float when a row is
+formatted. Rendering then uses a Humanizer: callers take a single "now"
+per frame with begin_frame(), and each label ("5m", "2h", "3d") is cached
+until the next minute boundary, so redraws stop paying for timezone
+conversion and formatting per row.
+"""
+
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+
+def parse_timestamp(value: str) -> Optional[float]:
+    """ISO 8601 timestamp -> epoch seconds (naive values are local time)"""
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def humanize_seconds(seconds: float) -> str:
+    """Elapsed seconds -> compact label"""
+    if seconds < -60:
+        return "future"
+    if seconds < 0:
+        # Sub-minute clock skew, or a task created after the frame's "now"
+        return "now"
+    days, rem = divmod(int(seconds), 86400)
+    hours, rem = divmod(rem, 3600)
+    minutes = rem // 60
+    if days > 0:
+        return f"{days}d"
+    if hours > 0:
+        return f"{hours}h"
+    if minutes > 0:
+        return f"{minutes}m"
+    return "now"
+
+
+class Humanizer:
+    """Humanized ages against one "now" per frame, cached per minute"""
+
+    def __init__(self):
+        self.now = time.time()
+        self._bucket = int(self.now // 60)
+        self._labels: Dict[float, str] = {}
+
+    def begin_frame(self, now: float = None):
+        """Fix "now" for the frame about to be drawn"""
+        self.now = time.time() if now is None else now
+        bucket = int(self.now // 60)
+        if bucket != self._bucket:
+            self._bucket = bucket
+            self._labels.clear()
+
+    def label(self, timestamp: Optional[float]) -> str:
+        if timestamp is None:
+            return "?"
+        label = self._labels.get(timestamp)
+        if label is None:
+            label = self._labels[timestamp] = humanize_seconds(self.now - timestamp)
+        return label
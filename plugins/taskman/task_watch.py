@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Taskman File Watch - Tell a running UI that another process changed the store
+
+The UIs only ever saw their own in-memory tasks, so a `tasks add` from
+another shell stayed invisible until restart. A watcher reports that the
+store's files changed; the UI then asks its manager to sync(), which
+replays just the records the other writers appended (see task_store).
+
+On Linux the watcher uses inotify through ctypes on the store's directory
+(the snapshot is replaced by rename, so the file itself cannot be watched)
+and filters events by file name. Elsewhere, or if inotify cannot be set
+up, it falls back to comparing the files' stat() results at most once per
+POLL_INTERVAL.
+
+Events caused by this process's own writes are reported too; sync() finds
+nothing new at the cost of reading the version from the lock file.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+POLL_INTERVAL = 1.0
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len; then len bytes of name
+READ_SIZE = 64 * 1024
+
+
+class PollingWatcher:
+    """Portable fallback: stat() the files, at most once per interval"""
+
+    def __init__(self, paths: Iterable[str], interval: float = POLL_INTERVAL):
+        self.paths = list(paths)
+        self.interval = interval
+        self._checked = 0.0
+        self._stats = self._stat_all()
+
+    def _stat_all(self) -> Dict[str, Optional[Tuple[int, int, int]]]:
+        stats = {}
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                stats[path] = (st.st_ino, st.st_size, st.st_mtime_ns)
+            except OSError:
+                stats[path] = None
+        return stats
+
+    def fileno(self) -> Optional[int]:
+        """No descriptor to wait on: the caller has to poll changed()"""
+        return None
+
+    def changed(self, now: float = None) -> bool:
+        now = now or time.time()
+        if now - self._checked < self.interval:
+            return False
+        self._checked = now
+        stats = self._stat_all()
+        if stats == self._stats:
+            return False
+        self._stats = stats
+        return True
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Linux: non-blocking inotify descriptor on the store's directory"""
+
+    def __init__(self, paths: Iterable[str]):
+        self.paths = list(paths)
+        self.names = {os.fsencode(os.path.basename(path)) for path in self.paths}
+        directory = os.path.dirname(os.path.abspath(self.paths[0]))
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"cannot watch {directory}")
+
+    def fileno(self) -> Optional[int]:
+        """Readable whenever changed() has something to report"""
+        return self.fd
+
+    def changed(self, now: float = None) -> bool:
+        """Drain queued events; True if any touched one of the watched files"""
+        changed = False
+        while True:
+            try:
+                buf = os.read(self.fd, READ_SIZE)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset + _EVENT.size <= len(buf):
+                _, mask, _, length = _EVENT.unpack_from(buf, offset)
+                name = buf[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+                offset += _EVENT.size + length
+                # An overflow dropped events, so assume ours was among them
+                if mask & IN_Q_OVERFLOW or name in self.names:
+                    changed = True
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def open_watcher(paths: Iterable[str], interval: float = POLL_INTERVAL):
+    """inotify where available, else stat() polling every `interval` seconds"""
+    paths = list(paths)
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError, TypeError):
+            # No libc symbol (musl without inotify, sandboxes) or no watch slots left
+            pass
+    return PollingWatcher(paths, interval)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Taskman Background Writer - Coalesced snapshot writes off the UI thread
+
+Every edit is already durable once its journal record is appended, so the
+full snapshot only exists to keep the journal short. The UIs used to write
+it synchronously (vintage on every change, modern every 30 seconds whether
+or not anything changed); now they mark the writer dirty and call tick()
+from their loop:
+
+- Bursts of edits coalesce: a snapshot is due `delay` seconds after the
+  last change, or `max_delay` seconds after the first one at the latest.
+- The journal is rotated and the task list captured on the UI thread (a
+  list copy, no I/O); serializing and the atomic temp-file + fsync +
+  rename run on a worker thread, so a keystroke never waits on the disk.
+- close() flushes whatever is still dirty and joins the worker; the UIs
+  call it before curses.wrapper tears the terminal down.
+
+Capturing live Task objects is safe because journal records carry absolute
+values: an edit that lands while the worker is serializing goes to the new
+journal and is replayed on top of the snapshot at load.
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Optional
+
+DEFAULT_DELAY = 2.0
+DEFAULT_MAX_DELAY = 10.0
+
+
+class BackgroundWriter:
+    """Writes manager snapshots on a worker thread when the tasks are dirty"""
+
+    def __init__(self, manager, delay: float = DEFAULT_DELAY, max_delay: float = DEFAULT_MAX_DELAY):
+        self.manager = manager
+        self.delay = delay
+        self.max_delay = max_delay
+        self.dirty_since: Optional[float] = None
+        self.last_change: Optional[float] = None
+        self.error: Optional[Exception] = None
+        self._jobs: "queue.Queue[Optional[Callable]]" = queue.Queue()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._thread = threading.Thread(target=self._work, name="taskman-writer", daemon=True)
+        self._thread.start()
+
+    def mark_dirty(self):
+        now = time.time()
+        if self.dirty_since is None: self.dirty_since = now
+        self.last_change = now
+
+    def due(self) -> Optional[float]:
+        """Deadline of the next snapshot, or None when nothing is dirty"""
+        if self.dirty_since is None: return None
+        return min(self.last_change + self.delay, self.dirty_since + self.max_delay)
+
+    def tick(self, now: float = None) -> bool:
+        """Hand a snapshot to the worker if one is due; returns True if it did"""
+        deadline = self.due()
+        if deadline is None or (now or time.time()) < deadline: return False
+        # One write in flight at a time; later edits stay dirty for the next one
+        if not self._idle.is_set(): return False
+        return self._submit()
+
+    def _submit(self) -> bool:
+        self.dirty_since = self.last_change = None
+        job = self.manager.capture_snapshot()
+        if job is None: return False
+        self._idle.clear()
+        self._jobs.put(job)
+        return True
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is None: return
+            try:
+                job()
+                self.error = None
+            except Exception as e:
+                # The rotated journal stays on disk, so nothing is lost
+                self.error = e
+            finally:
+                self._idle.set()
+
+    def busy(self) -> bool:
+        """A snapshot is being written, or failed and take_error() has not seen it: keep polling"""
+        return not self._idle.is_set() or self.error is not None
+
+    def take_error(self) -> Optional[Exception]:
+        error, self.error = self.error, None
+        return error
+
+    def close(self):
+        """Flush pending changes and stop the worker"""
+        self._idle.wait()
+        if self.dirty_since is not None: self._submit()
+        self._jobs.put(None)
+        self._thread.join()
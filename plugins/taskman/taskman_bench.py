@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Taskman Benchmarks - Reproducible numbers for the performance docs
+
+Usage:
+    python3 taskman_bench.py memory [--sizes 10000 100000 1000000]
+    python3 taskman_bench.py serializers [--sizes 1000 10000 100000] [--repeat 5]
+    python3 taskman_bench.py first-frame [--sizes 10000 100000 1000000] [--page 50]
+    python3 taskman_bench.py startup [--tasks 1000] [--repeat 20] [--history FILE]
+    python3 taskman_bench.py batch [--adds 10000] [--repeat 5]
+    python3 taskman_bench.py exchange [--sizes 10000 100000 500000] [--format jsonl]
+    python3 taskman_bench.py search [--sizes 10000 100000] [--repeat 20]
+    python3 taskman_bench.py idle [--tasks 10000] [--seconds 10]
+
+Results are printed as a Markdown table so they can be pasted into
+DEVELOPMENT.md ("Performance" section).
+"""
+
+import argparse
+import compileall
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from task_model import Task
+from task_loader import BackgroundLoader
+from task_store import JournalTaskStore, display_key
+import task_serializers
+
+
+class DictTask:
+    """The pre-__slots__ Task layout, kept only as a baseline"""
+
+    def __init__(self, id, text, completed=False, priority="normal", created_at=None):
+        self.id = id
+        self.text = text
+        self.completed = completed
+        self.priority = priority
+        self.created_at = created_at
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+def make_tasks(count: int):
+    """Task dicts with realistic texts and timestamps, generated one at a time"""
+    start = datetime(2025, 1, 1).astimezone()
+    priorities = ("high", "normal", "low")
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "text": f"Task {i}: review pull request and update docs",
+            "completed": i % 3 == 0,
+            "priority": priorities[i % 3],
+            "created_at": (start + timedelta(seconds=i * 37, microseconds=i)).isoformat()
+        }
+
+
+def make_payload(count: int) -> str:
+    """Serialized tasks.json with realistic texts and timestamps"""
+    return json.dumps({"tasks": list(make_tasks(count)), "next_id": count + 1, "sort_mode": "default"})
+
+
+def measure_load(payload: str, task_cls) -> int:
+    """Bytes still allocated after decoding the payload into task objects"""
+    gc.collect()
+    tracemalloc.start()
+    data = json.loads(payload)
+    tasks = [task_cls.from_dict(task_data) for task_data in data["tasks"]]
+    del data
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del tasks
+    return current
+
+
+def bench_memory(sizes):
+    print("| Tasks | dict Task | slotted Task | Saved |")
+    print("|------:|----------:|-------------:|------:|")
+    for count in sizes:
+        payload = make_payload(count)
+        before = measure_load(payload, DictTask)
+        after = measure_load(payload, Task)
+        print(f"| {count:,} | {before / 2**20:.1f} MiB | {after / 2**20:.1f} MiB | {1 - after / before:.0%} |")
+
+
+def best_of(repeat: int, func) -> float:
+    """Fastest of `repeat` runs, in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def bench_serializers(sizes, repeat):
+    """Snapshot save (encode + fsync + rename) and load (read + decode) per backend"""
+    formats = task_serializers.available_formats()
+    missing = [name for name in task_serializers.SERIALIZERS if name not in formats]
+    print("| Tasks | Format | Size | Save | Load |")
+    print("|------:|:-------|-----:|-----:|-----:|")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in sizes:
+            data = json.loads(make_payload(count))
+            tasks = data["tasks"]
+
+            # The previous hard-coded format, for reference
+            indented = JournalTaskStore(os.path.join(tmp, "indented.json"))
+
+            def indented_save():
+                with open(indented.data_file, "w") as f:
+                    json.dump(data, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            save_ms = best_of(repeat, indented_save)
+            load_ms = best_of(repeat, indented.load)
+            size = os.path.getsize(indented.data_file)
+            print(f"| {count:,} | json indent=2 (old) | {size / 2**20:.1f} MiB | {save_ms:.1f} ms | {load_ms:.1f} ms |")
+
+            for name in formats:
+                store = JournalTaskStore(os.path.join(tmp, f"tasks.{name}"), data_format=name)
+                save_ms = best_of(repeat, lambda: store.write_snapshot(tasks, count + 1, "default"))
+                load_ms = best_of(repeat, store.load)
+                size = os.path.getsize(store.data_file)
+                print(f"| {count:,} | {name} | {size / 2**20:.1f} MiB | {save_ms:.1f} ms | {load_ms:.1f} ms |")
+    if missing:
+        print(f"\nNot installed: {', '.join(missing)}")
+
+
+def bench_first_frame(sizes, page):
+    """Time until the first page of Task objects exists, vs. a full load"""
+    print(f"| Tasks | First {page} tasks | Full load |")
+    print("|------:|------------:|----------:|")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in sizes:
+            data = json.loads(make_payload(count))
+            store = JournalTaskStore(os.path.join(tmp, f"tasks-{count}.json"))
+            # Snapshots are written in display order, as the managers do
+            store.write_snapshot(sorted(data["tasks"], key=lambda td: display_key(td, "default")), count + 1, "default")
+            del data
+            gc.collect()
+
+            start = time.perf_counter()
+            loader = BackgroundLoader(store, page)
+            first_ms = (time.perf_counter() - start) * 1000
+            loader.start()
+            loader.join()
+            full_ms = (time.perf_counter() - start) * 1000
+            print(f"| {count:,} | {first_ms:.1f} ms | {full_ms:.0f} ms |")
+            # A million live tasks would make the next size pay for full GC passes
+            del loader
+
+
+PLUGIN_DIR = os.path.dirname(os.path.abspath(__file__))
+STARTUP_COMMANDS = (
+    ["count"],
+    ["count", "all_json"],
+    ["list", "--limit", "10"],
+    ["list", "pending"],
+    ["add", "benchmark task"],
+)
+
+
+def import_profile(argv, env):
+    """(total, [(cumulative ms, module)]) of top-level imports, from `python -X importtime`"""
+    result = subprocess.run([sys.executable, "-X", "importtime"] + argv, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented; their time is already in their parent's
+        if name.startswith("  "):
+            continue
+        imports.append((int(cumulative) / 1000, name.strip()))
+    return sum(ms for ms, _ in imports), sorted(imports, reverse=True)
+
+
+def bench_startup(task_count, repeat, history):
+    """Wall-clock time of whole CLI processes per subcommand, and where their imports go"""
+    # Stale bytecode (PYTHONDONTWRITEBYTECODE, fresh edits) would be timed as compilation
+    compileall.compile_dir(PLUGIN_DIR, maxlevels=0, quiet=1)
+    cli = os.path.join(PLUGIN_DIR, "task_cli.py")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        data = json.loads(make_payload(task_count))
+        store = JournalTaskStore(os.path.join(tmp, "tasks.json"))
+        store.write_snapshot(sorted(data["tasks"], key=lambda td: display_key(td, "default")), task_count + 1, "default")
+        # HOME keeps the user's config.json out of it; the plugin sets both variables
+        env = dict(os.environ, HOME=tmp, TASKMAN_DATA_FILE=store.data_file, TASKMAN_DATA_FORMAT="json")
+        # Writes the counts sidecar, as any earlier command would have
+        subprocess.run([sys.executable, cli, "count"], env=env, stdout=subprocess.DEVNULL)
+
+        print(f"| Command ({task_count:,} tasks) | Best | Median | Imports |")
+        print("|:--------|-----:|-------:|--------:|")
+        for argv in [["-c", "pass"]] + [[cli] + command for command in STARTUP_COMMANDS]:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                subprocess.run([sys.executable] + argv, env=env, stdout=subprocess.DEVNULL)
+                timings.append((time.perf_counter() - start) * 1000)
+            imports_ms, top = import_profile(argv, env)
+            label = "python3 -c pass" if argv[0] == "-c" else "tasks " + " ".join(argv[1:])
+            results[label] = round(min(timings), 1)
+            print(f"| `{label}` | {min(timings):.1f} ms | {statistics.median(timings):.1f} ms | {imports_ms:.1f} ms |")
+
+        _, top = import_profile([cli, "count"], env)
+        print("\nSlowest top-level imports for `tasks count` (-X importtime, cumulative):")
+        for ms, name in top[:8]:
+            print(f"  {ms:6.1f} ms  {name}")
+
+    if history:
+        previous = None
+        if os.path.exists(history):
+            with open(history) as f:
+                lines = f.read().splitlines()
+            previous = json.loads(lines[-1]) if lines else None
+        with open(history, "a") as f:
+            f.write(json.dumps({"date": datetime.now().astimezone().isoformat(timespec="seconds"),
+                                "python": platform.python_version(), "tasks": task_count,
+                                "best_ms": results}) + "\n")
+        if previous:
+            print(f"\nChange since {previous['date']}:")
+            for label, ms in results.items():
+                before = previous["best_ms"].get(label)
+                if before:
+                    print(f"  {label}: {before:.1f} -> {ms:.1f} ms ({ms - before:+.1f})")
+
+
+def bench_batch(adds, repeat):
+    """One `add --stdin` process adding `adds` tasks, against one single-task `add` process"""
+    compileall.compile_dir(PLUGIN_DIR, maxlevels=0, quiet=1)
+    cli = os.path.join(PLUGIN_DIR, "task_cli.py")
+    lines = "".join(f"batch task {i}\n" for i in range(adds))
+    single, batch = [], []
+    for _ in range(repeat):
+        # A fresh store per run, so every batch starts from the same size
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, HOME=tmp, TASKMAN_DATA_FILE=os.path.join(tmp, "tasks.json"), TASKMAN_DATA_FORMAT="json")
+            start = time.perf_counter()
+            subprocess.run([sys.executable, cli, "add", "benchmark task"], env=env, stdout=subprocess.DEVNULL)
+            single.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            subprocess.run([sys.executable, cli, "add", "--stdin"], env=env, input=lines, text=True, stdout=subprocess.DEVNULL)
+            batch.append((time.perf_counter() - start) * 1000)
+    print("| Adds | One process per add | `add --stdin` |")
+    print("|-----:|--------------------:|--------------:|")
+    print(f"| 1 | {min(single):.1f} ms | |")
+    print(f"| {adds:,} | {min(single) * adds / 1000:.1f} s (estimated) | {min(batch):.1f} ms |")
+
+
+def run_measured(argv, env, stdin=None):
+    """Run a process to completion: (wall-clock ms, peak resident MiB)
+
+    The peak includes whatever this process had resident when it forked,
+    so callers keep their own footprint small.
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(argv, env=env, stdin=stdin, stdout=subprocess.DEVNULL)
+    _, _, usage = os.wait4(process.pid, 0)
+    process.returncode = 0  # reaped by wait4
+    # ru_maxrss is in KiB on Linux
+    return (time.perf_counter() - start) * 1000, usage.ru_maxrss / 1024
+
+
+def bench_exchange(sizes, fmt):
+    """`tasks import` into an empty store and `tasks export` of the result: time and peak memory"""
+    from task_exchange import write_tasks
+    compileall.compile_dir(PLUGIN_DIR, maxlevels=0, quiet=1)
+    cli = os.path.join(PLUGIN_DIR, "task_cli.py")
+    extension = {"jsonl": ".jsonl", "csv": ".csv", "todo.txt": ".txt"}[fmt]
+    print(f"| Tasks ({fmt}) | Import | Import peak RSS | Export | Export peak RSS |")
+    print("|------:|-------:|----------------:|-------:|----------------:|")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "source" + extension)
+            with open(source, "w", encoding="utf-8", newline="") as f:
+                write_tasks(make_tasks(size), f, fmt)
+            env = dict(os.environ, HOME=tmp, TASKMAN_DATA_FILE=os.path.join(tmp, "tasks.json"), TASKMAN_DATA_FORMAT="json")
+            import_ms, import_rss = run_measured([sys.executable, cli, "import", source], env)
+            export_ms, export_rss = run_measured([sys.executable, cli, "export", os.path.join(tmp, "out" + extension)], env)
+            print(f"| {size:,} | {import_ms / 1000:.2f} s | {import_rss:.0f} MiB | {export_ms / 1000:.2f} s | {export_rss:.0f} MiB |")
+
+
+SEARCH_WORDS = ("invoice", "review", "deploy", "backup", "release", "dentist", "groceries", "refactor",
+                "meeting", "budget", "garden", "printer", "newsletter", "migration", "flight", "benchmark")
+SEARCH_QUERIES = ("release", "rev", "invoice budget", "igrat", "task 4242", "nothing")
+
+
+def bench_search(sizes, repeat):
+    """Index build/load and ranked queries vs. a substring scan of every task"""
+    from task_search import open_index
+    print("| Tasks | Build | Load | Query | Matches | Index | Scan |")
+    print("|------:|------:|-----:|:------|--------:|------:|-----:|")
+    for size in sizes:
+        tasks = list(make_tasks(size))
+        for task_data in tasks:
+            i = task_data["id"]
+            words = [SEARCH_WORDS[i // step % len(SEARCH_WORDS)] for step in (1, 16, 256)]
+            task_data["text"] = f"Task {i}: {' '.join(words)}"
+        with tempfile.TemporaryDirectory() as tmp:
+            store = JournalTaskStore(os.path.join(tmp, "tasks.json"))
+            store.write_snapshot(tasks, size + 1, "default")
+            start = time.perf_counter()
+            open_index(store)
+            build_ms = (time.perf_counter() - start) * 1000
+            load_ms = best_of(3, lambda: open_index(store))
+            index = open_index(store)
+            for query in SEARCH_QUERIES:
+                matches = len(index.search(query))
+                index_ms = best_of(repeat, lambda: index.search(query, 20))
+                terms = query.lower().split()
+                scan_ms = best_of(3, lambda: [t for t in tasks if all(term in t["text"].lower() for term in terms)])
+                print(f"| {size:,} | {build_ms:.0f} ms | {load_ms:.0f} ms | `{query}` | {matches:,} | {index_ms:.3f} ms | {scan_ms:.1f} ms |")
+
+
+def md5_should_refresh(ui, state: dict, width: int, height: int) -> bool:
+    """The vintage UI's redraw check before the task version, kept only as a baseline
+
+    It hashed a description of every task on each 80 ms getch() timeout.
+    """
+    import hashlib
+    tasks = ui.task_manager.tasks
+    content_parts = [
+        f"tasks:{len(tasks)}",
+        f"completed:{sum(1 for t in tasks if t.completed)}",
+        f"selected:{ui.task_manager.selected_index}",
+        f"size:{width}x{height}",
+        f"input:{ui.input_mode}",
+        f"input_text:{ui.input_text}",
+        f"input_priority:{ui.input_priority}",
+        f"help:{ui.show_help}",
+    ]
+    for i, task in enumerate(tasks):
+        content_parts.append(f"task_{i}_priority:{task.priority}")
+        content_parts.append(f"task_{i}_completed:{task.completed}")
+        content_parts.append(f"task_{i}_text:{task.text[:20]}")
+    current_hash = hashlib.md5("|".join(content_parts).encode()).hexdigest()
+    if current_hash == state.get("hash"):
+        return False
+    state["hash"] = current_hash
+    return True
+
+
+def bench_idle(task_count, seconds):
+    """CPU of an idle vintage UI deciding whether to redraw: MD5 per 80 ms poll vs. the task version per event"""
+    from task_events import MINUTE, EventLoop, next_minute
+    from task_manager_vintage import VintageTaskManager, VintageTaskUI
+    width, height = 100, 30
+    print("| Tasks | Redraw check | Per check | Wake-ups/s | Idle CPU |")
+    print("|------:|:-------------|----------:|-----------:|---------:|")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = JournalTaskStore(os.path.join(tmp, "tasks.json"))
+        store.write_snapshot(list(make_tasks(task_count)), task_count + 1, "default")
+        ui = VintageTaskUI(VintageTaskManager(store.data_file))
+        md5_state: dict = {}
+        md5_should_refresh(ui, md5_state, width, height)
+        ui.should_refresh_ui(width, height)
+
+        # Before: getch() timed out every 80 ms and each pass hashed every task
+        check_ms = best_of(20, lambda: md5_should_refresh(ui, md5_state, width, height))
+        wakeups, cpu, end = 0, time.process_time(), time.time() + seconds
+        while time.time() < end:
+            time.sleep(0.08)
+            md5_should_refresh(ui, md5_state, width, height)
+            wakeups += 1
+        cpu = time.process_time() - cpu
+        print(f"| {task_count:,} | MD5 of every task | {check_ms:.2f} ms | {wakeups / seconds:.1f} | {cpu / seconds:.1%} |")
+
+        # After: EventLoop sleeps until input or the next timer (here the minute), then compares the version
+        check_ms = best_of(20, lambda: ui.should_refresh_ui(width, height))
+        read_fd, write_fd = os.pipe()
+        events = EventLoop(stdin_fd=read_fd)
+        events.timers.set(MINUTE, next_minute())
+        wakeups, cpu, end = 0, time.process_time(), time.time() + seconds
+        try:
+            while time.time() < end:
+                events.wait(min(events.timers.next(), end))
+                if MINUTE in events.timers.expired():
+                    events.timers.set(MINUTE, next_minute())
+                ui.should_refresh_ui(width, height)
+                wakeups += 1
+        finally:
+            events.close()
+            os.close(read_fd)
+            os.close(write_fd)
+        cpu = time.process_time() - cpu
+        print(f"| {task_count:,} | task version | {check_ms * 1000:.1f} µs | {wakeups / seconds:.1f} | {cpu / seconds:.1%} |")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Taskman benchmarks")
+    subparsers = parser.add_subparsers(dest="bench", required=True)
+
+    memory = subparsers.add_parser("memory", help="Resident size of loaded task sets")
+    memory.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+
+    serializers = subparsers.add_parser("serializers", help="Snapshot save/load time per serializer backend")
+    serializers.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    serializers.add_argument("--repeat", type=int, default=5)
+
+    first_frame = subparsers.add_parser("first-frame", help="Time to the first page of tasks vs. a full load")
+    first_frame.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    first_frame.add_argument("--page", type=int, default=50)
+
+    startup = subparsers.add_parser("startup", help="Wall-clock and import time of CLI subcommands")
+    startup.add_argument("--tasks", type=int, default=1_000)
+    startup.add_argument("--repeat", type=int, default=20)
+    startup.add_argument("--history", help="Append results to this JSON-lines file and compare with its last entry")
+
+    batch = subparsers.add_parser("batch", help="Bulk adds in one process vs. one process per add")
+    batch.add_argument("--adds", type=int, default=10_000)
+    batch.add_argument("--repeat", type=int, default=5)
+
+    exchange = subparsers.add_parser("exchange", help="Streaming import/export time and peak memory")
+    exchange.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    exchange.add_argument("--format", default="jsonl", choices=["jsonl", "csv", "todo.txt"])
+
+    search = subparsers.add_parser("search", help="Search index build/load and query time")
+    search.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    search.add_argument("--repeat", type=int, default=20)
+
+    idle = subparsers.add_parser("idle", help="Idle CPU of the vintage UI's redraw check: MD5 vs. task version")
+    idle.add_argument("--tasks", type=int, default=10_000)
+    idle.add_argument("--seconds", type=float, default=10)
+
+    args = parser.parse_args()
+    if args.bench == "memory":
+        bench_memory(args.sizes)
+    elif args.bench == "serializers":
+        bench_serializers(args.sizes, args.repeat)
+    elif args.bench == "first-frame":
+        bench_first_frame(args.sizes, args.page)
+    elif args.bench == "startup":
+        bench_startup(args.tasks, args.repeat, args.history)
+    elif args.bench == "batch":
+        bench_batch(args.adds, args.repeat)
+    elif args.bench == "exchange":
+        bench_exchange(args.sizes, args.format)
+    elif args.bench == "search":
+        bench_search(args.sizes, args.repeat)
+    elif args.bench == "idle":
+        bench_idle(args.tasks, args.seconds)
+
+
+if __name__ == "__main__":
+    main()